@@ -0,0 +1,54 @@
+"""
+Agendador das cascatas de endereço
+Monta o grafo de dependência dos selects (Estado → Município → Bairro →
+Logradouro de cada ponta) e executa juntos os nós cujas dependências já
+terminaram: cadeias independentes (Ponta A e Ponta B) andam em paralelo e só
+os passos realmente dependentes esperam. Se um nó falha, os de baixo não rodam.
+"""
+import asyncio
+from cache_opcoes import NIVEIS
+
+
+def montar_grafo(cascatas):
+    """
+    cascatas: {sufixo: {nivel: campo}} só com os níveis a preencher
+    Retorna {(sufixo, nivel): dependência}, onde a dependência é o nó do nível
+    preenchido logo acima na mesma ponta (None no primeiro)
+    """
+    grafo = {}
+    for sufixo, campos in cascatas.items():
+        anterior = None
+        for nivel in NIVEIS:
+            if nivel not in campos:
+                continue
+            grafo[(sufixo, nivel)] = anterior
+            anterior = (sufixo, nivel)
+    return grafo
+
+
+async def executar_grafo(grafo, executar):
+    """
+    Executa executar(no) -> bool para cada nó assim que sua dependência terminar com sucesso
+    Retorna {no: True/False}, com None nos nós não executados (dependência falhou)
+    """
+    tarefas = {}
+
+    async def rodar(no):
+        dependencia = grafo[no]
+        if dependencia is not None:
+            try:
+                concluida = await tarefas[dependencia]
+            except Exception:
+                concluida = False
+            if not concluida:
+                return None
+        return await executar(no)
+
+    for no in grafo:
+        tarefas[no] = asyncio.ensure_future(rodar(no))
+    resultados = await asyncio.gather(*tarefas.values(), return_exceptions=True)
+
+    return {
+        no: (False if isinstance(resultado, Exception) else resultado)
+        for no, resultado in zip(tarefas, resultados)
+    }
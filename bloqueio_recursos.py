@@ -0,0 +1,102 @@
+"""
+Perfil de bloqueio de recursos nas páginas automatizadas
+Imagens, mídia e fontes não são usadas pela extração nem pelo preenchimento;
+o perfil aborta essas requisições no contexto e, opcionalmente, as folhas de
+estilo nas páginas que só são lidas. Scripts, XHR e documentos (o que o
+PrimeFaces precisa) nunca são bloqueados, e URLs da allowlist sempre passam.
+Os bytes economizados são estimados: pelo tamanho real quando a mesma URL já
+passou neste perfil (ex.: folhas de estilo do formulário novo) e, senão, pelo
+tamanho médio configurado para o tipo.
+"""
+import config
+
+
+# Tipos de recurso que o PrimeFaces precisa para funcionar: nunca bloqueados
+TIPOS_ESSENCIAIS = ('document', 'script', 'xhr', 'fetch', 'websocket', 'eventsource')
+
+# Limite de tamanhos (por URL) guardados em cada perfil
+MAX_TAMANHOS_CONHECIDOS = 500
+
+
+def _lista_config(valor):
+    return [item.strip().lower() for item in (valor or '').split(',') if item.strip()]
+
+
+def _tamanhos_config(valor):
+    """'image:20000,font:40000' -> {'image': 20000, 'font': 40000}"""
+    tamanhos = {}
+    for item in _lista_config(valor):
+        tipo, _, tamanho = item.partition(':')
+        if tamanho.strip().isdigit():
+            tamanhos[tipo.strip()] = int(tamanho)
+    return tamanhos
+
+
+class PerfilBloqueio:
+    """
+    Um perfil por migração (contexto), com os contadores do protocolo
+    """
+
+    def __init__(self, tipos=None, css_extracao=None, permitidos=None, tamanhos_medios=None):
+        self.tipos = set(tipos if tipos is not None else _lista_config(config.BLOQUEAR_TIPOS_RECURSO)) - set(TIPOS_ESSENCIAIS)
+        self.css_extracao = config.BLOQUEAR_CSS_EXTRACAO if css_extracao is None else css_extracao
+        self.permitidos = permitidos if permitidos is not None else _lista_config(config.RECURSOS_PERMITIDOS)
+        self.tamanhos_medios = tamanhos_medios if tamanhos_medios is not None else _tamanhos_config(config.BLOQUEIO_BYTES_MEDIOS)
+        # Tamanhos vistos em respostas que passaram neste perfil (por URL)
+        self.tamanhos = {}
+        self.requisicoes = 0
+        self.bytes = 0
+        self.por_tipo = {}
+
+    def _permitido(self, url):
+        url = url.lower()
+        return any(trecho in url for trecho in self.permitidos)
+
+    async def _abortar(self, route):
+        requisicao = route.request
+        self.requisicoes += 1
+        tamanho = self.tamanhos.get(requisicao.url)
+        self.bytes += tamanho if tamanho is not None else self.tamanhos_medios.get(requisicao.resource_type, 0)
+        self.por_tipo[requisicao.resource_type] = self.por_tipo.get(requisicao.resource_type, 0) + 1
+        await route.abort()
+
+    async def _rotear_contexto(self, route):
+        requisicao = route.request
+        if requisicao.resource_type in self.tipos and not self._permitido(requisicao.url):
+            await self._abortar(route)
+        else:
+            await route.fallback()
+
+    async def _rotear_extracao(self, route):
+        requisicao = route.request
+        if requisicao.resource_type == 'stylesheet' and not self._permitido(requisicao.url):
+            await self._abortar(route)
+        else:
+            # Segue para a rota do contexto
+            await route.fallback()
+
+    def _registrar_tamanho(self, resposta):
+        tamanho = resposta.headers.get('content-length')
+        if tamanho and tamanho.isdigit() and len(self.tamanhos) < MAX_TAMANHOS_CONHECIDOS:
+            self.tamanhos[resposta.url] = int(tamanho)
+
+    async def aplicar(self, context):
+        """Bloqueia os tipos configurados em todas as páginas do contexto"""
+        context.on('response', self._registrar_tamanho)
+        if self.tipos:
+            await context.route('**/*', self._rotear_contexto)
+
+    async def aplicar_extracao(self, page):
+        """Em páginas só lidas e fechadas em seguida, bloqueia também as folhas de estilo (se configurado)"""
+        if self.css_extracao:
+            await page.route('**/*', self._rotear_extracao)
+
+    def resumo(self):
+        return {'requisicoes': self.requisicoes, 'bytes': self.bytes, 'por_tipo': dict(self.por_tipo)}
+
+    def imprimir_resumo(self, protocolo):
+        if not self.requisicoes:
+            return
+        tipos = ', '.join(f'{tipo}: {qtd}' for tipo, qtd in sorted(self.por_tipo.items()))
+        bytes_texto = f", ~{self.bytes / 1024:.0f} KB estimados" if self.bytes else ''
+        print(f"🚫 Protocolo {protocolo}: {self.requisicoes} requisições bloqueadas ({tipos}){bytes_texto}")
@@ -0,0 +1,103 @@
+"""
+Cache local (SQLite) das opções da cascata Estado → Município → Bairro → Logradouro
+As listas são gravadas na primeira vez que o PrimeFaces as carrega e ficam
+válidas por um TTL; o número de entradas é limitado (remove as menos acessadas).
+"""
+import json
+import sqlite3
+import threading
+import time
+import config
+
+
+NIVEIS = ('estado', 'municipio', 'bairro', 'logradouro')
+
+
+class CacheOpcoes:
+    """
+    Chave: (nivel, estado, municipio, bairro) com os valores dos níveis acima
+    Ex.: os bairros de um município ficam em ('bairro', estado, municipio, '')
+    """
+
+    def __init__(self, caminho=None, ttl_horas=None, max_entradas=None):
+        self.caminho = caminho or config.CACHE_OPCOES_ARQUIVO
+        self.ttl = (ttl_horas if ttl_horas is not None else config.CACHE_OPCOES_TTL_HORAS) * 3600
+        self.max_entradas = max_entradas or config.CACHE_OPCOES_MAX_ENTRADAS
+        self._lock = threading.Lock()
+        self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        with self._lock, self.conexao:
+            self.conexao.execute("""
+                CREATE TABLE IF NOT EXISTS opcoes (
+                    nivel TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    municipio TEXT NOT NULL,
+                    bairro TEXT NOT NULL,
+                    opcoes TEXT NOT NULL,
+                    gravado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    PRIMARY KEY (nivel, estado, municipio, bairro)
+                )
+            """)
+
+    def _chave(self, nivel, chave):
+        # Completa a chave com '' para os níveis que não se aplicam
+        chave = tuple(str(v or '') for v in chave)[:3]
+        return (nivel,) + chave + ('',) * (3 - len(chave))
+
+    def obter(self, nivel, chave=()):
+        """
+        Retorna a lista [(valor, texto), ...] em cache ou None se ausente/expirada
+        """
+        chave_completa = self._chave(nivel, chave)
+        agora = time.time()
+        with self._lock, self.conexao:
+            linha = self.conexao.execute(
+                "SELECT opcoes, gravado_em FROM opcoes WHERE nivel=? AND estado=? AND municipio=? AND bairro=?",
+                chave_completa
+            ).fetchone()
+            if not linha:
+                return None
+            if agora - linha[1] > self.ttl:
+                self.conexao.execute(
+                    "DELETE FROM opcoes WHERE nivel=? AND estado=? AND municipio=? AND bairro=?",
+                    chave_completa
+                )
+                return None
+            self.conexao.execute(
+                "UPDATE opcoes SET acessado_em=? WHERE nivel=? AND estado=? AND municipio=? AND bairro=?",
+                (agora,) + chave_completa
+            )
+        return [tuple(opcao) for opcao in json.loads(linha[0])]
+
+    def gravar(self, nivel, chave, opcoes):
+        """Grava a lista de opções [(valor, texto), ...] de um nível"""
+        agora = time.time()
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO opcoes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._chave(nivel, chave) + (json.dumps([list(o) for o in opcoes]), agora, agora)
+            )
+            # Remove as entradas menos acessadas além do limite
+            self.conexao.execute("""
+                DELETE FROM opcoes WHERE rowid IN (
+                    SELECT rowid FROM opcoes ORDER BY acessado_em DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entradas,))
+
+    def resolver_valor(self, nivel, chave, valor):
+        """
+        Valida/resolve o valor de um nível antes de tocar na página
+        Retorna o valor da opção (aceita também o texto da opção),
+        None se o valor é sabidamente inválido, ou o próprio valor se o nível não está em cache
+        """
+        opcoes = self.obter(nivel, chave)
+        if opcoes is None:
+            return str(valor)
+        valor = str(valor)
+        for valor_opcao, texto in opcoes:
+            if valor_opcao == valor:
+                return valor_opcao
+        for valor_opcao, texto in opcoes:
+            if texto and texto.strip().lower() == valor.strip().lower():
+                return valor_opcao
+        return None
@@ -0,0 +1,191 @@
+"""
+Cache em disco dos recursos estáticos do JSF/PrimeFaces, compartilhado entre contextos
+Cada contexto novo começa com o cache HTTP vazio e baixaria de novo os
+`javax.faces.resource/*.xhtml` (JS e CSS). A rota deste cache atende esses
+recursos do disco; a primeira busca de qualquer contexto grava o arquivo.
+A chave é a URL sem o parâmetro de versão: quando a versão muda (`?v=...`)
+a entrada é substituída. Acima do tamanho máximo saem os menos usados.
+O disco é lido e gravado fora do loop do asyncio (asyncio.to_thread).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import config
+
+
+# Cabeçalhos guardados junto com o corpo (o corpo já vem decodificado, sem content-encoding)
+CABECALHOS_GUARDADOS = ('content-type', 'cache-control', 'last-modified', 'etag')
+
+# A cada quantas gravações o total em disco é medido de novo (outros processos usam o mesmo diretório)
+GRAVACOES_ENTRE_MEDICOES = 50
+
+
+def _lista_config(valor):
+    return [item.strip() for item in (valor or '').split(',') if item.strip()]
+
+
+class CacheRecursos:
+    def __init__(self, diretorio=None, max_bytes=None, padroes=None, parametro_versao=None):
+        self.diretorio = diretorio or config.CACHE_RECURSOS_DIRETORIO
+        self.max_bytes = max_bytes or config.CACHE_RECURSOS_MAX_BYTES
+        self.padroes = padroes if padroes is not None else _lista_config(config.CACHE_RECURSOS_PADROES)
+        self.parametro_versao = parametro_versao or config.CACHE_RECURSOS_PARAM_VERSAO
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+        # Total em disco dos corpos (.bin), mantido a cada gravação; None até a primeira medição
+        self._total = None
+        self._gravacoes = 0
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def cacheavel(self, url):
+        return any(padrao in url for padrao in self.padroes)
+
+    def _chave_versao(self, url):
+        """(URL sem o parâmetro de versão, versão)"""
+        partes = urlsplit(url)
+        parametros = parse_qsl(partes.query, keep_blank_values=True)
+        versao = next((valor for nome, valor in parametros if nome == self.parametro_versao), '')
+        resto = [(nome, valor) for nome, valor in parametros if nome != self.parametro_versao]
+        chave = urlunsplit((partes.scheme, partes.netloc, partes.path, urlencode(resto), ''))
+        return chave, versao
+
+    def _caminhos(self, chave):
+        nome = hashlib.sha1(chave.encode('utf-8')).hexdigest()
+        base = os.path.join(self.diretorio, nome)
+        return base + '.json', base + '.bin'
+
+    def obter(self, url):
+        """Retorna (cabecalhos, corpo) da mesma versão ou None"""
+        chave, versao = self._chave_versao(url)
+        caminho_meta, caminho_corpo = self._caminhos(chave)
+        with self._lock:
+            try:
+                with open(caminho_meta, 'r', encoding='utf-8') as arquivo:
+                    meta = json.load(arquivo)
+                if meta.get('versao') != versao:
+                    # Versão nova do recurso: a entrada antiga não serve mais
+                    self._descontar(caminho_corpo)
+                    self._remover(caminho_meta, caminho_corpo)
+                    return None
+                with open(caminho_corpo, 'rb') as arquivo:
+                    corpo = arquivo.read()
+            except (OSError, ValueError):
+                return None
+            # mtime marca o último uso (ordem da remoção por tamanho)
+            os.utime(caminho_corpo)
+        return meta['cabecalhos'], corpo
+
+    def gravar(self, url, cabecalhos, corpo):
+        chave, versao = self._chave_versao(url)
+        caminho_meta, caminho_corpo = self._caminhos(chave)
+        cabecalhos = {nome: valor for nome, valor in cabecalhos.items() if nome.lower() in CABECALHOS_GUARDADOS}
+        meta = json.dumps({'url': url, 'versao': versao, 'cabecalhos': cabecalhos}).encode('utf-8')
+        with self._lock:
+            self._gravacoes += 1
+            if self._total is None or self._gravacoes % GRAVACOES_ENTRE_MEDICOES == 0:
+                self._total = sum(tamanho for _, tamanho, _ in self._corpos())
+            self._descontar(caminho_corpo)
+            self._gravar_atomico(caminho_corpo, corpo)
+            self._gravar_atomico(caminho_meta, meta)
+            self._total += len(corpo)
+            if self._total > self.max_bytes:
+                self._limitar_tamanho()
+
+    def _gravar_atomico(self, caminho, conteudo):
+        """Grava em um temporário único no mesmo diretório e troca pelo arquivo final"""
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=os.path.basename(caminho) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            self._remover(temporario)
+            raise
+
+    def _descontar(self, caminho_corpo):
+        """Tira do total o corpo que vai ser substituído ou removido"""
+        if self._total is None:
+            return
+        try:
+            self._total -= os.path.getsize(caminho_corpo)
+        except OSError:
+            pass
+
+    def _remover(self, *caminhos):
+        for caminho in caminhos:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+    def _corpos(self):
+        """(mtime, tamanho, caminho) de cada corpo em disco"""
+        corpos = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith('.bin'):
+                caminho = os.path.join(self.diretorio, nome)
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                corpos.append((info.st_mtime, info.st_size, caminho))
+        return corpos
+
+    def _limitar_tamanho(self):
+        """Só roda quando o total passa do máximo; mede o diretório de novo e remove os menos usados"""
+        corpos = self._corpos()
+        total = sum(tamanho for _, tamanho, _ in corpos)
+        for _, tamanho, caminho in sorted(corpos):
+            if total <= self.max_bytes:
+                break
+            self._remover(caminho, caminho[:-len('.bin')] + '.json')
+            total -= tamanho
+        self._total = total
+
+    async def _rotear(self, route):
+        requisicao = route.request
+        if requisicao.method != 'GET' or not self.cacheavel(requisicao.url):
+            await route.fallback()
+            return
+
+        entrada = await asyncio.to_thread(self.obter, requisicao.url)
+        if entrada:
+            self.acertos += 1
+            cabecalhos, corpo = entrada
+            await route.fulfill(status=200, headers=cabecalhos, body=corpo)
+            return
+
+        self.faltas += 1
+        try:
+            resposta = await route.fetch()
+        except Exception:
+            await route.fallback()
+            return
+        corpo = await resposta.body()
+        if resposta.status == 200:
+            try:
+                await asyncio.to_thread(self.gravar, requisicao.url, resposta.headers, corpo)
+            except OSError as e:
+                print(f"  ⚠ Erro ao gravar recurso no cache: {str(e)}")
+        await route.fulfill(response=resposta, body=corpo)
+
+    async def aplicar(self, context):
+        """
+        Registra a rota do cache no contexto
+        Deve vir antes das demais rotas: as registradas depois rodam primeiro
+        e chegam aqui via route.fallback()
+        """
+        if self.padroes:
+            padrao = re.compile('|'.join(re.escape(p) for p in self.padroes))
+            await context.route(padrao, self._rotear)
+
+    def imprimir_resumo(self):
+        total = self.acertos + self.faltas
+        if total:
+            print(f"💾 Cache de recursos: {self.acertos}/{total} atendidos do disco")
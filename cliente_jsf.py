@@ -0,0 +1,219 @@
+"""
+Cliente de requisições parciais JSF/PrimeFaces (sem navegador)
+Cada mudança de select da cascata é um POST `partial/ajax` com o ViewState da
+view; a resposta `partial-response` traz o HTML atualizado dos selects
+dependentes. Este cliente carrega a view por HTTP e reproduz essas requisições,
+permitindo resolver/validar cascatas em lote e aquecer o CacheOpcoes.
+"""
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+import config
+from cache_opcoes import NIVEIS
+from extracao_http import sessao_http
+
+
+CAMPO_VIEW_STATE = 'javax.faces.ViewState'
+
+# PrimeFaces.ab({s:"...",e:"change",p:"...",u:"..."}) — chaves e valores com ou sem aspas
+RE_PRIMEFACES_AB = re.compile(r'PrimeFaces\.ab\(\s*\{(.*?)\}\s*\)', re.S)
+RE_PARAMETRO_AB = re.compile(r'["\']?(\w+)["\']?\s*:\s*(?:"([^"]*)"|\'([^\']*)\'|(this))')
+# mojarra.ab(this,event,'change','execute','render')
+RE_MOJARRA_AB = re.compile(r"mojarra\.ab\(\s*this\s*,\s*event\s*,\s*'([^']*)'\s*,\s*'([^']*)'\s*,\s*'([^']*)'")
+
+
+class ErroJSF(Exception):
+    """Resposta inesperada do servidor JSF (erro, redirecionamento, view expirada)"""
+
+
+def parametros_ajax(select):
+    """
+    Lê do onchange do select os parâmetros da requisição parcial
+    Retorna {'source', 'evento', 'execute', 'render'} ou None se não houver AJAX
+    """
+    onchange = select.get('onchange') or ''
+    id_select = select.get('id') or select.get('name')
+
+    encontrado = RE_PRIMEFACES_AB.search(onchange)
+    if encontrado:
+        parametros = {}
+        for chave, aspas_duplas, aspas_simples, this in RE_PARAMETRO_AB.findall(encontrado.group(1)):
+            parametros[chave] = id_select if this else (aspas_duplas or aspas_simples)
+        return {
+            'source': parametros.get('s') or id_select,
+            'evento': parametros.get('e') or 'change',
+            'execute': parametros.get('p') or parametros.get('s') or id_select,
+            'render': parametros.get('u', '')
+        }
+
+    encontrado = RE_MOJARRA_AB.search(onchange)
+    if encontrado:
+        evento, execute, render = encontrado.groups()
+        return {
+            'source': id_select,
+            'evento': evento or 'change',
+            'execute': id_select if execute in ('', '@this') else execute,
+            'render': render
+        }
+    return None
+
+
+def opcoes_select(select):
+    """[(valor, texto), ...] de um select, sem a opção vazia"""
+    return [
+        (opcao.get('value'), ' '.join(opcao.get_text(' ').split()))
+        for opcao in select.find_all('option') if opcao.get('value')
+    ]
+
+
+def opcoes_dos_selects(html):
+    """{nome_do_select: [(valor, texto), ...]} de um trecho HTML"""
+    soup = BeautifulSoup(html, 'html.parser')
+    return {select.get('name') or select.get('id'): opcoes_select(select) for select in soup.find_all('select')}
+
+
+def ler_partial_response(xml):
+    """
+    Interpreta um `partial-response`
+    Retorna (atualizacoes {id: html}, novo_view_state ou None)
+    """
+    try:
+        raiz = ET.fromstring(xml.strip())
+    except ET.ParseError as e:
+        raise ErroJSF(f"partial-response inválido: {str(e)}")
+
+    erro = raiz.find('error')
+    if erro is not None:
+        nome = erro.findtext('error-name', '')
+        mensagem = erro.findtext('error-message', '')
+        raise ErroJSF(f"Erro do servidor: {nome} {mensagem}".strip())
+
+    redirecionamento = raiz.find('redirect')
+    if redirecionamento is not None:
+        raise ErroJSF(f"Redirecionado para {redirecionamento.get('url')} (sessão expirada?)")
+
+    atualizacoes = {}
+    view_state = None
+    for update in raiz.iter('update'):
+        id_update = update.get('id', '')
+        if CAMPO_VIEW_STATE in id_update:
+            view_state = (update.text or '').strip()
+        else:
+            atualizacoes[id_update] = update.text or ''
+    return atualizacoes, view_state
+
+
+class ClienteJSF:
+    """
+    Uma view JSF carregada por HTTP com os cookies de um storage_state do Playwright
+    """
+
+    def __init__(self, storage_state=None, timeout=None):
+        self.timeout = (timeout or config.TIMEOUT_EXTRACAO_HTTP) / 1000
+        self.sessao = sessao_http(storage_state)
+        self.url = None
+        self.view_state = None
+        self.selects = {}
+
+    def carregar_view(self, url):
+        """GET da view: guarda o ViewState e, por select, o form e os parâmetros AJAX"""
+        resposta = self.sessao.get(url, timeout=self.timeout)
+        if resposta.status_code != 200:
+            raise ErroJSF(f"Status {resposta.status_code} ao acessar {url}")
+        if 'login.xhtml' in resposta.url.lower():
+            raise ErroJSF("Sessão expirada (redirecionado para o login)")
+
+        soup = BeautifulSoup(resposta.text, 'html.parser')
+        campo_view_state = soup.find('input', attrs={'name': CAMPO_VIEW_STATE})
+        if not campo_view_state:
+            raise ErroJSF("ViewState não encontrado na página")
+        self.view_state = campo_view_state.get('value')
+        self.url = resposta.url
+
+        self.selects = {}
+        for select in soup.find_all('select'):
+            form = select.find_parent('form')
+            if not form or not select.get('name'):
+                continue
+            self.selects[select.get('name')] = {
+                'form': form.get('id') or form.get('name'),
+                'acao': urljoin(self.url, form.get('action') or self.url),
+                'ajax': parametros_ajax(select),
+                'opcoes': opcoes_select(select)
+            }
+        return self
+
+    def alterar(self, campo, valor):
+        """
+        Reproduz a requisição parcial de mudança do select `campo` para `valor`
+        Retorna {nome_do_select: [(valor, texto), ...]} dos selects re-renderizados
+        """
+        info = self.selects.get(campo)
+        if not info:
+            raise ErroJSF(f"Select {campo} não existe na view")
+        ajax = info['ajax']
+        if not ajax:
+            raise ErroJSF(f"Select {campo} não dispara requisição parcial")
+
+        dados = {
+            'javax.faces.partial.ajax': 'true',
+            'javax.faces.source': ajax['source'],
+            'javax.faces.partial.execute': ajax['execute'],
+            'javax.faces.partial.render': ajax['render'],
+            'javax.faces.behavior.event': ajax['evento'],
+            'javax.faces.partial.event': ajax['evento'],
+            info['form']: info['form'],
+            campo: str(valor),
+            CAMPO_VIEW_STATE: self.view_state
+        }
+        resposta = self.sessao.post(info['acao'], data=dados, timeout=self.timeout, headers={
+            'Faces-Request': 'partial/ajax',
+            'X-Requested-With': 'XMLHttpRequest'
+        })
+        if resposta.status_code != 200:
+            raise ErroJSF(f"Status {resposta.status_code} na requisição parcial de {campo}")
+
+        atualizacoes, view_state = ler_partial_response(resposta.text)
+        if view_state:
+            self.view_state = view_state
+        opcoes = {}
+        for html in atualizacoes.values():
+            opcoes.update(opcoes_dos_selects(html))
+        return opcoes
+
+    def resolver_cascata(self, campos, valores, cache_opcoes=None):
+        """
+        Percorre a cascata (estado → município → bairro → logradouro) só com requisições parciais
+        campos: {nivel: nome_do_select}; valores: {nivel: valor} (aceita o texto da opção)
+        Grava no cache as listas obtidas, com as mesmas chaves do MigradorPEP
+        Retorna (valores_resolvidos {nivel: valor}, nivel_invalido ou None)
+        """
+        resolvidos = {}
+        chave = ()
+        opcoes = self.selects.get(campos[NIVEIS[0]], {}).get('opcoes') or None
+        if opcoes and cache_opcoes:
+            cache_opcoes.gravar(NIVEIS[0], (), opcoes)
+        for nivel in NIVEIS:
+            valor = valores.get(nivel)
+            if not valor:
+                break
+            valor = str(valor)
+            if opcoes is not None:
+                valor_opcao = next((v for v, _ in opcoes if v == valor), None)
+                if valor_opcao is None:
+                    valor_opcao = next((v for v, t in opcoes if t and t.strip().lower() == valor.strip().lower()), None)
+                if valor_opcao is None:
+                    return resolvidos, nivel
+                valor = valor_opcao
+            resolvidos[nivel] = valor
+
+            if nivel == NIVEIS[-1]:
+                break
+            proximo = NIVEIS[NIVEIS.index(nivel) + 1]
+            atualizados = self.alterar(campos[nivel], valor)
+            opcoes = atualizados.get(campos[proximo])
+            if opcoes is not None and cache_opcoes:
+                cache_opcoes.gravar(proximo, chave + (valor,), opcoes)
+            chave = chave + (valor,)
+        return resolvidos, None
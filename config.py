@@ -17,4 +17,83 @@ SENHA = os.getenv('SENHA', 'b$dEj@6L5#')
 # Configurações
 DELAY_PREENCHIMENTO = int(os.getenv('DELAY_PREENCHIMENTO', '500'))
 HEADLESS = os.getenv('HEADLESS', 'false').lower() == 'true'
+# slow_mo do Chromium (ms entre ações do Playwright); o ritmo fica com o ControladorRitmo
+SLOW_MO = int(os.getenv('SLOW_MO', '0'))
 
+# Ritmo adaptativo do preenchimento (ms): parte de DELAY_PREENCHIMENTO, diminui um passo
+# por resposta rápida e multiplica pelo fator quando a resposta é lenta ou o campo é rejeitado
+RITMO_ATRASO_MIN = int(os.getenv('RITMO_ATRASO_MIN', '0'))
+RITMO_ATRASO_MAX = int(os.getenv('RITMO_ATRASO_MAX', '3000'))
+RITMO_PASSO_MS = int(os.getenv('RITMO_PASSO_MS', '50'))
+RITMO_FATOR_RECUO = float(os.getenv('RITMO_FATOR_RECUO', '2'))
+RITMO_LIMITE_LENTO_MS = int(os.getenv('RITMO_LIMITE_LENTO_MS', '2000'))
+
+
+# Pool de navegadores (lotes)
+POOL_MAX_NAVEGADORES = int(os.getenv('POOL_MAX_NAVEGADORES', '4'))
+POOL_CONTEXTOS_POR_NAVEGADOR = int(os.getenv('POOL_CONTEXTOS_POR_NAVEGADOR', '5'))
+
+# Motor de migração (máximo de migrações simultâneas)
+MAX_MIGRACOES_PARALELAS = int(os.getenv('MAX_MIGRACOES_PARALELAS', '20'))
+
+# Esperas AJAX (ms): limite de segurança e janela para o AJAX começar após uma ação
+TIMEOUT_AJAX = int(os.getenv('TIMEOUT_AJAX', '15000'))
+AJAX_JANELA_INICIO = int(os.getenv('AJAX_JANELA_INICIO', '750'))
+
+# Cache das opções da cascata de endereço (SQLite)
+CACHE_OPCOES_ARQUIVO = os.getenv('CACHE_OPCOES_ARQUIVO', 'cache_opcoes.sqlite3')
+CACHE_OPCOES_TTL_HORAS = float(os.getenv('CACHE_OPCOES_TTL_HORAS', '168'))
+CACHE_OPCOES_MAX_ENTRADAS = int(os.getenv('CACHE_OPCOES_MAX_ENTRADAS', '5000'))
+
+# Extração do formulário antigo: 'navegador' (Playwright) ou 'http' (requests + BeautifulSoup)
+MODO_EXTRACAO = os.getenv('MODO_EXTRACAO', 'navegador').lower()
+TIMEOUT_EXTRACAO_HTTP = int(os.getenv('TIMEOUT_EXTRACAO_HTTP', '30000'))  # ms
+
+# Valida as cascatas de endereço por requisições parciais JSF antes de preencher
+PRE_RESOLVER_CASCATAS = os.getenv('PRE_RESOLVER_CASCATAS', 'false').lower() == 'true'
+
+# Preenche as cascatas da Ponta A e da Ponta B ao mesmo tempo na mesma página
+CASCATAS_PARALELAS = os.getenv('CASCATAS_PARALELAS', 'true').lower() == 'true'
+
+# Armazém dos dados extraídos por protocolo (JSON comprimido em disco)
+SNAPSHOTS_DIRETORIO = os.getenv('SNAPSHOTS_DIRETORIO', 'snapshots_extracao')
+SNAPSHOTS_MAX_IDADE_HORAS = float(os.getenv('SNAPSHOTS_MAX_IDADE_HORAS', '720'))
+SNAPSHOTS_MAX_BYTES = int(os.getenv('SNAPSHOTS_MAX_MB', '200')) * 1024 * 1024
+
+# Lote em duas fases: extrações simultâneas na fase 1 (a fase 2 usa MAX_MIGRACOES_PARALELAS)
+MAX_EXTRACOES_PARALELAS = int(os.getenv('MAX_EXTRACOES_PARALELAS', '20'))
+
+# Bloqueio de recursos nas páginas automatizadas
+BLOQUEIO_RECURSOS = os.getenv('BLOQUEIO_RECURSOS', 'true').lower() == 'true'
+BLOQUEAR_TIPOS_RECURSO = os.getenv('BLOQUEAR_TIPOS_RECURSO', 'image,media,font')
+BLOQUEAR_CSS_EXTRACAO = os.getenv('BLOQUEAR_CSS_EXTRACAO', 'true').lower() == 'true'
+RECURSOS_PERMITIDOS = os.getenv('RECURSOS_PERMITIDOS', '')  # trechos de URL que sempre carregam
+# Tamanho médio (bytes) de cada tipo bloqueado, para estimar a economia quando a URL nunca passou
+BLOQUEIO_BYTES_MEDIOS = os.getenv('BLOQUEIO_BYTES_MEDIOS', 'image:20000,font:40000,media:500000,stylesheet:15000')
+
+# Cache em disco dos recursos estáticos do JSF/PrimeFaces, compartilhado entre contextos
+CACHE_RECURSOS = os.getenv('CACHE_RECURSOS', 'true').lower() == 'true'
+CACHE_RECURSOS_DIRETORIO = os.getenv('CACHE_RECURSOS_DIRETORIO', 'cache_recursos')
+CACHE_RECURSOS_MAX_BYTES = int(os.getenv('CACHE_RECURSOS_MAX_MB', '100')) * 1024 * 1024
+CACHE_RECURSOS_PADROES = os.getenv('CACHE_RECURSOS_PADROES', 'javax.faces.resource')
+CACHE_RECURSOS_PARAM_VERSAO = os.getenv('CACHE_RECURSOS_PARAM_VERSAO', 'v')
+
+# Novas tentativas de uma etapa que falhou (por etapa) e espera exponencial entre elas (s)
+RETENTATIVAS_ETAPA = int(os.getenv('RETENTATIVAS_ETAPA', '2'))
+RETENTATIVA_BACKOFF_S = float(os.getenv('RETENTATIVA_BACKOFF_S', '2'))
+RETENTATIVA_BACKOFF_MAX_S = float(os.getenv('RETENTATIVA_BACKOFF_MAX_S', '30'))
+
+# Fila persistente dos jobs da interface web (SQLite) e prazo do arrendamento (s)
+FILA_JOBS_ARQUIVO = os.getenv('FILA_JOBS_ARQUIVO', 'fila_jobs.sqlite3')
+FILA_LEASE_SEGUNDOS = int(os.getenv('FILA_LEASE_SEGUNDOS', '60'))
+
+# Modo de execução da interface web: 'threads' (motor no processo do Flask) ou 'processos'
+MODO_EXECUCAO = os.getenv('MODO_EXECUCAO', 'threads').lower()
+# Modo 'processos': workers, migrações simultâneas por worker, limite sem sinal de vida (s)
+# e quantas vezes uma migração é reenviada após a queda do worker
+PROCESSOS_WORKERS = int(os.getenv('PROCESSOS_WORKERS', '2'))
+PROCESSOS_MIGRACOES_POR_WORKER = int(os.getenv('PROCESSOS_MIGRACOES_POR_WORKER', '5'))
+PROCESSOS_TIMEOUT_SINAL_S = int(os.getenv('PROCESSOS_TIMEOUT_SINAL_S', '60'))
+PROCESSOS_MAX_REENVIOS = int(os.getenv('PROCESSOS_MAX_REENVIOS', '2'))
+# Migração em andamento sem nenhum progresso por este tempo (s): driver travado, o worker é reiniciado
+PROCESSOS_TIMEOUT_PROGRESSO_S = int(os.getenv('PROCESSOS_TIMEOUT_PROGRESSO_S', '600'))
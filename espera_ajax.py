@@ -0,0 +1,133 @@
+"""
+Esperas orientadas a eventos para páginas PrimeFaces/JSF
+Substituem os wait_for_timeout fixos: retornam assim que a página fica
+ociosa e usam o timeout apenas como limite de segurança.
+"""
+import asyncio
+import time
+from urllib.parse import quote
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import config
+
+
+# Página ociosa: fila AJAX do PrimeFaces vazia, jQuery sem requisições e documento carregado
+SCRIPT_AJAX_OCIOSO = """() => {
+    const pf = window.PrimeFaces;
+    if (pf && pf.ajax && pf.ajax.Queue && pf.ajax.Queue.isEmpty && !pf.ajax.Queue.isEmpty()) {
+        return false;
+    }
+    if (window.jQuery && window.jQuery.active > 0) {
+        return false;
+    }
+    return document.readyState === 'complete';
+}"""
+
+SCRIPT_TEM_AJAX = "() => !!(window.PrimeFaces || window.jQuery || window.jsf || window.mojarra)"
+
+SCRIPT_ASSINATURA_OPCOES = """(nome) => {
+    const select = document.querySelector(`select[name="${nome}"]`);
+    if (!select) return null;
+    return Array.from(select.options).map(o => o.value).join('\\u0001');
+}"""
+
+
+def eh_requisicao_parcial(requisicao, campo=None):
+    """
+    Verifica se a requisição é um partial request JSF/PrimeFaces
+    Se campo for informado, exige que ele seja o javax.faces.source
+    """
+    if requisicao.method != 'POST':
+        return False
+    corpo = requisicao.post_data or ''
+    if requisicao.headers.get('faces-request') != 'partial/ajax' and 'javax.faces.partial.ajax' not in corpo:
+        return False
+    if campo:
+        return f'javax.faces.source={quote(campo, safe="")}' in corpo or f'javax.faces.source={campo}' in corpo
+    return True
+
+
+async def aguardar_ajax_ocioso(page, timeout=None):
+    """
+    Aguarda a fila AJAX esvaziar
+    Retorna True se a página ficou ociosa, False se estourou o timeout
+    """
+    try:
+        await page.wait_for_function(SCRIPT_AJAX_OCIOSO, timeout=timeout or config.TIMEOUT_AJAX, polling=50)
+        return True
+    except PlaywrightTimeoutError:
+        print(f"    ⚠ Página não ficou ociosa em {timeout or config.TIMEOUT_AJAX} ms, continuando...")
+        return False
+
+
+async def pagina_tem_ajax(page):
+    """Retorna True se a página carrega PrimeFaces/jQuery/JSF (sinais de AJAX observáveis)"""
+    try:
+        return await page.evaluate(SCRIPT_TEM_AJAX)
+    except Exception:
+        return False
+
+
+async def assinatura_opcoes(page, campo_select):
+    """Retorna uma assinatura das opções atuais de um select (None se não existir)"""
+    return await page.evaluate(SCRIPT_ASSINATURA_OPCOES, campo_select)
+
+
+async def aguardar_opcoes_alteradas(page, campo_select, assinatura_anterior, timeout=None):
+    """
+    Aguarda as opções de um select dependente mudarem em relação à assinatura anterior
+    Retorna True se mudaram, False se estourou o timeout
+    """
+    try:
+        await page.wait_for_function(
+            f"(args) => ({SCRIPT_ASSINATURA_OPCOES})(args.nome) !== args.anterior",
+            arg={'nome': campo_select, 'anterior': assinatura_anterior},
+            timeout=timeout or config.TIMEOUT_AJAX,
+            polling=50
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def executar_e_aguardar_ajax(page, acao, campo=None, timeout=None, aguardar_fila=True):
+    """
+    Executa a ação (função assíncrona sem argumentos) e aguarda o AJAX que ela disparar:
+    1. espera o partial request começar (por até AJAX_JANELA_INICIO ms após a ação);
+    2. espera o partial-response correspondente chegar;
+    3. espera a fila AJAX esvaziar (o PrimeFaces já aplicou o update no DOM).
+    Se nenhuma requisição começar na janela, a ação não tinha AJAX e retorna na hora.
+    Com aguardar_fila=False o passo 3 é pulado (útil quando outras cascatas rodam em paralelo).
+
+    Retorna o tempo em ms até a resposta do servidor, ou None se não houve AJAX
+    """
+    timeout = timeout or config.TIMEOUT_AJAX
+    requisicoes = []
+
+    def ao_requisitar(requisicao):
+        if eh_requisicao_parcial(requisicao, campo):
+            requisicoes.append(requisicao)
+
+    page.on('request', ao_requisitar)
+    try:
+        await acao()
+        limite = time.monotonic() + config.AJAX_JANELA_INICIO / 1000
+        while not requisicoes and time.monotonic() < limite:
+            await asyncio.sleep(0.025)
+    finally:
+        page.remove_listener('request', ao_requisitar)
+
+    if not requisicoes:
+        return None
+    requisicao = requisicoes[-1]
+
+    inicio = time.monotonic()
+    try:
+        # Request.response() só retorna quando o partial-response chega
+        await asyncio.wait_for(requisicao.response(), timeout / 1000)
+    except asyncio.TimeoutError:
+        print(f"    ⚠ Sem resposta AJAX em {timeout} ms, continuando...")
+    tempo_ms = (time.monotonic() - inicio) * 1000
+
+    if aguardar_fila:
+        await aguardar_ajax_ocioso(page, timeout)
+    return tempo_ms
@@ -0,0 +1,131 @@
+"""
+Armazém do estado das migrações exibido pela interface web
+Os threads do motor alteram os itens pelos callbacks enquanto o Flask lê;
+tudo passa por um lock. Os itens são identificados pelo id do job. Cada alteração incrementa a versão global e marca o
+item com ela, então /status?since=<versão> devolve só o que mudou. A lista
+completa (e o JSON dela) fica em cache até a próxima alteração. As últimas alterações também
+ficam em um log de eventos que o canal SSE (/eventos) repassa aos navegadores.
+"""
+import collections
+import copy
+import json
+import threading
+import uuid
+
+
+# Eventos guardados para retomar uma conexão SSE; se o cliente ficou mais atrás, recebe a lista completa
+MAX_EVENTOS = 5000
+
+
+class ArmazemEstado:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._condicao = threading.Condition(self._lock)
+        # (versão, cópia do item) de cada alteração, em ordem de versão
+        self._eventos = collections.deque(maxlen=MAX_EVENTOS)
+        self._itens = {}
+        self.versao = 0
+        # Versão em que a lista foi trocada: deltas anteriores a ela não servem
+        self.base = 0
+        # Identifica esta instância: versões de outra execução do servidor não valem aqui
+        self.geracao = uuid.uuid4().hex[:8]
+        self._cache_itens = None
+        self._cache_json = None
+
+    def _alterado(self, item):
+        self.versao += 1
+        item['versao'] = self.versao
+        self._cache_itens = None
+        self._cache_json = None
+        self._eventos.append((self.versao, copy.deepcopy(item)))
+        self._condicao.notify_all()
+
+    def substituir(self, itens):
+        """Troca a lista inteira (novo lote): clientes recebem o estado completo"""
+        with self._lock:
+            self._itens = {}
+            self.versao += 1
+            self.base = self.versao
+            for item in itens:
+                item = copy.deepcopy(item)
+                item['versao'] = self.versao
+                self._itens[item['id']] = item
+            self._cache_itens = None
+            self._cache_json = None
+            self._eventos.clear()
+            self._condicao.notify_all()
+
+    def adicionar(self, itens):
+        """Inclui (ou substitui) itens sem descartar os demais; cada um vira um evento"""
+        with self._lock:
+            for item in itens:
+                item = copy.deepcopy(item)
+                self._itens[item['id']] = item
+                self._alterado(item)
+
+    def atualizar(self, id_item, steps=None, **campos):
+        """Altera campos de um item; steps ({etapa: status}) é mesclado nas etapas existentes"""
+        with self._lock:
+            item = self._itens.get(id_item)
+            if item is None:
+                return False
+            item.update(campos)
+            if steps:
+                item['steps'].update(steps)
+            self._alterado(item)
+            return True
+
+    def obter(self, id_item):
+        with self._lock:
+            item = self._itens.get(id_item)
+            return copy.deepcopy(item) if item else None
+
+    def itens(self, status=None):
+        """Cópia dos itens (opcionalmente só os de um status), na ordem da lista"""
+        with self._lock:
+            return [
+                copy.deepcopy(item) for item in self._itens.values()
+                if status is None or item['status'] == status
+            ]
+
+    def completo(self):
+        """(versão, cópia da lista completa), reaproveitada até a próxima alteração (não alterar)"""
+        with self._lock:
+            if self._cache_itens is None:
+                self._cache_itens = copy.deepcopy(list(self._itens.values()))
+            return self.versao, self._cache_itens
+
+    def json_completo(self):
+        """(versão, JSON da lista completa), reaproveitado até a próxima alteração"""
+        with self._lock:
+            if self._cache_json is None:
+                self._cache_json = json.dumps(list(self._itens.values()), ensure_ascii=False)
+            return self.versao, self._cache_json
+
+    def delta(self, since, geracao=None):
+        """
+        Itens alterados depois da versão `since`
+        Retorna (versão, itens, completo); completo=True quando o cliente
+        precisa descartar o que tem (outra geração ou lista trocada)
+        """
+        with self._lock:
+            if geracao != self.geracao or since is None or since < self.base or since > self.versao:
+                return self.versao, None, True
+            alterados = [copy.deepcopy(item) for item in self._itens.values() if item['versao'] > since]
+            return self.versao, alterados, False
+
+    def aguardar_eventos(self, desde, geracao=None, timeout=None):
+        """
+        Espera (até timeout s) alguma alteração depois da versão `desde`
+        Retorna (versão, eventos): eventos é a lista [(versão, item)] posterior a `desde`
+        (vazia se nada mudou) ou None quando não dá para retomar de `desde`
+        (outra geração, lista trocada ou eventos já descartados do log)
+        """
+        with self._condicao:
+            if geracao == self.geracao and desde is not None:
+                self._condicao.wait_for(lambda: self.versao != desde, timeout)
+            if geracao != self.geracao or desde is None or desde < self.base or desde > self.versao:
+                return self.versao, None
+            if self._eventos and self._eventos[0][0] > desde + 1:
+                return self.versao, None
+            return self.versao, [(versao, item) for versao, item in self._eventos if versao > desde]
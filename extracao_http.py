@@ -0,0 +1,153 @@
+"""
+Extração do formulário antigo só com HTTP (requests + BeautifulSoup)
+Usa os cookies da sessão autenticada do navegador e monta o mesmo snapshot
+de snapshot_formulario a partir do HTML renderizado pelo servidor, sem JavaScript.
+"""
+import requests
+from bs4 import BeautifulSoup
+import config
+from pool_navegadores import USER_AGENT
+
+
+TIPOS_INPUT_TEXTO = ('text', 'email', 'tel', 'number')
+
+
+class ErroExtracaoHTTP(Exception):
+    """A página não pôde ser lida por HTTP (sessão expirada, status inesperado...)"""
+
+
+def _tipo(el):
+    return (el.get('type') or '').lower()
+
+
+def _texto(el):
+    # Aproxima o innerText: espaços em branco colapsados
+    return ' '.join(el.get_text(' ').split())
+
+
+def _valor_textarea(el):
+    # O parser do navegador descarta a primeira quebra de linha do textarea
+    texto = el.get_text()
+    if texto.startswith('\r\n'):
+        return texto[2:]
+    if texto.startswith('\n'):
+        return texto[1:]
+    return texto
+
+
+def _valor_opcao(opcao):
+    valor = opcao.get('value')
+    return valor if valor is not None else _texto(opcao)
+
+
+def _valor_select(el):
+    """Valor que select.value teria logo após o carregamento"""
+    opcoes = el.find_all('option')
+    selecionadas = [o for o in opcoes if o.has_attr('selected')]
+    if selecionadas:
+        # Em select simples vale a última marcada como selected
+        return _valor_opcao(selecionadas[0] if el.has_attr('multiple') else selecionadas[-1])
+    if el.has_attr('multiple') or not opcoes:
+        return ''
+    habilitadas = [o for o in opcoes if not o.has_attr('disabled')]
+    return _valor_opcao(habilitadas[0]) if habilitadas else ''
+
+
+def _campo(grupo, el, valor):
+    return {
+        'grupo': grupo,
+        'tag': el.name,
+        'name': el.get('name'),
+        'id': el.get('id'),
+        'type': el.get('type'),
+        'value': valor,
+        'checked': grupo == 'marcado'
+    }
+
+
+def snapshot_de_html(html):
+    """
+    Monta o snapshot {campos, itinerario} a partir do HTML, com os mesmos
+    grupos e a mesma ordem do SCRIPT_SNAPSHOT_FORMULARIO
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    inputs = soup.find_all('input')
+    textareas = soup.find_all('textarea')
+    campos = []
+
+    for el in inputs:
+        if not el.has_attr('type') or _tipo(el) in TIPOS_INPUT_TEXTO:
+            campos.append(_campo('input', el, el.get('value') or ''))
+    for el in textareas:
+        campos.append(_campo('textarea', el, _valor_textarea(el)))
+    for el in soup.find_all('select'):
+        campos.append(_campo('select', el, _valor_select(el)))
+
+    # Em um grupo de radios só o último marcado fica checked
+    radios_marcados = {}
+    for el in inputs:
+        if _tipo(el) == 'radio' and el.has_attr('checked'):
+            radios_marcados[el.get('name')] = el
+    for el in inputs:
+        tipo = _tipo(el)
+        if tipo == 'checkbox' and el.has_attr('checked'):
+            campos.append(_campo('marcado', el, el.get('value')))
+        elif tipo == 'radio' and el.has_attr('checked') and (el.get('name') is None or radios_marcados[el.get('name')] is el):
+            campos.append(_campo('marcado', el, el.get('value')))
+
+    # Candidatos a resumo do itinerário, na mesma ordem de prioridade
+    candidatos = []
+    candidatos += [el.get('value') for el in inputs if _tipo(el) == 'hidden' and ';' in (el.get('value') or '')]
+    candidatos += [_valor_textarea(el) for el in textareas if ';' in (el.get('value') or '')]
+    candidatos += [el.get('value') for el in inputs if ';' in (el.get('value') or '')]
+    candidatos += [_valor_textarea(el) for el in textareas]
+
+    tabela = []
+    el_tabela = soup.find(id='form:tabs:tableLogradouros')
+    if el_tabela:
+        for tbody in el_tabela.find_all('tbody'):
+            for linha in tbody.find_all('tr'):
+                if 'ui-datatable-empty-message' in (linha.get('class') or []):
+                    continue
+                celula = next((td for td in linha.find_all('td') if td.find_previous_sibling() is None), None)
+                if celula:
+                    tabela.append(_texto(celula))
+
+    return {'campos': campos, 'itinerario': {'candidatos': candidatos, 'tabela': tabela}}
+
+
+def sessao_http(storage_state):
+    """requests.Session com os cookies de um storage_state do Playwright"""
+    sessao = requests.Session()
+    sessao.headers['User-Agent'] = USER_AGENT
+    for cookie in (storage_state or {}).get('cookies', []):
+        sessao.cookies.set(
+            cookie['name'], cookie['value'],
+            domain=cookie.get('domain'), path=cookie.get('path', '/')
+        )
+    return sessao
+
+
+class ExtratorHTTP:
+    """
+    Lê páginas com os cookies de um storage_state do Playwright
+    """
+
+    def __init__(self, storage_state, timeout=None):
+        self.timeout = (timeout or config.TIMEOUT_EXTRACAO_HTTP) / 1000
+        self.sessao = sessao_http(storage_state)
+
+    def obter_html(self, url):
+        resposta = self.sessao.get(url, timeout=self.timeout)
+        if resposta.status_code != 200:
+            raise ErroExtracaoHTTP(f"Status {resposta.status_code} ao acessar {url}")
+        if 'login.xhtml' in resposta.url.lower():
+            raise ErroExtracaoHTTP("Sessão expirada (redirecionado para o login)")
+        return resposta.text
+
+    def extrair_snapshot(self, url):
+        """Retorna o snapshot do formulário em `url`"""
+        snapshot = snapshot_de_html(self.obter_html(url))
+        if not snapshot['campos']:
+            raise ErroExtracaoHTTP("Nenhum campo encontrado no HTML")
+        return snapshot
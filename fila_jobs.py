@@ -0,0 +1,194 @@
+"""
+Fila persistente (SQLite) das migrações da interface web
+Cada protocolo de um lote vira um job com pasta, status, etapas e horários.
+O processo que executa arrenda os jobs (dono + prazo) e renova o prazo com
+heartbeats; se o processo morre, o prazo vence e o servidor reiniciado (ou
+outro processo) retoma só os jobs que não foram finalizados.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import config
+
+
+STATUS_FINAIS = ('Concluído', 'Erro', 'Cancelado')
+
+# Colunas devolvidas nos jobs e as que atualizar() aceita
+COLUNAS = (
+    'id', 'lote', 'protocolo', 'nome_pasta', 'caminho_pasta', 'duas_fases', 'status', 'mensagem',
+    'progresso', 'steps', 'tentativas', 'criado_em', 'iniciado_em', 'atualizado_em', 'finalizado_em'
+)
+COLUNAS_ALTERAVEIS = ('status', 'mensagem', 'progresso')
+
+
+class FilaJobs:
+    def __init__(self, caminho=None, lease_segundos=None):
+        self.caminho = caminho or config.FILA_JOBS_ARQUIVO
+        self.lease = lease_segundos or config.FILA_LEASE_SEGUNDOS
+        # Identifica os arrendamentos deste processo
+        self.dono = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        with self._lock, self.conexao:
+            self.conexao.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lote TEXT NOT NULL,
+                    protocolo TEXT NOT NULL,
+                    nome_pasta TEXT NOT NULL,
+                    caminho_pasta TEXT NOT NULL,
+                    duas_fases INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'Pendente',
+                    mensagem TEXT NOT NULL DEFAULT '',
+                    progresso INTEGER NOT NULL DEFAULT 0,
+                    steps TEXT NOT NULL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    criado_em REAL NOT NULL,
+                    iniciado_em REAL,
+                    atualizado_em REAL,
+                    finalizado_em REAL,
+                    dono TEXT,
+                    lease_ate REAL,
+                    arrendado_em REAL
+                )
+            """)
+            self.conexao.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _job(self, linha):
+        job = dict(zip(COLUNAS, linha))
+        job['steps'] = json.loads(job['steps'])
+        job['duas_fases'] = bool(job['duas_fases'])
+        return job
+
+    def _selecionar(self, where, parametros=()):
+        return [
+            self._job(linha) for linha in self.conexao.execute(
+                f"SELECT {', '.join(COLUNAS)} FROM jobs WHERE {where} ORDER BY id", parametros
+            )
+        ]
+
+    def adicionar_lote(self, itens, duas_fases=False):
+        """
+        Grava um lote novo: itens com protocolo, nome_pasta, caminho_pasta e steps
+        Retorna os jobs criados (com id)
+        """
+        lote = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+        agora = time.time()
+        with self._lock, self.conexao:
+            self.conexao.executemany(
+                "INSERT INTO jobs (lote, protocolo, nome_pasta, caminho_pasta, duas_fases, steps, criado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (lote, item['protocolo'], item['nome_pasta'], item['caminho_pasta'], int(duas_fases),
+                     json.dumps(item['steps'], ensure_ascii=False), agora)
+                    for item in itens
+                ]
+            )
+            return self._selecionar("lote=?", (lote,))
+
+    def arrendar(self):
+        """
+        Arrenda para este processo os jobs pendentes e os não finalizados cujo
+        prazo venceu (processo anterior morreu); estes voltam a Pendente
+        Retorna os jobs arrendados
+        """
+        agora = time.time()
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                f"UPDATE jobs SET dono=?, lease_ate=?, arrendado_em=?, tentativas=tentativas+1, "
+                f"status='Pendente', mensagem=CASE WHEN dono IS NULL THEN mensagem ELSE 'Retomado da fila' END "
+                f"WHERE status NOT IN ({finais}) AND (dono IS NULL OR lease_ate < ?)",
+                (self.dono, agora + self.lease, agora) + STATUS_FINAIS + (agora,)
+            )
+            return self._selecionar("dono=? AND arrendado_em=?", (self.dono, agora))
+
+    def renovar(self):
+        """Heartbeat: estende o prazo dos jobs em andamento deste processo"""
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        with self._lock, self.conexao:
+            cursor = self.conexao.execute(
+                f"UPDATE jobs SET lease_ate=? WHERE dono=? AND status NOT IN ({finais})",
+                (time.time() + self.lease, self.dono) + STATUS_FINAIS
+            )
+            return cursor.rowcount
+
+    def atualizar(self, id_job, steps=None, **campos):
+        """
+        Grava status/mensagem/progresso e mescla steps ({etapa: status})
+        Status final libera o arrendamento e marca finalizado_em
+        """
+        campos = {coluna: valor for coluna, valor in campos.items() if coluna in COLUNAS_ALTERAVEIS}
+        agora = time.time()
+        with self._lock, self.conexao:
+            if steps:
+                linha = self.conexao.execute("SELECT steps FROM jobs WHERE id=?", (id_job,)).fetchone()
+                if linha:
+                    campos['steps'] = json.dumps({**json.loads(linha[0]), **steps}, ensure_ascii=False)
+            campos['atualizado_em'] = agora
+            status = campos.get('status')
+            atribuicoes = [f"{coluna}=?" for coluna in campos]
+            if status in STATUS_FINAIS:
+                atribuicoes += ["finalizado_em=?", "dono=NULL", "lease_ate=NULL"]
+                campos['finalizado_em'] = agora
+            elif status and status != 'Pendente':
+                atribuicoes.append("iniciado_em=COALESCE(iniciado_em, ?)")
+                campos['iniciado_em'] = agora
+            self.conexao.execute(
+                f"UPDATE jobs SET {', '.join(atribuicoes)} WHERE id=?",
+                tuple(campos.values()) + (id_job,)
+            )
+
+    def reabrir(self, id_job):
+        """
+        Volta um job finalizado para Pendente (repetir um item pela interface)
+        Retorna False se o job não existe ou ainda está em andamento
+        """
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        with self._lock, self.conexao:
+            cursor = self.conexao.execute(
+                f"UPDATE jobs SET status='Pendente', mensagem='Repetindo as etapas não concluídas', "
+                f"finalizado_em=NULL, dono=NULL, lease_ate=NULL, atualizado_em=? "
+                f"WHERE id=? AND status IN ({finais})",
+                (time.time(), id_job) + STATUS_FINAIS
+            )
+            return cursor.rowcount > 0
+
+    def arrendados(self):
+        """Ids dos jobs não finalizados arrendados por este processo"""
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        with self._lock:
+            return [linha[0] for linha in self.conexao.execute(
+                f"SELECT id FROM jobs WHERE dono=? AND status NOT IN ({finais}) ORDER BY id",
+                (self.dono,) + STATUS_FINAIS
+            )]
+
+    def liberar(self, ids=None):
+        """
+        Devolve à fila os jobs não finalizados deste processo (encerramento normal)
+        ou só os de `ids` (jobs que o motor não acompanha mais)
+        """
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        filtro, parametros = '', ()
+        if ids is not None:
+            if not ids:
+                return
+            filtro = f" AND id IN ({', '.join('?' * len(ids))})"
+            parametros = tuple(ids)
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                f"UPDATE jobs SET dono=NULL, lease_ate=NULL WHERE dono=? AND status NOT IN ({finais}){filtro}",
+                (self.dono,) + STATUS_FINAIS + parametros
+            )
+
+    def jobs_visiveis(self):
+        """Jobs dos lotes que ainda têm trabalho e do lote mais recente, para exibir na interface"""
+        finais = ', '.join('?' * len(STATUS_FINAIS))
+        with self._lock:
+            return self._selecionar(
+                f"lote IN (SELECT lote FROM jobs WHERE status NOT IN ({finais})) "
+                f"OR lote = (SELECT lote FROM jobs ORDER BY id DESC LIMIT 1)",
+                STATUS_FINAIS
+            )
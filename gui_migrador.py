@@ -3,12 +3,10 @@ Interface gráfica para migração de formulários PEP
 """
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-import threading
 import os
 import json
 from datetime import datetime
-import asyncio
-from migrador_pep import MigradorPEP
+from motor_migracao import MotorMigracao
 
 
 class MigracaoItem:
@@ -22,7 +20,7 @@ class MigracaoItem:
         self.progresso = 0
         self.mensagem = ""
         self.erro = None
-        self.thread = None
+        self.id_tarefa = None
         self.browser_aberto = False
         self.steps = {
             "Login": "⏳",
@@ -44,7 +42,7 @@ class GUIMigrador:
         # Variáveis
         self.diretorio_base = tk.StringVar(value="/Users/gabrielrosch/git/")
         self.itens_migracao = []
-        self.threads_ativas = {}
+        self.motor = None
         
         # Configurar estilo
         self.setup_style()
@@ -188,6 +186,7 @@ class GUIMigrador:
         """Cria menu de contexto para itens da lista"""
         self.menu_contexto = tk.Menu(self.root, tearoff=0)
         self.menu_contexto.add_command(label="🔄 Reimportar", command=self.reimportar_selecionado)
+        self.menu_contexto.add_command(label="⏹️ Cancelar", command=self.cancelar_selecionado)
         self.menu_contexto.add_command(label="📂 Abrir Pasta", command=self.abrir_pasta_selecionada)
         self.menu_contexto.add_separator()
         self.menu_contexto.add_command(label="❌ Remover", command=self.remover_selecionado)
@@ -352,81 +351,67 @@ class GUIMigrador:
         # Salva configuração
         self.salvar_configuracao()
         
-        # Inicia migração em thread separada
+        # Agenda as migrações no motor
         self.status_bar.config(text=f"Iniciando migração de {len(itens)} item(ns)...")
-        threading.Thread(target=self.executar_migracoes, daemon=True).start()
+        self.executar_migracoes()
+    
+    def obter_motor(self):
+        """Cria o motor de migração na primeira utilização"""
+        if self.motor is None:
+            self.motor = MotorMigracao()
+        return self.motor
     
     def executar_migracoes(self):
-        """Executa as migrações em sequência"""
+        """Agenda as migrações no motor (que limita quantas rodam em paralelo)"""
         for item in self.itens_migracao:
             if item.status == "Cancelado":
                 continue
-            
-            # Executa migração em thread separada
-            thread = threading.Thread(target=self.executar_migracao_item, args=(item,), daemon=True)
-            thread.start()
-            item.thread = thread
-            self.threads_ativas[item.protocolo] = thread
-            
-            # Aguarda um pouco antes do próximo
-            threading.Event().wait(2)
+            self.executar_migracao_item(item)
     
     def executar_migracao_item(self, item):
-        """Executa migração de um item"""
-        try:
-            item.status = "Executando"
-            item.data_inicio = datetime.now()
-            self.atualizar_item_tree(item)
-            
-            # Atualiza step Login
-            item.steps["Login"] = "🔄"
-            item.progresso = 10
-            self.atualizar_item_tree(item)
-            
-            # Cria migrador com callback e mantém navegador aberto para verificação manual
-            migrador = MigradorPEP(
-                item.protocolo, 
-                item.caminho_pasta,
-                callback_progresso=callback_progresso,
-                manter_navegador_aberto=True  # Mantém navegador aberto após anexos
-            )
-            
-            # Executa migração (em loop de eventos assíncrono)
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            try:
-                # Executa a migração
-                loop.run_until_complete(migrador.executar_migracao())
-                
-                # Atualiza steps
-                item.steps["Login"] = "✅"
-                item.steps["Extração"] = "✅"
-                item.steps["Preenchimento"] = "✅"
-                item.steps["Anexos"] = "✅"
-                item.steps["Concluído"] = "✅"
-                item.status = "Concluído"
-                item.progresso = 100
-                item.mensagem = "Migração concluída com sucesso!"
-                item.data_fim = datetime.now()
-                item.browser_aberto = True
-                
-            except Exception as e:
-                item.status = "Erro"
-                item.erro = str(e)
-                item.mensagem = f"Erro: {str(e)}"
-                item.progresso = 0
-                
-            finally:
-                loop.close()
-            
-        except Exception as e:
-            item.status = "Erro"
-            item.erro = str(e)
-            item.mensagem = f"Erro crítico: {str(e)}"
+        """Agenda a migração de um item no motor"""
+        def callback_progresso(step, status, mensagem=""):
+            # Chamado a partir do thread do motor: repassa para o thread do Tk
+            self.root.after(0, self.atualizar_step_item, item, step, status, mensagem)
+        
+        def callback_status(status, mensagem=""):
+            self.root.after(0, self.atualizar_status_item, item, status, mensagem)
+        
+        item.id_tarefa = self.obter_motor().submeter(
+            item.protocolo,
+            item.caminho_pasta,
+            callback_progresso=callback_progresso,
+            callback_status=callback_status
+        )
+    
+    def atualizar_step_item(self, item, step, status, mensagem):
+        """Atualiza um step do item (executa no thread do Tk)"""
+        if step in item.steps:
+            item.steps[step] = status
+        item.mensagem = mensagem
+        item.progresso = {"Login": 20, "Extração": 40, "Preenchimento": 70, "Anexos": 90}.get(step, item.progresso)
+        self.atualizar_item_tree(item)
+    
+    def atualizar_status_item(self, item, status, mensagem):
+        """Atualiza o status do item (executa no thread do Tk)"""
+        item.status = status
+        if mensagem:
+            item.mensagem = mensagem
         
-        finally:
-            self.atualizar_item_tree(item)
+        if status == "Executando":
+            item.data_inicio = datetime.now()
+        elif status == "Concluído":
+            item.steps["Concluído"] = "✅"
+            item.progresso = 100
+            item.data_fim = datetime.now()
+            item.browser_aberto = True
+        elif status in ("Erro", "Cancelado"):
+            item.erro = mensagem if status == "Erro" else None
+            item.progresso = 0
+            item.data_fim = datetime.now()
+        
+        self.atualizar_item_tree(item)
+        if status in ("Concluído", "Erro", "Cancelado"):
             self.status_bar.config(text=f"Migração {item.protocolo} finalizada: {item.status}")
     
     def atualizar_item_tree(self, item):
@@ -455,21 +440,33 @@ class GUIMigrador:
         # Encontra item correspondente
         for item in self.itens_migracao:
             if hasattr(item, 'tree_id') and item.tree_id == item_id:
-                # Reseta status
+                # Reseta status; etapas concluídas ficam marcadas (o motor não as refaz:
+                # dados vêm do armazém de snapshots e, se só faltam os anexos, o formulário aberto é reaproveitado)
                 item.status = "Pendente"
                 item.progresso = 0
                 item.erro = None
                 item.mensagem = ""
-                item.steps = {k: "⏳" for k in item.steps}
+                item.steps = {k: (v if v == "✅" and k != "Concluído" else "⏳") for k, v in item.steps.items()}
                 item.data_inicio = None
                 item.data_fim = None
                 
                 self.atualizar_item_tree(item)
                 
                 # Executa novamente
-                thread = threading.Thread(target=self.executar_migracao_item, args=(item,), daemon=True)
-                thread.start()
-                item.thread = thread
+                self.executar_migracao_item(item)
+                break
+    
+    def cancelar_selecionado(self):
+        """Cancela a migração do item selecionado"""
+        selecionado = self.tree.selection()
+        if not selecionado or not self.motor:
+            return
+        
+        item_id = selecionado[0]
+        for item in self.itens_migracao:
+            if hasattr(item, 'tree_id') and item.tree_id == item_id:
+                if item.id_tarefa is None or not self.motor.cancelar(item.id_tarefa):
+                    messagebox.showinfo("Aviso", "Esta migração já foi finalizada.")
                 break
     
     def abrir_pasta_selecionada(self):
@@ -2,19 +2,33 @@
 Interface web para migração de formulários PEP
 Alternativa para quando tkinter não funciona
 """
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template_string, request, jsonify, Response, stream_with_context
 import threading
+import atexit
+import signal
 import os
 import json
+import time
+import zlib
 from datetime import datetime
-import asyncio
-import concurrent.futures
-from migrador_pep import MigradorPEP
+from motor_migracao import MotorMigracao
+from supervisor_processos import SupervisorProcessos
+from estado_jobs import ArmazemEstado
+from fila_jobs import FilaJobs, STATUS_FINAIS
+import config
 
 app = Flask(__name__)
 
 # Estado global
-itens_migracao = {}
+estado = ArmazemEstado()
+# Segundos máximos entre mensagens do canal SSE (ping/vazão do lote)
+INTERVALO_EVENTOS = 5
+motor = None
+lock_motor = threading.Lock()
+# Fila persistente dos jobs (criada no processo que atende as requisições)
+fila = None
+lock_fila = threading.Lock()
+lock_despacho = threading.Lock()
 configuracao = {
     'diretorio_base': '/Users/gabrielrosch/git/'
 }
@@ -127,6 +141,8 @@ HTML_TEMPLATE = """
         .status-executando { color: #2196F3; font-weight: bold; }
         .status-concluido { color: #4CAF50; font-weight: bold; }
         .status-erro { color: #f44336; font-weight: bold; }
+        .status-cancelado { color: #999; text-decoration: line-through; }
+        .status-extraindo, .status-extraído { color: #9C27B0; }
         .progress-bar {
             width: 100%;
             height: 20px;
@@ -164,6 +180,9 @@ HTML_TEMPLATE = """
             <h2>⚙️ Configurações</h2>
             <label>Diretório Base:</label>
             <input type="text" id="diretorio_base" value="{{ diretorio_base }}" style="margin-top: 5px;">
+            <label style="margin-top: 10px;">
+                <input type="checkbox" id="duas_fases"> Duas fases (extrai todos os protocolos antes de preencher)
+            </label>
         </div>
         
         <div class="section">
@@ -182,6 +201,7 @@ HTML_TEMPLATE = """
         
         <div class="section">
             <h2>📊 Progresso das Migrações</h2>
+            <div id="resumo_lote"></div>
             <div id="tabela_progresso">
                 <p style="color: #999;">Nenhuma migração iniciada ainda.</p>
             </div>
@@ -189,7 +209,9 @@ HTML_TEMPLATE = """
     </div>
     
     <script>
-        let intervaloAtualizacao = null;
+        // Itens atuais por id do job, na ordem da lista
+        let itensMigracao = {};
+        let ordemMigracao = [];
         
         function validarLista() {
             const texto = document.getElementById('lista_protocolos').value.trim();
@@ -242,66 +264,125 @@ HTML_TEMPLATE = """
         function iniciarMigracao() {
             const diretorio = document.getElementById('diretorio_base').value;
             const lista = document.getElementById('lista_protocolos').value;
+            const duasFases = document.getElementById('duas_fases').checked;
             
             fetch('/iniciar', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({diretorio_base: diretorio, lista: lista})
+                body: JSON.stringify({diretorio_base: diretorio, lista: lista, duas_fases: duasFases})
             })
             .then(r => r.json())
             .then(data => {
                 if (data.success) {
                     alert(`Migração iniciada para ${data.count} item(ns)!`);
-                    atualizarProgresso();
-                    if (!intervaloAtualizacao) {
-                        intervaloAtualizacao = setInterval(atualizarProgresso, 2000);
-                    }
                 } else {
                     alert('Erro: ' + data.error);
                 }
             });
         }
         
-        function atualizarProgresso() {
-            fetch('/status')
+        function cancelarMigracao(id) {
+            fetch('/cancelar', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({id: id})
+            })
             .then(r => r.json())
             .then(data => {
-                const div = document.getElementById('tabela_progresso');
-                if (data.itens && data.itens.length > 0) {
-                    let html = '<table><thead><tr><th>Protocolo</th><th>Pasta</th><th>Status</th><th>Progresso</th><th>Login</th><th>Extração</th><th>Preenchimento</th><th>Anexos</th><th>Mensagem</th></tr></thead><tbody>';
-                    data.itens.forEach(item => {
-                        const statusClass = `status-${item.status.toLowerCase().replace(' ', '-')}`;
-                        html += `<tr>
-                            <td>${item.protocolo}</td>
-                            <td>${item.nome_pasta}</td>
-                            <td class="${statusClass}">${item.status}</td>
-                            <td>
-                                <div class="progress-bar">
-                                    <div class="progress-fill" style="width: ${item.progresso}%"></div>
-                                </div>
-                                ${item.progresso}%
-                            </td>
-                            <td>${item.steps.Login || '⏳'}</td>
-                            <td>${item.steps.Extração || '⏳'}</td>
-                            <td>${item.steps.Preenchimento || '⏳'}</td>
-                            <td>${item.steps.Anexos || '⏳'}</td>
-                            <td>${item.mensagem || ''}</td>
-                        </tr>`;
-                    });
-                    html += '</tbody></table>';
-                    div.innerHTML = html;
-                } else {
-                    div.innerHTML = '<p style="color: #999;">Nenhuma migração iniciada ainda.</p>';
+                if (!data.success) {
+                    alert('Erro: ' + data.error);
+                }
+            });
+        }
+        
+        function repetirMigracao(id) {
+            fetch('/repetir', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({id: id})
+            })
+            .then(r => r.json())
+            .then(data => {
+                if (!data.success) {
+                    alert('Erro: ' + data.error);
                 }
             });
         }
         
-        // Atualiza a cada 2 segundos se houver migrações
-        setInterval(() => {
-            if (intervaloAtualizacao) {
-                atualizarProgresso();
+        function linhaItem(item) {
+            const statusClass = `status-${item.status.toLowerCase().replace(' ', '-')}`;
+            return `<tr id="item-${item.id}">
+                <td>${item.protocolo}</td>
+                <td>${item.nome_pasta}</td>
+                <td class="${statusClass}">${item.status}</td>
+                <td>
+                    <div class="progress-bar">
+                        <div class="progress-fill" style="width: ${item.progresso}%"></div>
+                    </div>
+                    ${item.progresso}%
+                </td>
+                <td>${item.steps.Login || '⏳'}</td>
+                <td>${item.steps.Extração || '⏳'}</td>
+                <td>${item.steps.Preenchimento || '⏳'}</td>
+                <td>${item.steps.Anexos || '⏳'}</td>
+                <td>${item.mensagem || ''}</td>
+                <td>${['Pendente', 'Extraindo', 'Extraído', 'Executando'].includes(item.status)
+                    ? `<button class="danger" onclick="cancelarMigracao(${item.id})">✖ Cancelar</button>`
+                    : (item.status !== 'Concluído' || (item.steps.Anexos === '❌' && item.retomar_anexos))
+                        ? `<button class="secondary" onclick="repetirMigracao(${item.id})">↻ Repetir</button>` : ''}</td>
+            </tr>`;
+        }
+        
+        function montarTabela() {
+            const div = document.getElementById('tabela_progresso');
+            if (ordemMigracao.length > 0) {
+                let html = '<table><thead><tr><th>Protocolo</th><th>Pasta</th><th>Status</th><th>Progresso</th><th>Login</th><th>Extração</th><th>Preenchimento</th><th>Anexos</th><th>Mensagem</th><th></th></tr></thead><tbody>';
+                ordemMigracao.forEach(id => {
+                    html += linhaItem(itensMigracao[id]);
+                });
+                html += '</tbody></table>';
+                div.innerHTML = html;
+            } else {
+                div.innerHTML = '<p style="color: #999;">Nenhuma migração iniciada ainda.</p>';
+            }
+        }
+        
+        function atualizarLinha(item) {
+            const linha = document.getElementById(`item-${item.id}`);
+            itensMigracao[item.id] = item;
+            if (linha) {
+                linha.outerHTML = linhaItem(item);
+            } else {
+                ordemMigracao.push(item.id);
+                montarTabela();
+            }
+        }
+        
+        function atualizarResumoLote(lote) {
+            const resumo = document.getElementById('resumo_lote');
+            if (lote) {
+                const fase = (nome, f) => `${nome}: ${f.sucesso} ok, ${f.falha} falha(s), ${f.pendentes} pendente(s), ${f.por_minuto.toFixed(1)}/min`;
+                resumo.innerHTML = `<p>📊 ${fase('Extração', lote.extracao)} | ${fase('Preenchimento', lote.preenchimento)}</p>`;
+            } else {
+                resumo.innerHTML = '';
             }
-        }, 2000);
+        }
+        
+        // Canal SSE: o servidor envia a lista completa ao conectar e depois só as linhas alteradas;
+        // ao reconectar o navegador manda o Last-Event-ID e a transmissão continua de onde parou
+        const eventos = new EventSource('/eventos');
+        eventos.addEventListener('completo', e => {
+            const itens = JSON.parse(e.data);
+            itensMigracao = {};
+            ordemMigracao = [];
+            itens.forEach(item => {
+                itensMigracao[item.id] = item;
+                ordemMigracao.push(item.id);
+            });
+            montarTabela();
+        });
+        eventos.addEventListener('item', e => atualizarLinha(JSON.parse(e.data)));
+        eventos.addEventListener('lote', e => atualizarResumoLote(JSON.parse(e.data)));
     </script>
 </body>
 </html>
@@ -309,6 +390,7 @@ HTML_TEMPLATE = """
 
 @app.route('/')
 def index():
+    obter_fila()
     return render_template_string(HTML_TEMPLATE, diretorio_base=configuracao['diretorio_base'])
 
 @app.route('/iniciar', methods=['POST'])
@@ -352,9 +434,6 @@ def iniciar():
                         'protocolo': protocolo,
                         'nome_pasta': nome_pasta,
                         'caminho_pasta': caminho_pasta,
-                        'status': 'Pendente',
-                        'progresso': 0,
-                        'mensagem': '',
                         'steps': {
                             'Login': '⏳',
                             'Extração': '⏳',
@@ -369,105 +448,254 @@ def iniciar():
         # Salva configuração
         configuracao['diretorio_base'] = diretorio_base
         
-        # Limpa itens anteriores
-        itens_migracao.clear()
-        
-        # Adiciona novos itens
-        for item in itens:
-            itens_migracao[item['protocolo']] = item
-        
-        # Inicia migrações em thread
-        threading.Thread(target=executar_migracoes, daemon=True).start()
+        # Grava o lote na fila persistente (os lotes anteriores continuam) e agenda no motor
+        jobs = obter_fila().adicionar_lote(itens, duas_fases=bool(data.get('duas_fases')))
+        estado.adicionar(jobs)
+        despachar_jobs()
         
         return jsonify({'success': True, 'count': len(itens)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def contagens_lote(lote):
+    """Contagens de cada fase do lote em JSON; a vazão (duracao_s, por_minuto) muda com o tempo e fica de fora"""
+    return json.dumps([[fase, r['sucesso'], r['falha'], r['pendentes']] for fase, r in lote.items()]) if lote else ''
+
 @app.route('/status')
 def status():
-    return jsonify({
-        'itens': list(itens_migracao.values())
-    })
-
-def executar_migracao_item(protocolo, item):
-    """Executa uma migração individual"""
-    if item['status'] != 'Pendente':
-        return
+    """
+    Estado das migrações
+    Com ?since=<versão>&geracao=<id> devolve só os itens alterados depois da versão;
+    sem eles (ou se a lista foi trocada) devolve tudo com completo=true
+    """
+    lotes = obter_motor().status_lotes() if motor else []
+    lote = lotes[-1] if lotes else None
+    since = request.args.get('since', type=int)
+    versao, itens, completo = estado.delta(since, request.args.get('geracao'))
+    if completo:
+        versao, itens = estado.completo()
     
-    item['status'] = 'Executando'
+    # A ETag só considera as contagens do lote
+    contagens = contagens_lote(lote)
+    etag = f'{estado.geracao}-{"c" if completo else since}-{versao}-{zlib.crc32(contagens.encode()):x}'
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304, headers={'Cache-Control': 'no-cache'})
+        resposta.set_etag(etag)
+        return resposta
     
-    def callback_progresso(step, status, mensagem=""):
-        if step in item['steps']:
-            item['steps'][step] = status
-        item['mensagem'] = mensagem
-        if step == "Login":
-            item['progresso'] = 20
-        elif step == "Extração":
-            item['progresso'] = 40
-        elif step == "Preenchimento":
-            item['progresso'] = 70
-        elif step == "Anexos":
-            item['progresso'] = 90
+    corpo = json.dumps({
+        'versao': versao,
+        'geracao': estado.geracao,
+        'completo': completo,
+        'itens': itens,
+        'lote': lote
+    }, ensure_ascii=False)
+    resposta = Response(corpo, mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+    resposta.set_etag(etag)
+    return resposta
+
+@app.route('/cancelar', methods=['POST'])
+def cancelar():
+    data = request.json or {}
+    item = estado.obter(data.get('id'))
+    if not item or 'id_tarefa' not in item:
+        return jsonify({'success': False, 'error': 'Migração não encontrada'})
+    if not obter_motor().cancelar(item['id_tarefa']):
+        return jsonify({'success': False, 'error': 'Migração já finalizada'})
+    return jsonify({'success': True})
+
+@app.route('/repetir', methods=['POST'])
+def repetir():
+    """
+    Repete um item finalizado; as etapas com checkpoint não são refeitas
+    (dados do armazém de snapshots, formulário novo ainda aberto quando só faltam os anexos)
+    """
+    data = request.json or {}
+    id_job = data.get('id')
+    item = estado.obter(id_job)
+    if item is None:
+        return jsonify({'success': False, 'error': 'Migração não encontrada'})
+    if item['status'] == 'Concluído' and not obter_motor().pode_retomar(item['protocolo']):
+        # Repetir refaria o formulário inteiro (o formulário novo já foi enviado)
+        return jsonify({'success': False, 'error': 'O formulário novo não está mais aberto; os anexos não podem ser retomados'})
+    if not obter_fila().reabrir(id_job):
+        return jsonify({'success': False, 'error': 'Migração ainda em andamento'})
+    estado.atualizar(id_job, status='Pendente', mensagem='Repetindo as etapas não concluídas')
+    despachar_jobs()
+    return jsonify({'success': True})
+
+@app.route('/eventos')
+def eventos():
+    """
+    Canal SSE com as alterações dos itens
+    Envia `completo` (lista inteira) ao conectar ou quando não dá para retomar,
+    `item` a cada alteração e `lote` quando as contagens do lote mudam.
+    O id de cada evento é <geração>-<versão>; o Last-Event-ID da reconexão retoma dele
+    """
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+    geracao, _, versao_texto = ultimo_id.partition('-')
+    desde = int(versao_texto) if versao_texto.isdigit() else None
     
-    try:
-        migrador = MigradorPEP(
-            item['protocolo'],
-            item['caminho_pasta'],
-            callback_progresso=callback_progresso,
-            manter_navegador_aberto=True  # Mantém navegador aberto para verificação manual
-        )
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def transmitir():
+        nonlocal geracao, desde
+        contagens_anteriores = ''
+        yield 'retry: 3000\n\n'
+        while True:
+            versao, alteracoes = estado.aguardar_eventos(desde, geracao, timeout=INTERVALO_EVENTOS)
+            if alteracoes is None:
+                versao, itens_json = estado.json_completo()
+                yield f'id: {estado.geracao}-{versao}\nevent: completo\ndata: {itens_json}\n\n'
+            else:
+                for versao_evento, item in alteracoes:
+                    yield f'id: {estado.geracao}-{versao_evento}\nevent: item\ndata: {json.dumps(item, ensure_ascii=False)}\n\n'
+            geracao, desde = estado.geracao, versao
+            
+            lotes = obter_motor().status_lotes() if motor else []
+            lote = lotes[-1] if lotes else None
+            # Reenvia o lote só quando as contagens mudam (a vazão sozinha muda a cada volta)
+            contagens = contagens_lote(lote)
+            if contagens != contagens_anteriores:
+                contagens_anteriores = contagens
+                yield f'event: lote\ndata: {json.dumps(lote)}\n\n'
+            elif alteracoes == []:
+                # Nada mudou no intervalo: mantém a conexão viva através de proxies
+                yield ': ping\n\n'
+    
+    return Response(
+        stream_with_context(transmitir()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def obter_motor():
+    """
+    Cria o motor de migração na primeira utilização
+    Com MODO_EXECUCAO=processos as migrações rodam em processos worker (mesma API)
+    """
+    global motor
+    with lock_motor:
+        if motor is None:
+            motor = SupervisorProcessos() if config.MODO_EXECUCAO == 'processos' else MotorMigracao()
+        return motor
+
+def obter_fila():
+    """
+    Abre a fila persistente na primeira utilização, exibe os jobs que ainda têm
+    trabalho, retoma os não finalizados e inicia o heartbeat dos arrendamentos
+    """
+    global fila
+    with lock_fila:
+        if fila is not None:
+            return fila
+        fila = FilaJobs()
+    # Encerramento normal devolve os arrendamentos: o próximo servidor retoma sem esperar o prazo
+    atexit.register(fila.liberar)
+    estado.substituir(fila.jobs_visiveis())
+    threading.Thread(target=manter_fila, name='fila-jobs', daemon=True).start()
+    despachar_jobs()
+    return fila
+
+def liberar_jobs_sem_tarefa():
+    """
+    Jobs arrendados por este processo que o motor não acompanha mais: com a tarefa
+    já finalizada grava o status final (callback perdido); sem tarefa devolve à fila
+    """
+    with lock_despacho:
+        orfaos = []
+        for id_job in fila.arrendados():
+            item = estado.obter(id_job)
+            id_tarefa = item.get('id_tarefa') if item else None
+            tarefa = obter_motor().status(id_tarefa) if id_tarefa is not None else None
+            if tarefa is None:
+                orfaos.append(id_job)
+            elif tarefa['status'] in STATUS_FINAIS:
+                registrar_job(id_job, status=tarefa['status'], mensagem=tarefa['mensagem'])
+        if orfaos:
+            print(f"🔁 {len(orfaos)} job(s) sem tarefa no motor devolvidos à fila")
+            fila.liberar(orfaos)
+
+def manter_fila():
+    """Heartbeat: renova os arrendamentos deste processo e pega jobs de processos que morreram"""
+    while True:
+        time.sleep(max(1, fila.lease / 3))
         try:
-            loop.run_until_complete(migrador.executar_migracao())
-            item['status'] = 'Concluído'
-            item['progresso'] = 100
-            item['mensagem'] = 'Migração concluída! Navegador aberto para verificação manual.'
+            liberar_jobs_sem_tarefa()
+            fila.renovar()
+            despachar_jobs()
         except Exception as e:
-            item['status'] = 'Erro'
-            item['mensagem'] = f'Erro: {str(e)}'
-        finally:
-            loop.close()
+            print(f"  ⚠ Erro no heartbeat da fila: {str(e)}")
+
+def registrar_job(id_job, steps=None, **campos):
+    """Aplica uma alteração no estado exibido e na fila persistente"""
+    estado.atualizar(id_job, steps=steps, **campos)
+    try:
+        fila.atualizar(id_job, steps=steps, **campos)
     except Exception as e:
-        item['status'] = 'Erro'
-        item['mensagem'] = f'Erro crítico: {str(e)}'
+        print(f"  ⚠ Erro ao gravar o job {id_job} na fila: {str(e)}")
 
-def executar_migracoes():
-    """Executa as migrações em paralelo"""
-    
-    # Filtra apenas itens pendentes
-    itens_pendentes = [
-        (protocolo, item) 
-        for protocolo, item in itens_migracao.items() 
-        if item['status'] == 'Pendente'
-    ]
-    
-    if not itens_pendentes:
-        return
+# Progresso exibido quando cada etapa informa andamento
+PROGRESSO_ETAPAS = {'Login': 20, 'Extração': 40, 'Preenchimento': 70, 'Anexos': 90}
+
+def submeter_migracao_item(job, lote=None):
+    """Agenda a migração de um job arrendado no motor"""
+    id_job = job['id']
     
-    # Executa até 20 migrações em paralelo (aumentado para processar grandes lotes rapidamente)
-    # Limite alto para permitir processar muitos itens ao mesmo tempo
-    max_workers = min(20, len(itens_pendentes))
+    def callback_progresso(step, status, mensagem=""):
+        campos = {'mensagem': mensagem}
+        if step in PROGRESSO_ETAPAS:
+            campos['steps'] = {step: status}
+            campos['progresso'] = PROGRESSO_ETAPAS[step]
+        registrar_job(id_job, **campos)
     
-    print(f"🚀 Iniciando {len(itens_pendentes)} migração(ões) com até {max_workers} em paralelo...")
+    def callback_status(status, mensagem=""):
+        campos = {'status': status}
+        if status == 'Concluído':
+            campos['progresso'] = 100
+        if status in STATUS_FINAIS:
+            # Só o motor (ou worker) com o formulário novo aberto consegue repetir apenas os anexos
+            campos['retomar_anexos'] = obter_motor().pode_retomar(job['protocolo'])
+        if mensagem:
+            campos['mensagem'] = mensagem
+        registrar_job(id_job, **campos)
     
-    # Usa ThreadPoolExecutor para executar em paralelo
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submete todas as migrações
-        futures = {
-            executor.submit(executar_migracao_item, protocolo, item): (protocolo, item)
-            for protocolo, item in itens_pendentes
-        }
+    id_tarefa = obter_motor().submeter(
+        job['protocolo'],
+        job['caminho_pasta'],
+        callback_progresso=callback_progresso,
+        callback_status=callback_status,
+        lote=lote
+    )
+    estado.atualizar(id_job, id_tarefa=id_tarefa)
+
+def despachar_jobs():
+    """
+    Arrenda os jobs disponíveis na fila (novos ou de um processo que morreu)
+    e agenda no motor, que limita quantos rodam em paralelo
+    Lotes em duas fases extraem todos os protocolos antes de qualquer preenchimento
+    """
+    with lock_despacho:
+        jobs = fila.arrendar()
+        if not jobs:
+            return
+        estado.adicionar(jobs)
         
-        # Aguarda todas completarem
-        for future in concurrent.futures.as_completed(futures):
-            protocolo, item = futures[future]
-            try:
-                future.result()  # Verifica se houve exceção
-            except Exception as e:
-                item['status'] = 'Erro'
-                item['mensagem'] = f'Erro na execução: {str(e)}'
+        por_lote = {}
+        for job in jobs:
+            por_lote.setdefault((job['lote'], job['duas_fases']), []).append(job)
+        
+        for (_, duas_fases), jobs_lote in por_lote.items():
+            retomados = sum(1 for job in jobs_lote if job['tentativas'] > 1)
+            if retomados:
+                print(f"🔁 Retomando {retomados} job(s) não finalizados da fila")
+            lote = None
+            if duas_fases:
+                lote = obter_motor().criar_lote_duas_fases(len(jobs_lote))
+                print(f"🚀 Lote em duas fases: {len(jobs_lote)} protocolo(s), até {lote.max_extracao} extrações "
+                      f"e {lote.max_preenchimento} preenchimentos em paralelo...")
+            else:
+                print(f"🚀 Iniciando {len(jobs_lote)} migração(ões) com até {obter_motor().max_concorrencia} em paralelo...")
+            for job in jobs_lote:
+                submeter_migracao_item(job, lote)
 
 def obter_ip_local():
     """Obtém o IP local da máquina"""
@@ -535,6 +763,13 @@ if __name__ == '__main__':
             print("💡 No macOS, isso geralmente acontece por causa do AirPlay Receiver.")
             print("   Para desabilitar: Preferências do Sistema → Compartilhamento → AirPlay Receiver")
     
+    # Com o reloader do modo debug este bloco roda também no processo que só vigia os arquivos;
+    # a fila (e a retomada dos jobs não finalizados) fica no processo que atende as requisições
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # SIGTERM encerra pelo caminho normal (atexit devolve os arrendamentos)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        obter_fila()
+    
     if rodar_rede:
         ip_local = obter_ip_local()
         print("🌐 Iniciando interface web na rede local...")
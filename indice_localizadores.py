@@ -0,0 +1,132 @@
+"""
+Índice de localizadores de campos, montado uma vez por página carregada
+Substitui as até 10 tentativas de query_selector por campo: todos os elementos
+com name/id são lidos em uma chamada e cada chave de `dados` é resolvida em
+memória com as mesmas regras de prioridade dos seletores CSS.
+Um re-render AJAX pode trocar os elementos: o índice é marcado como obsoleto e
+remontado antes da próxima resolução.
+"""
+
+
+ATRIBUTO_INDICE = 'data-migrador-idx'
+
+# Marca cada elemento com name/id (em ordem do documento) e devolve seus atributos
+SCRIPT_INDEXAR = """(atributo) => {
+    const elementos = document.querySelectorAll('[name], [id]');
+    return Array.from(elementos).map((el, i) => {
+        el.setAttribute(atributo, String(i));
+        return {tag: el.tagName.toLowerCase(), name: el.getAttribute('name'), id: el.getAttribute('id')};
+    });
+}"""
+
+
+def _sufixo(valor):
+    """Parte após o último ':' (só existe se o valor tiver ':')"""
+    if valor and ':' in valor:
+        return valor.rsplit(':', 1)[1]
+    return None
+
+
+class IndiceLocalizadores:
+    def __init__(self, elementos):
+        self._indexar(elementos)
+
+    def _indexar(self, elementos):
+        self.elementos = elementos
+        self.obsoleto = False
+        self.por_tag_name = {}
+        self.por_tag_id = {}
+        self.por_sufixo_name = {}
+        self.por_sufixo_id = {}
+        self._contem_cache = {}
+
+        # Guarda sempre o primeiro elemento em ordem do documento (como query_selector)
+        for indice, el in enumerate(elementos):
+            tag, name, id_attr = el['tag'], el['name'], el['id']
+            if name is not None:
+                self.por_tag_name.setdefault((tag, name), indice)
+                sufixo = _sufixo(name)
+                if sufixo is not None:
+                    self.por_sufixo_name.setdefault(sufixo, indice)
+            if id_attr is not None:
+                self.por_tag_id.setdefault((tag, id_attr), indice)
+                sufixo = _sufixo(id_attr)
+                if sufixo is not None:
+                    self.por_sufixo_id.setdefault(sufixo, indice)
+
+    @classmethod
+    async def montar(cls, page):
+        """Lê todos os elementos com name/id da página em uma única chamada"""
+        elementos = await page.evaluate(SCRIPT_INDEXAR, ATRIBUTO_INDICE)
+        print(f"  🗂️ Índice de localizadores montado ({len(elementos)} elementos)")
+        return cls(elementos)
+
+    def marcar_obsoleto(self):
+        """Um re-render AJAX pode ter trocado ou incluído elementos"""
+        self.obsoleto = True
+
+    async def atualizar(self, page):
+        """
+        Remonta o índice se ele ficou obsoleto
+        Retorna True se remontou (os campos precisam ser resolvidos de novo)
+        """
+        if not self.obsoleto:
+            return False
+        elementos = await page.evaluate(SCRIPT_INDEXAR, ATRIBUTO_INDICE)
+        self._indexar(elementos)
+        print(f"  🗂️ Índice de localizadores remontado após re-render ({len(elementos)} elementos)")
+        return True
+
+    def _contem(self, atributo, trecho):
+        chave = (atributo, trecho)
+        if chave not in self._contem_cache:
+            self._contem_cache[chave] = next(
+                (i for i, el in enumerate(self.elementos) if el[atributo] is not None and trecho in el[atributo]),
+                None
+            )
+        return self._contem_cache[chave]
+
+    def regras_campo(self, campo, mapeamento_especial):
+        """
+        Regras equivalentes aos seletores de MigradorPEP.montar_seletores_campo, na mesma ordem
+        """
+        campo_final_name = campo.split(":")[-1]
+        regras = [
+            ('tag_name', 'input', campo), ('tag_name', 'textarea', campo), ('tag_name', 'select', campo),
+            ('tag_id', 'input', campo), ('tag_id', 'textarea', campo), ('tag_id', 'select', campo),
+            ('sufixo_name', campo_final_name), ('sufixo_id', campo_final_name)
+        ]
+        for chave_esp, seletor_esp in mapeamento_especial.items():
+            if chave_esp.lower() in campo.lower():
+                regras.insert(0, ('contem', 'id', seletor_esp))
+                regras.insert(0, ('contem', 'name', seletor_esp))
+        return regras
+
+    def resolver(self, campo, mapeamento_especial):
+        """
+        Resolve o campo em memória
+        Retorna o índice do elemento na página ou None se não existir
+        """
+        for regra in self.regras_campo(campo, mapeamento_especial):
+            tipo = regra[0]
+            if tipo == 'tag_name':
+                indice = self.por_tag_name.get((regra[1], regra[2]))
+            elif tipo == 'tag_id':
+                indice = self.por_tag_id.get((regra[1], regra[2]))
+            elif tipo == 'sufixo_name':
+                indice = self.por_sufixo_name.get(regra[1])
+            elif tipo == 'sufixo_id':
+                indice = self.por_sufixo_id.get(regra[1])
+            else:
+                indice = self._contem(regra[1], regra[2])
+            if indice is not None:
+                return indice
+        return None
+
+    async def elemento(self, page, indice):
+        """
+        Retorna o ElementHandle do índice (None se o elemento foi re-renderizado pelo AJAX)
+        """
+        if indice is None:
+            return None
+        return await page.query_selector(f'[{ATRIBUTO_INDICE}="{indice}"]')
@@ -0,0 +1,168 @@
+"""
+Busca flexível de logradouros com índice invertido
+Recebe a lista de opções do select uma única vez, pré-calcula as formas
+normalizadas e indexa por palavra e por trigrama.
+"""
+from collections import defaultdict
+
+
+ARTIGOS = [' da ', ' de ', ' do ', ' das ', ' dos ', ' e ', ' em ', ' na ', ' no ']
+
+
+def normalizar_nome_logradouro(nome):
+    """
+    Normaliza o nome do logradouro para comparação:
+    - Remove artigos comuns (DA, DE, DO, DAS, DOS)
+    - Remove espaços extras
+    - Converte para minúsculas
+    - Remove acentos (simplificado)
+    """
+    if not nome:
+        return ""
+
+    # Converte para minúsculas e remove espaços extras
+    nome = nome.lower().strip()
+
+    # Remove artigos comuns
+    for artigo in ARTIGOS:
+        nome = nome.replace(artigo, ' ')
+
+    # Remove espaços múltiplos
+    nome = ' '.join(nome.split())
+
+    return nome
+
+
+def comparar_normalizados(nome1_norm, nome2_norm):
+    """
+    Compara dois nomes já normalizados de forma flexível
+    Retorna True se forem considerados equivalentes
+    """
+    # Match exato após normalização
+    if nome1_norm == nome2_norm:
+        return True
+
+    # Extrai palavras-chave (ignora artigos e palavras muito curtas)
+    palavras1 = [p for p in nome1_norm.split() if len(p) > 2]
+    palavras2 = [p for p in nome2_norm.split() if len(p) > 2]
+
+    if not palavras1 or not palavras2:
+        return False
+
+    # Verifica se todas as palavras importantes de nome1 estão em nome2
+    # (permite que nome2 tenha palavras a mais, mas deve conter as principais)
+    palavras_encontradas = sum(1 for p1 in palavras1 if any(p1 in p2 or p2 in p1 for p2 in palavras2))
+
+    # Se pelo menos 70% das palavras foram encontradas, considera match
+    if palavras_encontradas >= len(palavras1) * 0.7:
+        return True
+
+    # Tenta match reverso (palavras de nome2 em nome1)
+    palavras_encontradas_reverso = sum(1 for p2 in palavras2 if any(p2 in p1 or p1 in p2 for p1 in palavras1))
+    if palavras_encontradas_reverso >= len(palavras2) * 0.7:
+        return True
+
+    return False
+
+
+def comparar_logradouros(nome1, nome2):
+    """
+    Compara dois nomes de logradouro de forma flexível
+    Retorna True se forem considerados equivalentes
+    """
+    if not nome1 or not nome2:
+        return False
+    return comparar_normalizados(normalizar_nome_logradouro(nome1), normalizar_nome_logradouro(nome2))
+
+
+def trigramas(texto):
+    texto = f'  {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class LogradouroIndex:
+    """
+    Índice das opções de logradouro de um select
+
+    buscar() reproduz as regras do select: match exato (sem diferenciar
+    maiúsculas), senão o melhor match flexível com score > 0.5. Só opções
+    que compartilham ao menos uma palavra normalizada com o nome podem ter
+    score > 0, então apenas elas são comparadas.
+    """
+
+    def __init__(self, opcoes):
+        # opcoes: [(valor, texto), ...] na ordem do select
+        self.opcoes = []
+        self.exatos = {}
+        self.por_palavra = defaultdict(list)
+        self.por_trigrama = defaultdict(set)
+
+        for valor, texto in opcoes:
+            if not texto or not valor:
+                continue
+            posicao = len(self.opcoes)
+            normalizado = normalizar_nome_logradouro(texto)
+            palavras = set(normalizado.split())
+            self.opcoes.append((valor, texto, normalizado, palavras))
+            self.exatos.setdefault(texto.strip().lower(), posicao)
+            for palavra in palavras:
+                self.por_palavra[palavra].append(posicao)
+            for trigrama in trigramas(normalizado):
+                self.por_trigrama[trigrama].add(posicao)
+
+    def __len__(self):
+        return len(self.opcoes)
+
+    def _score(self, palavras_nome, palavras_opcao):
+        palavras_comuns = palavras_nome.intersection(palavras_opcao)
+        return len(palavras_comuns) / max(len(palavras_nome), len(palavras_opcao), 1)
+
+    def buscar(self, nome_logradouro):
+        """
+        Retorna (valor, texto, score, tipo) do melhor match ou None
+        tipo é 'exato' ou 'flexivel'
+        """
+        nome_limpo = nome_logradouro.strip()
+
+        posicao = self.exatos.get(nome_limpo.lower())
+        if posicao is not None:
+            valor, texto, _, _ = self.opcoes[posicao]
+            return (valor, texto, 1.0, 'exato')
+
+        nome_norm = normalizar_nome_logradouro(nome_limpo)
+        palavras_nome = set(nome_norm.split())
+        candidatas = sorted({p for palavra in palavras_nome for p in self.por_palavra.get(palavra, [])})
+
+        melhor_match = None
+        melhor_score = 0
+        for posicao in candidatas:
+            valor, texto, normalizado, palavras = self.opcoes[posicao]
+            if nome_limpo and comparar_normalizados(nome_norm, normalizado):
+                score = self._score(palavras_nome, palavras)
+                if score > melhor_score:
+                    melhor_score = score
+                    melhor_match = (valor, texto)
+
+        # Só aceita match com score razoável
+        if melhor_match and melhor_score > 0.5:
+            return (melhor_match[0], melhor_match[1], melhor_score, 'flexivel')
+        return None
+
+    def candidatos(self, nome_logradouro, limite=5):
+        """
+        Lista ranqueada [(score, valor, texto), ...] por similaridade de trigramas
+        Útil como sugestão quando buscar() não encontra nada
+        """
+        trigramas_nome = trigramas(normalizar_nome_logradouro(nome_logradouro))
+        contagem = defaultdict(int)
+        for trigrama in trigramas_nome:
+            for posicao in self.por_trigrama.get(trigrama, ()):
+                contagem[posicao] += 1
+
+        ranking = []
+        for posicao, comuns in contagem.items():
+            valor, texto, normalizado, _ = self.opcoes[posicao]
+            total = len(trigramas_nome) + len(trigramas(normalizado)) - comuns
+            ranking.append((comuns / total if total else 0.0, valor, texto))
+        ranking.sort(key=lambda item: -item[0])
+        return ranking[:limite]
@@ -4,12 +4,61 @@ Script para migração automática de formulários do PEP CELESC
 import asyncio
 import sys
 import os
-from playwright.async_api import async_playwright
+import time
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import config
+from pool_navegadores import lancar_navegador, criar_contexto
+from espera_ajax import aguardar_ajax_ocioso, executar_e_aguardar_ajax, pagina_tem_ajax, assinatura_opcoes, aguardar_opcoes_alteradas
+from snapshot_formulario import SCRIPT_SNAPSHOT_FORMULARIO, montar_dados, resumo_itinerario
+from extracao_http import ExtratorHTTP
+from cliente_jsf import ClienteJSF
+from indice_localizadores import IndiceLocalizadores
+from cache_opcoes import CacheOpcoes, NIVEIS
+from snapshots_extracao import ArmazemSnapshots
+from bloqueio_recursos import PerfilBloqueio
+from cache_recursos import CacheRecursos
+from ritmo_adaptativo import ControladorRitmo
+from agendador_cascatas import montar_grafo, executar_grafo
+from indice_logradouros import LogradouroIndex, normalizar_nome_logradouro, comparar_logradouros
+from preenchimento_lote import preencher_em_lote, PREENCHIDO, AUSENTE, REJEITADO, SEQUENCIAL, LOTE, VALORES_MARCADO
+
+
+SCRIPT_OPCOES_SELECT = """(nome) => {
+    const select = document.querySelector(`select[name="${nome}"]`);
+    if (!select) return [];
+    return Array.from(select.options)
+        .filter(o => o.getAttribute('value'))
+        .map(o => [o.getAttribute('value'), o.innerText]);
+}"""
+
+# Valor atual e quantidade de opções de vários selects em uma única chamada
+SCRIPT_ESTADO_SELECTS = """(nomes) => nomes.map(nome => {
+    const select = document.querySelector(`select[name="${nome}"]`);
+    if (!select) return null;
+    return {valor: select.value, opcoes: Array.from(select.options).filter(o => o.getAttribute('value')).length};
+})"""
+
+ROTULOS_NIVEIS = {'estado': 'Estado', 'municipio': 'Município', 'bairro': 'Bairro', 'logradouro': 'Logradouro'}
+
+# Textos das células e links da aba Anexos (arquivos já enviados); ignora a fila
+# do FileUpload (.ui-fileupload-files), que lista arquivos ainda não enviados
+SCRIPT_ANEXOS_LISTADOS = """() => {
+    const aba = document.getElementById('form:tabs:tabAnexo');
+    if (!aba) return [];
+    return Array.from(aba.querySelectorAll('.ui-datatable tbody td, .ui-datatable tbody a, a[href]'))
+        .filter(el => !el.closest('.ui-fileupload-files'))
+        .map(el => el.innerText);
+}"""
+
+
+def filtrar_anexos_pendentes(arquivos, nomes_listados):
+    """Arquivos cujo nome ainda não aparece entre os anexos listados na página"""
+    listados = {nome.strip().lower() for nome in nomes_listados if nome}
+    return [arq for arq in arquivos if os.path.basename(arq).lower() not in listados]
 
 
 class MigradorPEP:
-    def __init__(self, protocolo, caminho_pasta_anexos=None, callback_progresso=None, manter_navegador_aberto=False):
+    def __init__(self, protocolo, caminho_pasta_anexos=None, callback_progresso=None, manter_navegador_aberto=False, pool=None, sessao=None, cache_opcoes=None, snapshots=None):
         self.protocolo = protocolo
         self.caminho_pasta_anexos = caminho_pasta_anexos
         self.url_login = config.URL_LOGIN
@@ -17,8 +66,27 @@ class MigradorPEP:
         self.usuario = config.USUARIO
         self.senha = config.SENHA
         self.delay = config.DELAY_PREENCHIMENTO
+        # Atraso entre campos ajustado às respostas do PEP (parte de DELAY_PREENCHIMENTO)
+        self.ritmo = ControladorRitmo(inicial=self.delay)
         self.headless = config.HEADLESS
         self.callback_progresso = callback_progresso
+        # Pool de navegadores compartilhado (lotes); sem pool lança um Chromium próprio
+        self.pool = pool
+        # Sessão de login compartilhada do lote (GerenciadorSessao); exige pool
+        self.sessao = sessao
+        self.versao_sessao = None
+        # Cache das opções Estado/Município/Bairro/Logradouro (CacheOpcoes), opcional
+        self.cache_opcoes = cache_opcoes
+        # Dados já extraídos por protocolo (ArmazemSnapshots), opcional
+        self.snapshots = snapshots
+        # Bloqueio de imagens/fontes/etc. no contexto da migração (PerfilBloqueio)
+        self.bloqueio = None
+        # Início e fim de cada etapa (time.time()), para medir a sobreposição do pipeline
+        self.tempos_etapas = {}
+        # Checkpoint de cada etapa (Login, Extração, Preenchimento, Anexos) desta migração
+        self.checkpoints = {}
+        # Aba do formulário novo preenchido, mantida para repetir só os anexos
+        self.page_nova = None
         # SEMPRE manter navegador aberto quando usado pela GUI web
         self.manter_navegador_aberto = True
         
@@ -31,6 +99,18 @@ class MigradorPEP:
         if self.callback_progresso:
             self.callback_progresso(step, status, mensagem)
 
+    async def navegar(self, page, url):
+        """
+        Navega para a URL; se a sessão compartilhada tiver expirado
+        (redirecionamento para o login), renova o login do lote e tenta de novo
+        """
+        await page.goto(url, wait_until='networkidle')
+        if self.sessao and self.sessao.expirou(page):
+            self.versao_sessao = await self.sessao.reautenticar(page.context, self.versao_sessao)
+            await page.goto(url, wait_until='networkidle')
+            if self.sessao.expirou(page):
+                raise Exception("Sessão expirada e não foi possível renovar o login")
+
     async def fazer_login(self, page):
         """
         Realiza login no sistema PEP
@@ -39,7 +119,7 @@ class MigradorPEP:
         print(f"🌐 Acessando: {self.url_login}")
         
         await page.goto(self.url_login, wait_until='networkidle')
-        await page.wait_for_timeout(2000)
+        await aguardar_ajax_ocioso(page)
         
         # Procura pelos campos de login
         # Tenta diferentes seletores comuns para campos de login
@@ -93,7 +173,6 @@ class MigradorPEP:
         # Preenche usuário
         if campo_usuario:
             await campo_usuario.fill(self.usuario)
-            await page.wait_for_timeout(500)
             print(f"  ✓ Usuário preenchido")
         else:
             raise Exception("Campo de usuário não encontrado")
@@ -101,7 +180,6 @@ class MigradorPEP:
         # Preenche senha
         if campo_senha:
             await campo_senha.fill(self.senha)
-            await page.wait_for_timeout(500)
             print(f"  ✓ Senha preenchida")
         else:
             raise Exception("Campo de senha não encontrado")
@@ -129,16 +207,18 @@ class MigradorPEP:
         
         if botao_login:
             await botao_login.click()
-            await page.wait_for_timeout(3000)
             print(f"  ✓ Login realizado")
         else:
             # Tenta pressionar Enter no campo de senha
             await campo_senha.press('Enter')
-            await page.wait_for_timeout(3000)
             print(f"  ✓ Tentativa de login (Enter pressionado)")
         
         # Verifica se o login foi bem-sucedido (aguarda redirecionamento ou mudança na URL)
-        await page.wait_for_timeout(2000)
+        try:
+            await page.wait_for_url(lambda url: 'login' not in url.lower(), timeout=config.TIMEOUT_AJAX)
+            await page.wait_for_load_state('networkidle')
+        except PlaywrightTimeoutError:
+            pass
         url_atual = page.url
         if 'login' not in url_atual.lower():
             print(f"  ✅ Login bem-sucedido! Redirecionado para: {url_atual}")
@@ -147,53 +227,42 @@ class MigradorPEP:
             await page.screenshot(path='debug_pos_login.png')
             print("  📸 Screenshot salvo em debug_pos_login.png")
 
+    async def extrair_snapshot(self, page):
+        """
+        Lê todos os campos e o itinerário da página em uma única chamada ao navegador
+        """
+        return await page.evaluate(SCRIPT_SNAPSHOT_FORMULARIO)
+
     async def extrair_resumo_itinerario(self, page):
         """
         Extrai o resumo do itinerário de um input/textarea que contém logradouros separados por ponto e vírgula
         Retorna lista de logradouros
         """
         try:
-            # Procura por input ou textarea que contenha o resumo do itinerário
-            # Pode estar em um campo hidden ou visível
-            selectors = [
-                'input[type="hidden"][value*=";"]',
-                'textarea[value*=";"]',
-                'input[value*=";"]',
-                'textarea'
-            ]
-            
-            for selector in selectors:
-                elementos = await page.query_selector_all(selector)
-                for elemento in elementos:
-                    value = await elemento.input_value() if await elemento.evaluate('el => el.tagName.toLowerCase()') == 'textarea' else await elemento.get_attribute('value')
-                    
-                    if value and ';' in value:
-                        # Separa por ponto e vírgula e limpa os valores
-                        logradouros = [log.strip() for log in value.split(';') if log.strip()]
-                        if logradouros:
-                            print(f"  📋 {len(logradouros)} logradouros encontrados no itinerário (separados por ;)")
-                            return logradouros
-            
-            # Se não encontrou com ponto e vírgula, tenta extrair da tabela
-            tabela = await page.query_selector('#form\\:tabs\\:tableLogradouros')
-            if tabela:
-                linhas = await tabela.query_selector_all('tbody tr:not(.ui-datatable-empty-message)')
-                logradouros = []
-                for linha in linhas:
-                    celula = await linha.query_selector('td:first-child')
-                    if celula:
-                        texto = await celula.inner_text()
-                        if texto and texto.strip():
-                            logradouros.append(texto.strip())
-                if logradouros:
-                    print(f"  📋 {len(logradouros)} logradouros encontrados na tabela do itinerário")
-                    return logradouros
-            
-            return []
+            return resumo_itinerario(await self.extrair_snapshot(page))
         except Exception as e:
             print(f"  ⚠ Erro ao extrair resumo do itinerário: {str(e)}")
             return []
 
+    async def extrair_dados_por_http(self, page):
+        """
+        Extrai o formulário antigo por HTTP com os cookies do contexto da página
+        Retorna None (para cair na extração pelo navegador) se algo der errado
+        """
+        try:
+            storage_state = await page.context.storage_state()
+            extrator = ExtratorHTTP(storage_state)
+            # requests é bloqueante: roda fora do event loop compartilhado
+            snapshot = await asyncio.to_thread(extrator.extrair_snapshot, self.url_antiga)
+        except Exception as e:
+            print(f"  ⚠ Extração por HTTP indisponível ({str(e)}), usando o navegador")
+            return None
+        
+        print("  ⚡ Formulário lido por HTTP (sem navegador)")
+        dados = montar_dados(snapshot)
+        print(f"  ✅ {len(dados)} campos encontrados com valores")
+        return dados
+
     async def extrair_dados_formulario_antigo(self, page):
         """
         Extrai os dados do formulário antigo (com protocolo)
@@ -201,286 +270,62 @@ class MigradorPEP:
         print(f"\n📥 Extraindo dados do formulário antigo...")
         print(f"🌐 Acessando: {self.url_antiga}")
         
-        await page.goto(self.url_antiga, wait_until='networkidle')
-        await page.wait_for_timeout(3000)  # Aguarda carregamento completo
+        if config.MODO_EXTRACAO == 'http':
+            dados = await self.extrair_dados_por_http(page)
+            if dados is not None:
+                return dados
         
-        dados = {}
+        await self.navegar(page, self.url_antiga)
+        await aguardar_ajax_ocioso(page)  # Aguarda carregamento completo
         
-        # Extrai todos os tipos de campos
+        # Extrai todos os tipos de campos (inputs, textareas, selects, marcados) e o itinerário
         print("  🔍 Procurando campos no formulário...")
-        
-        # Inputs de texto, email, tel, number (NÃO inclui hidden)
-        inputs = await page.query_selector_all('input[type="text"], input[type="email"], input[type="tel"], input[type="number"], input:not([type])')
-        for input_elem in inputs:
-            name = await input_elem.get_attribute('name')
-            id_attr = await input_elem.get_attribute('id')
-            input_type = await input_elem.get_attribute('type')
-            
-            # Ignora campos de sistema JSF e campos especiais
-            if name and ('j_idt' in name or 'javax.faces.ViewState' in name or name == 'form'):
-                continue
-            
-            try:
-                value = await input_elem.input_value()
-            except:
-                # Tenta pegar o valor via atributo value
-                value = await input_elem.get_attribute('value') or ''
-            
-            # Captura TODOS os campos (mesmo vazios) - importante para campos como Fabricante, Especificação, etc.
-            if name:
-                dados[name] = value or ''
-            elif id_attr:
-                dados[id_attr] = value or ''
-        
-        # Textareas (ignora campos de sistema)
-        textareas = await page.query_selector_all('textarea')
-        for textarea in textareas:
-            name = await textarea.get_attribute('name')
-            id_attr = await textarea.get_attribute('id')
-            
-            # Ignora campos de sistema JSF
-            if name and 'j_idt' in name:
-                continue
-            
-            try:
-                value = await textarea.input_value()
-            except:
-                value = ''
-            
-            # Captura TODOS os textareas (mesmo vazios)
-            if name:
-                dados[name] = value or ''
-            elif id_attr:
-                dados[id_attr] = value or ''
-        
-        # Selects (dropdowns) - captura TODOS, mesmo vazios
-        selects = await page.query_selector_all('select')
-        for select in selects:
-            name = await select.get_attribute('name')
-            id_attr = await select.get_attribute('id')
-            try:
-                value = await select.evaluate('el => el.value')
-            except:
-                value = ''
-            
-            # Captura TODOS os selects (mesmo vazios)
-            if name:
-                dados[name] = value or ''
-            elif id_attr:
-                dados[id_attr] = value or ''
-        
-        # Checkboxes e radios selecionados
-        checkboxes = await page.query_selector_all('input[type="checkbox"]:checked, input[type="radio"]:checked')
-        for checkbox in checkboxes:
-            name = await checkbox.get_attribute('name')
-            id_attr = await checkbox.get_attribute('id')
-            value = await checkbox.get_attribute('value')
-            if value:
-                if name:
-                    dados[name] = value
-                elif id_attr:
-                    dados[id_attr] = value
-        
-        # Extrai resumo do itinerário
-        dados['_itinerario_logradouros'] = await self.extrair_resumo_itinerario(page)
+        snapshot = await self.extrair_snapshot(page)
+        dados = montar_dados(snapshot)
         
         print(f"  ✅ {len(dados)} campos encontrados com valores")
         return dados
 
     def normalizar_nome_logradouro(self, nome):
-        """
-        Normaliza o nome do logradouro para comparação:
-        - Remove artigos comuns (DA, DE, DO, DAS, DOS)
-        - Remove espaços extras
-        - Converte para minúsculas
-        - Remove acentos (simplificado)
-        """
-        if not nome:
-            return ""
-        
-        # Converte para minúsculas e remove espaços extras
-        nome = nome.lower().strip()
-        
-        # Remove artigos comuns
-        artigos = [' da ', ' de ', ' do ', ' das ', ' dos ', ' e ', ' em ', ' na ', ' no ']
-        for artigo in artigos:
-            nome = nome.replace(artigo, ' ')
-        
-        # Remove espaços múltiplos
-        nome = ' '.join(nome.split())
-        
-        return nome
+        """Normaliza o nome do logradouro para comparação (ver indice_logradouros)"""
+        return normalizar_nome_logradouro(nome)
     
     def comparar_logradouros(self, nome1, nome2):
         """
         Compara dois nomes de logradouro de forma flexível
         Retorna True se forem considerados equivalentes
         """
-        if not nome1 or not nome2:
-            return False
-        
-        # Normaliza ambos
-        nome1_norm = self.normalizar_nome_logradouro(nome1)
-        nome2_norm = self.normalizar_nome_logradouro(nome2)
-        
-        # Match exato após normalização
-        if nome1_norm == nome2_norm:
-            return True
-        
-        # Extrai palavras-chave (ignora artigos e palavras muito curtas)
-        palavras1 = [p for p in nome1_norm.split() if len(p) > 2]
-        palavras2 = [p for p in nome2_norm.split() if len(p) > 2]
-        
-        if not palavras1 or not palavras2:
-            return False
-        
-        # Verifica se todas as palavras importantes de nome1 estão em nome2
-        # (permite que nome2 tenha palavras a mais, mas deve conter as principais)
-        palavras_encontradas = sum(1 for p1 in palavras1 if any(p1 in p2 or p2 in p1 for p2 in palavras2))
-        
-        # Se pelo menos 70% das palavras foram encontradas, considera match
-        if palavras_encontradas >= len(palavras1) * 0.7:
-            return True
-        
-        # Tenta match reverso (palavras de nome2 em nome1)
-        palavras_encontradas_reverso = sum(1 for p2 in palavras2 if any(p2 in p1 or p1 in p2 for p1 in palavras1))
-        if palavras_encontradas_reverso >= len(palavras2) * 0.7:
-            return True
-        
-        return False
+        return comparar_logradouros(nome1, nome2)
 
     async def buscar_logradouro_no_select(self, page, nome_logradouro):
         """
         Busca um logradouro no select do itinerário com lógica flexível para lidar com abreviações
+        As opções são lidas em uma única chamada e comparadas pelo LogradouroIndex
         Retorna True se encontrado e selecionado
         """
+        campo = 'form:tabs:logradouroItinerario'
         try:
-            select_logradouro = await page.query_selector('select[name="form:tabs:logradouroItinerario"]')
+            select_logradouro = await page.query_selector(f'select[name="{campo}"]')
             if not select_logradouro:
                 return False
             
-            # Pega todas as opções do select (exceto a opção vazia)
-            opcoes = await select_logradouro.query_selector_all('option[value]:not([value=""])')
-            
-            nome_logradouro_limpo = nome_logradouro.strip()
-            
-            # Primeiro tenta match exato (case insensitive)
-            for opcao in opcoes:
-                texto = await opcao.inner_text()
-                valor = await opcao.get_attribute('value')
-                
-                if not texto or not valor:
-                    continue
-                
-                texto_limpo = texto.strip()
-                
-                # Match exato
-                if texto_limpo.lower() == nome_logradouro_limpo.lower():
-                    await select_logradouro.select_option(value=valor)
-                    await page.wait_for_timeout(500)
-                    print(f"      ✓ Logradouro encontrado (match exato): {texto}")
-                    return True
-            
-            # Se não encontrou match exato, tenta busca flexível
-            melhor_match = None
-            melhor_score = 0
-            
-            for opcao in opcoes:
-                texto = await opcao.inner_text()
-                valor = await opcao.get_attribute('value')
-                
-                if not texto or not valor:
-                    continue
-                
-                # Usa a função de comparação flexível
-                if self.comparar_logradouros(nome_logradouro_limpo, texto):
-                    # Calcula um score baseado na similaridade
-                    nome_norm = self.normalizar_nome_logradouro(nome_logradouro_limpo)
-                    texto_norm = self.normalizar_nome_logradouro(texto)
-                    
-                    # Score baseado em quantas palavras coincidem
-                    palavras1 = set(nome_norm.split())
-                    palavras2 = set(texto_norm.split())
-                    palavras_comuns = palavras1.intersection(palavras2)
-                    score = len(palavras_comuns) / max(len(palavras1), len(palavras2), 1)
-                    
-                    if score > melhor_score:
-                        melhor_score = score
-                        melhor_match = (texto, valor)
-            
-            # Se encontrou um match com score razoável, seleciona
-            if melhor_match and melhor_score > 0.5:
-                await select_logradouro.select_option(value=melhor_match[1])
-                await page.wait_for_timeout(500)
-                print(f"      ✓ Logradouro encontrado (match flexível, score: {melhor_score:.2f}): {melhor_match[0]}")
-                return True
-            
-            return False
-        except Exception as e:
-            print(f"    ⚠ Erro ao buscar logradouro: {str(e)}")
-            return False
-
-    async def buscar_logradouro_em_bairro(self, page, estado, municipio, bairro, nome_logradouro):
-        """
-        Busca um logradouro em um bairro específico
-        Retorna True se encontrado e selecionado
-        """
-        try:
-            # Preenche Estado
-            if not await self.preencher_select_dependente(page, 'form:tabs:estadoItinerario', estado, 2000):
+            indice = LogradouroIndex(await self.ler_opcoes_select(page, campo))
+            resultado = indice.buscar(nome_logradouro)
+            if not resultado:
+                sugestoes = indice.candidatos(nome_logradouro, limite=3)
+                if sugestoes:
+                    print(f"      💡 Mais parecidos: {', '.join(texto for _, _, texto in sugestoes)}")
                 return False
             
-            # Preenche Município
-            if not await self.preencher_select_dependente(page, 'form:tabs:municipioItinerario', municipio, 2000):
-                return False
-            
-            # Preenche Bairro
-            if not await self.preencher_select_dependente(page, 'form:tabs:bairroItinerario', bairro, 2000):
-                return False
-            
-            # Busca o logradouro
-            return await self.buscar_logradouro_no_select(page, nome_logradouro)
-        except Exception as e:
-            print(f"    ⚠ Erro ao buscar logradouro em bairro: {str(e)}")
-            return False
-
-    async def buscar_logradouro_em_todos_bairros(self, page, estado, municipio, nome_logradouro):
-        """
-        Busca um logradouro em todos os bairros do município
-        Retorna True se encontrado
-        """
-        try:
-            # Preenche Estado
-            if not await self.preencher_select_dependente(page, 'form:tabs:estadoItinerario', estado, 2000):
-                return False
-            
-            # Preenche Município
-            if not await self.preencher_select_dependente(page, 'form:tabs:municipioItinerario', municipio, 2000):
-                return False
-            
-            # Pega todos os bairros disponíveis
-            select_bairro = await page.query_selector('select[name="form:tabs:bairroItinerario"]')
-            if not select_bairro:
-                return False
-            
-            opcoes_bairro = await select_bairro.query_selector_all('option[value]:not([value=""])')
-            
-            for opcao_bairro in opcoes_bairro:
-                valor_bairro = await opcao_bairro.get_attribute('value')
-                if not valor_bairro:
-                    continue
-                
-                # Seleciona o bairro
-                await select_bairro.select_option(value=valor_bairro)
-                await page.wait_for_timeout(2000)  # Aguarda carregar logradouros
-                
-                # Busca o logradouro neste bairro
-                if await self.buscar_logradouro_no_select(page, nome_logradouro):
-                    return True
-            
-            return False
+            valor, texto, score, tipo = resultado
+            await executar_e_aguardar_ajax(page, lambda: select_logradouro.select_option(value=valor), campo=campo)
+            if tipo == 'exato':
+                print(f"      ✓ Logradouro encontrado (match exato): {texto}")
+            else:
+                print(f"      ✓ Logradouro encontrado (match flexível, score: {score:.2f}): {texto}")
+            return True
         except Exception as e:
-            print(f"    ⚠ Erro ao buscar logradouro em todos os bairros: {str(e)}")
+            print(f"    ⚠ Erro ao buscar logradouro: {str(e)}")
             return False
 
     async def processar_itinerario(self, page, dados):
@@ -537,24 +382,10 @@ class MigradorPEP:
             print(f"    📍 Usando referência: {ponto_ref} ({estado_ref} / {municipio_ref} / {bairro_ref})")
             
             try:
-                # Passo 1: Preenche Estado do Itinerário
-                print(f"    📍 Preenchendo Estado...")
-                if not await self.preencher_select_dependente(page, 'form:tabs:estadoItinerario', estado_ref, 2000):
-                    print(f"    ⚠ Não foi possível preencher Estado")
-                    logradouros_nao_encontrados.append(nome_logradouro)
-                    continue
-                
-                # Passo 2: Preenche Município do Itinerário
-                print(f"    📍 Preenchendo Município...")
-                if not await self.preencher_select_dependente(page, 'form:tabs:municipioItinerario', municipio_ref, 2000):
-                    print(f"    ⚠ Não foi possível preencher Município")
-                    logradouros_nao_encontrados.append(nome_logradouro)
-                    continue
-                
-                # Passo 3: Preenche Bairro do Itinerário
-                print(f"    📍 Preenchendo Bairro...")
-                if not await self.preencher_select_dependente(page, 'form:tabs:bairroItinerario', bairro_ref, 2000):
-                    print(f"    ⚠ Não foi possível preencher Bairro")
+                # Passos 1-3: Estado/Município/Bairro, só os níveis que mudaram desde o logradouro anterior
+                nivel_falho = await self.sincronizar_cascata(page, 'Itinerario', [estado_ref, municipio_ref, bairro_ref])
+                if nivel_falho:
+                    print(f"    ⚠ Não foi possível preencher {ROTULOS_NIVEIS[nivel_falho]}")
                     logradouros_nao_encontrados.append(nome_logradouro)
                     continue
                 
@@ -575,8 +406,8 @@ class MigradorPEP:
                             botao_incluir = await page.query_selector('button:has-text("Incluir")')
                             
                         if botao_incluir:
-                            await botao_incluir.click()
-                            await page.wait_for_timeout(2000)  # Aguarda adicionar na tabela e limpar formulário
+                            # Aguarda adicionar na tabela e limpar formulário
+                            await executar_e_aguardar_ajax(page, botao_incluir.click)
                             print(f"    ✓ Logradouro adicionado ao itinerário")
                             logradouros_encontrados.append(nome_logradouro)
                         else:
@@ -663,8 +494,8 @@ class MigradorPEP:
         Muda para a aba Anexos
         """
         try:
-            # Aguarda um pouco para garantir que a página está pronta
-            await page.wait_for_timeout(1000)
+            # Garante que a página está pronta
+            await aguardar_ajax_ocioso(page)
             
             print("    🔍 Procurando aba 'Anexos'...")
             
@@ -693,7 +524,6 @@ class MigradorPEP:
             if aba_anexos:
                 # Rola até o elemento se necessário
                 await aba_anexos.scroll_into_view_if_needed()
-                await page.wait_for_timeout(500)
                 
                 # Verifica se já está ativa
                 classes = await aba_anexos.evaluate('el => el.closest("li")?.className || ""')
@@ -703,8 +533,7 @@ class MigradorPEP:
                 
                 # Clica na aba
                 print("    👆 Clicando na aba 'Anexos'...")
-                await aba_anexos.click()
-                await page.wait_for_timeout(2000)  # Aguarda aba carregar
+                await executar_e_aguardar_ajax(page, aba_anexos.click)  # Aguarda aba carregar
                 
                 # Verifica se a aba foi ativada (procura pelo painel visível)
                 try:
@@ -731,7 +560,7 @@ class MigradorPEP:
                     
                     print("  ⚠ Aba 'Anexos' clicada, mas pode não estar totalmente visível")
                     print("  💡 Verificando manualmente...")
-                    await page.wait_for_timeout(2000)
+                    await aguardar_ajax_ocioso(page)
                     return True  # Assume que funcionou
             else:
                 print("  ⚠ Aba 'Anexos' não encontrada automaticamente")
@@ -748,21 +577,28 @@ class MigradorPEP:
                     except:
                         pass
                 
-                print("  💡 Por favor, mude manualmente para a aba Anexos e pressione Enter...")
-                input()
+                # Sem prompt: o loop do motor é compartilhado e o servidor não tem stdin;
+                # a etapa Anexos falha e é repetida pelo executar_etapa
                 return False
         except Exception as e:
             print(f"  ⚠ Erro ao mudar para aba Anexos: {str(e)}")
             import traceback
             traceback.print_exc()
-            print("  💡 Por favor, mude manualmente para a aba Anexos e pressione Enter...")
-            input()
             return False
 
+    async def listar_anexos_enviados(self, page):
+        """Nomes dos anexos que a aba Anexos já lista (vazio se não der para ler)"""
+        try:
+            return await page.evaluate(SCRIPT_ANEXOS_LISTADOS)
+        except Exception as e:
+            print(f"  ⚠ Não foi possível ler os anexos já enviados: {str(e)}")
+            return []
+
     async def fazer_upload_anexos(self, page, arquivos):
         """
         Faz upload dos arquivos na aba Anexos
         Preenche primeiro o campo de texto com mensagem fixa
+        Retorna True se o upload terminou (ou não havia o que anexar), False se falhou
         """
         print(f"\n  📎 Processando anexos...")
         
@@ -770,8 +606,8 @@ class MigradorPEP:
             # Garante que está na aba "Anexos" (pode já estar se foi chamado após preencher CNPJ)
             print("  🔄 Garantindo que está na aba 'Anexos'...")
             if not await self.mudar_para_aba_anexos(page):
-                print("  ⚠ Não foi possível ativar aba Anexos, tentando continuar...")
-                await page.wait_for_timeout(2000)
+                print("  ⚠ Não foi possível ativar aba Anexos")
+                return False
             
             # Preenche o campo de texto com mensagem fixa
             print("  📝 Preenchendo campo de texto...")
@@ -814,7 +650,7 @@ class MigradorPEP:
             if not arquivos:
                 print("  ℹ️ Nenhum arquivo para anexar")
                 print("  💡 Você pode fazer o upload manualmente na aba Anexos")
-                return
+                return True
             
             # Procura pelo input de upload do PrimeFaces
             print("  🔍 Procurando campo de upload...")
@@ -843,8 +679,17 @@ class MigradorPEP:
                 
                 if not arquivos_validos:
                     print(f"  ⚠ Nenhum arquivo válido encontrado na pasta: {self.caminho_pasta_anexos}")
-                    return
-                
+                    return True
+
+                # Repetição ou retomada: não reenvia o que a página já lista como anexado
+                pendentes = filtrar_anexos_pendentes(arquivos_validos, await self.listar_anexos_enviados(page))
+                if len(pendentes) < len(arquivos_validos):
+                    print(f"  ♻️ {len(arquivos_validos) - len(pendentes)} arquivo(s) já anexado(s), enviando só os que faltam")
+                if not pendentes:
+                    print("  ✅ Todos os arquivos já estão anexados")
+                    return True
+                arquivos_validos = pendentes
+
                 print(f"  📋 Preparando upload de {len(arquivos_validos)} arquivo(s):")
                 for idx, arquivo_path in enumerate(arquivos_validos, 1):
                     print(f"    [{idx}] {os.path.basename(arquivo_path)}")
@@ -861,20 +706,21 @@ class MigradorPEP:
                         element.dispatchEvent(event);
                     }''')
                     
-                    # Aguarda um pouco para o PrimeFaces reagir
-                    await page.wait_for_timeout(2000)
+                    # Aguarda o PrimeFaces reagir
+                    await aguardar_ajax_ocioso(page)
                     
                     # Passo 3: Tenta encontrar e clicar no botão "Enviar" ou "Upload" se existir
                     botao_upload = await page.query_selector('button.ui-fileupload-upload, button:has-text("Enviar"), button:has-text("Upload")')
                     if botao_upload:
                         print(f"  📤 Clicando no botão 'Enviar'...")
                         await botao_upload.click()
-                        await page.wait_for_timeout(3000)
+                        await aguardar_ajax_ocioso(page)
                     else:
                         print(f"  ℹ️ Botão 'Enviar' não encontrado (upload pode ser automático)")
-                        await page.wait_for_timeout(3000)
+                        await aguardar_ajax_ocioso(page)
                     
                     print(f"  ✅ Upload finalizado! Verifique se os arquivos apareceram na lista.")
+                    return True
                     
                 except Exception as e:
                     print(f"  ❌ Erro durante upload: {str(e)}")
@@ -888,10 +734,14 @@ class MigradorPEP:
             import traceback
             traceback.print_exc()
             print("  💡 Você pode fazer o upload manualmente na aba Anexos")
+        return False
 
-    async def preencher_select_dependente(self, page, campo_select, valor, delay_extra=2000):
+    async def preencher_select_dependente(self, page, campo_select, valor, delay_extra=2000, paralelo=False, campo_dependente=None):
         """
         Preenche um select e aguarda o carregamento de campos dependentes (para PrimeFaces)
+        delay_extra só é usado quando a página não expõe PrimeFaces/jQuery para observar o AJAX
+        paralelo=True (outras cascatas na mesma página): não espera a fila AJAX inteira,
+        só a resposta deste select e a troca das opções de campo_dependente
         """
         try:
             selector = f'select[name="{campo_select}"]'
@@ -900,85 +750,411 @@ class MigradorPEP:
             if not elemento:
                 return False
             
-            # Seleciona o valor
-            await elemento.select_option(value=str(valor))
-            await page.wait_for_timeout(500)  # Pequeno delay para o evento disparar
+            assinatura = None
+            if paralelo and campo_dependente:
+                assinatura = await assinatura_opcoes(page, campo_dependente)
+            
+            # Seleciona o valor e aguarda o carregamento dos campos dependentes (PrimeFaces faz AJAX)
+            tempo_ms = await executar_e_aguardar_ajax(
+                page, lambda: elemento.select_option(value=str(valor)), campo=campo_select, aguardar_fila=not paralelo
+            )
+            
+            # Resposta já chegou: as opções mudam assim que o PrimeFaces aplica o update
+            if paralelo and campo_dependente and tempo_ms is not None:
+                if not await aguardar_opcoes_alteradas(page, campo_dependente, assinatura, timeout=config.AJAX_JANELA_INICIO):
+                    # Opções iguais às anteriores (ou update atrasado): espera a fila
+                    await aguardar_ajax_ocioso(page)
             
-            # Aguarda o carregamento dos campos dependentes (PrimeFaces faz AJAX)
-            await page.wait_for_timeout(delay_extra)
+            # Sem sinais de AJAX observáveis na página: usa o delay fixo como fallback
+            if tempo_ms is None and not await pagina_tem_ajax(page):
+                await page.wait_for_timeout(delay_extra)
             
             return True
         except Exception as e:
             print(f"    ⚠ Erro ao preencher select dependente {campo_select}: {str(e)}")
             return False
 
+    def campos_cascata(self, sufixo):
+        """
+        Nomes dos selects da cascata por nível
+        sufixo pode ser 'A', 'B', ou 'Itinerario'
+        """
+        if sufixo == 'Itinerario':
+            return {
+                'estado': 'form:tabs:estadoItinerario',
+                'municipio': 'form:tabs:municipioItinerario',
+                'bairro': 'form:tabs:bairroItinerario',
+                'logradouro': 'form:tabs:logradouroItinerario'
+            }
+        return {
+            'estado': f'form:tabs:estado{sufixo}',
+            'municipio': f'form:tabs:municipio{sufixo}',
+            'bairro': f'form:tabs:bairro{sufixo}',
+            'logradouro': f'form:tabs:logradouros{sufixo}'
+        }
+
+    async def ler_opcoes_select(self, page, campo_select):
+        """
+        Lê as opções (valor, texto) de um select em uma única chamada, sem a opção vazia
+        """
+        opcoes = await page.evaluate(SCRIPT_OPCOES_SELECT, campo_select)
+        return [tuple(opcao) for opcao in opcoes]
+
+    async def selecionar_nivel_cascata(self, page, sufixo, nivel, valor, chave=(), delay_extra=None, paralelo=False):
+        """
+        Seleciona um nível da cascata (estado, municipio, bairro ou logradouro)
+        chave: valores já selecionados nos níveis acima, ex.: (estado, municipio),
+        sempre os valores devolvidos por esta função (os mesmos gravados no cache)
+        Com cache de opções: valida/resolve o valor antes de tocar na página
+        e grava as opções do nível seguinte quando o AJAX as trocou
+        paralelo=True quando outra cascata roda ao mesmo tempo na página
+        Retorna o valor selecionado ou None se falhou
+        """
+        campos = self.campos_cascata(sufixo)
+        campo_select = campos[nivel]
+        if delay_extra is None:
+            delay_extra = 1000 if nivel == 'logradouro' else 2000
+        
+        if self.cache_opcoes:
+            # As opções de Estado não dependem de AJAX: lê da página na primeira vez
+            if nivel == 'estado' and self.cache_opcoes.obter(nivel, chave) is None:
+                opcoes = await self.ler_opcoes_select(page, campo_select)
+                if opcoes:
+                    self.cache_opcoes.gravar(nivel, chave, opcoes)
+            
+            valor_resolvido = self.cache_opcoes.resolver_valor(nivel, chave, valor)
+            if valor_resolvido is None:
+                print(f"    ⚠ '{valor}' não existe nas opções de {campo_select} (cache), pulando")
+                return None
+            valor = valor_resolvido
+        valor = str(valor)
+        
+        campo_dependente = None if nivel == 'logradouro' else campos[NIVEIS[NIVEIS.index(nivel) + 1]]
+        assinatura = None
+        if self.cache_opcoes and campo_dependente:
+            assinatura = await assinatura_opcoes(page, campo_dependente)
+        if not await self.preencher_select_dependente(page, campo_select, valor, delay_extra, paralelo, campo_dependente):
+            return None
+        
+        # Sem troca das opções o select dependente ainda mostra a lista anterior (ou vazia): não grava
+        if self.cache_opcoes and campo_dependente and await assinatura_opcoes(page, campo_dependente) != assinatura:
+            opcoes = await self.ler_opcoes_select(page, campo_dependente)
+            if opcoes:
+                self.cache_opcoes.gravar(NIVEIS[NIVEIS.index(nivel) + 1], tuple(chave) + (valor,), opcoes)
+        return valor
+
     async def preencher_cascata_endereco(self, page, dados, sufixo):
         """
         Preenche campos de endereço em cascata: Estado → Município → Bairro → Logradouro
         sufixo pode ser 'A', 'B', ou 'Itinerario'
+        Se um nível falhar (ou for inválido pelo cache) os níveis abaixo não são tentados
         """
         campos_preenchidos = 0
+        campos = self.campos_cascata(sufixo)
+        chave = ()
         
-        # Mapeamento de sufixos para nomes de campos completos
-        if sufixo == 'Itinerario':
-            campo_estado = 'form:tabs:estadoItinerario'
-            campo_municipio = 'form:tabs:municipioItinerario'
-            campo_bairro = 'form:tabs:bairroItinerario'
-            campo_logradouro = 'form:tabs:logradouroItinerario'
-        else:
-            campo_estado = f'form:tabs:estado{sufixo}'
-            campo_municipio = f'form:tabs:municipio{sufixo}'
-            campo_bairro = f'form:tabs:bairro{sufixo}'
-            campo_logradouro = f'form:tabs:logradouros{sufixo}'
-        
-        # Estado
-        if campo_estado in dados and dados[campo_estado]:
-            print(f"  📍 Preenchendo Estado ({sufixo})...")
-            if await self.preencher_select_dependente(page, campo_estado, dados[campo_estado], 2000):
-                campos_preenchidos += 1
-                print(f"    ✓ Estado = {dados[campo_estado]}")
-        
-        # Município
-        if campo_municipio in dados and dados[campo_municipio]:
-            print(f"  📍 Preenchendo Município ({sufixo})...")
-            if await self.preencher_select_dependente(page, campo_municipio, dados[campo_municipio], 2000):
-                campos_preenchidos += 1
-                print(f"    ✓ Município = {dados[campo_municipio]}")
-        
-        # Bairro
-        if campo_bairro in dados and dados[campo_bairro]:
-            print(f"  📍 Preenchendo Bairro ({sufixo})...")
-            if await self.preencher_select_dependente(page, campo_bairro, dados[campo_bairro], 2000):
-                campos_preenchidos += 1
-                print(f"    ✓ Bairro = {dados[campo_bairro]}")
-        
-        # Logradouro
-        if campo_logradouro in dados and dados[campo_logradouro]:
-            print(f"  📍 Preenchendo Logradouro ({sufixo})...")
-            if await self.preencher_select_dependente(page, campo_logradouro, dados[campo_logradouro], 1000):
-                campos_preenchidos += 1
-                print(f"    ✓ Logradouro = {dados[campo_logradouro]}")
+        for nivel in NIVEIS:
+            campo = campos[nivel]
+            if campo not in dados or not dados[campo]:
+                continue
+            
+            print(f"  📍 Preenchendo {ROTULOS_NIVEIS[nivel]} ({sufixo})...")
+            valor = await self.selecionar_nivel_cascata(page, sufixo, nivel, dados[campo], chave)
+            if not valor:
+                break
+            campos_preenchidos += 1
+            chave = chave + (valor,)
+            print(f"    ✓ {ROTULOS_NIVEIS[nivel]} = {dados[campo]}")
+        
+        return campos_preenchidos
+
+    async def preencher_cascatas_paralelas(self, page, dados, sufixos=('A', 'B')):
+        """
+        Preenche as cascatas de várias pontas ao mesmo tempo na mesma página
+        O agendador segue o grafo Estado → Município → Bairro → Logradouro de cada
+        ponta; a fila AJAX do PrimeFaces serializa as requisições no servidor.
+        No fim confere cada ponta (um re-render de uma pode ter apagado a outra)
+        e refaz só os níveis que não ficaram selecionados
+        """
+        cascatas = {}
+        for sufixo in sufixos:
+            campos = self.campos_cascata(sufixo)
+            cascatas[sufixo] = {nivel: campo for nivel, campo in campos.items() if campo in dados and dados[campo]}
+        
+        # Valor selecionado em cada nó: a chave do cache dos níveis de baixo
+        selecionados = {}
+        
+        async def executar(no):
+            sufixo, nivel = no
+            campos = cascatas[sufixo]
+            chave = tuple(selecionados[(sufixo, n)] for n in NIVEIS[:NIVEIS.index(nivel)] if n in campos)
+            print(f"  📍 Preenchendo {ROTULOS_NIVEIS[nivel]} ({sufixo})...")
+            selecionados[no] = await self.selecionar_nivel_cascata(page, sufixo, nivel, dados[campos[nivel]], chave, paralelo=True)
+            if not selecionados[no]:
+                return False
+            print(f"    ✓ {ROTULOS_NIVEIS[nivel]} ({sufixo}) = {dados[campos[nivel]]}")
+            return True
+        
+        resultados = await executar_grafo(montar_grafo(cascatas), executar)
+        await aguardar_ajax_ocioso(page)
         
+        campos_preenchidos = 0
+        for sufixo in sufixos:
+            # Níveis preenchidos em sequência a partir do Estado (o que a conferência cobre)
+            valores = []
+            for nivel in NIVEIS:
+                if not resultados.get((sufixo, nivel)):
+                    break
+                valores.append(dados[cascatas[sufixo][nivel]])
+            if not valores:
+                continue
+            nivel_falho = await self.sincronizar_cascata(page, sufixo, valores)
+            if nivel_falho:
+                print(f"  ⚠ Ponta {sufixo}: {ROTULOS_NIVEIS[nivel_falho]} não ficou selecionado")
+                valores = valores[:NIVEIS.index(nivel_falho)]
+            campos_preenchidos += len(valores)
         return campos_preenchidos
 
-    async def preencher_formulario_novo(self, page, dados):
+    async def pre_resolver_cascatas(self, page, dados, sufixos=('A', 'B')):
+        """
+        Resolve as cascatas de endereço por requisições parciais JSF (sem renderizar),
+        aquecendo o cache de opções; valores inválidos passam a ser pulados
+        pelo selecionar_nivel_cascata antes de tocar na página
+        """
+        if not self.cache_opcoes:
+            return
+        try:
+            storage_state = await page.context.storage_state()
+            cliente = ClienteJSF(storage_state)
+            await asyncio.to_thread(cliente.carregar_view, self.url_nova)
+            for sufixo in sufixos:
+                campos = self.campos_cascata(sufixo)
+                valores = {nivel: dados.get(campo) for nivel, campo in campos.items()}
+                if not valores['estado']:
+                    continue
+                _, nivel_invalido = await asyncio.to_thread(cliente.resolver_cascata, campos, valores, self.cache_opcoes)
+                if nivel_invalido:
+                    print(f"  ⚠ Ponta {sufixo}: {ROTULOS_NIVEIS[nivel_invalido]} '{valores[nivel_invalido]}' não existe nas opções")
+                else:
+                    print(f"  ⚡ Ponta {sufixo}: cascata validada por requisições parciais")
+        except Exception as e:
+            print(f"  ⚠ Pré-resolução das cascatas indisponível ({str(e)})")
+
+    async def sincronizar_cascata(self, page, sufixo, valores):
+        """
+        Leva a cascata aos valores desejados re-selecionando só os níveis que mudaram
+        valores: lista na ordem de NIVEIS, ex.: [estado, municipio, bairro]
+        O estado atual é lido da página (valor de cada select e se o select
+        seguinte já tem opções); ao mudar um nível, todos os de baixo são refeitos
+        Retorna o nível que falhou ou None se a cascata ficou no estado desejado
+        """
+        campos = self.campos_cascata(sufixo)
+        niveis = NIVEIS[:len(valores)]
+        nomes = [campos[nivel] for nivel in NIVEIS[:len(valores) + 1]]
+        atuais = await page.evaluate(SCRIPT_ESTADO_SELECTS, nomes)
+        
+        chave = ()
+        refazer = False
+        for i, (nivel, valor) in enumerate(zip(niveis, valores)):
+            alvo = self.cache_opcoes.resolver_valor(nivel, chave, valor) if self.cache_opcoes else str(valor)
+            atual, proximo = atuais[i], atuais[i + 1]
+            mantido = (
+                not refazer and alvo is not None and atual and atual['valor'] == alvo
+                and (proximo is None or proximo['opcoes'] > 0)
+            )
+            if mantido:
+                print(f"    ✓ {ROTULOS_NIVEIS[nivel]} já selecionado ({valor})")
+            else:
+                print(f"    📍 Preenchendo {ROTULOS_NIVEIS[nivel]}...")
+                alvo = await self.selecionar_nivel_cascata(page, sufixo, nivel, valor, chave)
+                if not alvo:
+                    return nivel
+                refazer = True
+            chave = chave + (alvo,)
+        return None
+
+    def montar_seletores_campo(self, campo, mapeamento_especial):
+        """
+        Monta os seletores CSS de um campo em ordem de prioridade
+        (mapeamento especial, nome completo, id completo, sufixo :nome / :id)
+        """
+        campo_id_css = campo.replace(":", "\\:")
+        campo_final_name = campo.split(":")[-1]
+        
+        selectors = [
+            f'input[name="{campo}"]', f'textarea[name="{campo}"]', f'select[name="{campo}"]',
+            f'input#{campo_id_css}', f'textarea#{campo_id_css}', f'select#{campo_id_css}',
+            f'[name$=":{campo_final_name}"]', f'[id$=":{campo_final_name}"]'
+        ]
+        
+        for chave_esp, seletor_esp in mapeamento_especial.items():
+            if chave_esp.lower() in campo.lower():
+                selectors.insert(0, f'[id*="{seletor_esp}"]')
+                selectors.insert(0, f'[name*="{seletor_esp}"]')
+        
+        return selectors
+
+    async def localizar_campo(self, page, selectors):
+        """Primeiro elemento encontrado pelos seletores (em ordem de prioridade) ou None"""
+        for selector in selectors:
+            try:
+                elemento = await page.query_selector(selector)
+                if elemento: return elemento
+            except: continue
+        return None
+
+    async def preencher_campo_sequencial(self, page, valor, selectors, elemento=None, indice_localizadores=None):
+        """
+        Preenche um campo pelo caminho campo a campo (Playwright + atraso do ControladorRitmo)
+        elemento já resolvido pelo índice evita as tentativas de seletor
+        Só espera a página quando o campo dispara AJAX; o tempo da resposta e a
+        rejeição do valor alimentam o ritmo. O AJAX deixa o índice de localizadores obsoleto
+        Retorna True se o campo foi encontrado e preenchido
+        """
+        try:
+            if not elemento:
+                elemento = await self.localizar_campo(page, selectors)
+            if not elemento:
+                return False
+            
+            tag_name = await elemento.evaluate('el => el.tagName.toLowerCase()')
+            input_type = await elemento.get_attribute('type') if tag_name == 'input' else None
+            texto = tag_name == 'textarea' or (tag_name == 'input' and input_type not in ['checkbox', 'radio'])
+
+            async def preencher():
+                if tag_name == 'select':
+                    try: await elemento.select_option(value=str(valor))
+                    except: await elemento.select_option(label=str(valor))
+                elif texto:
+                    await elemento.fill(str(valor))
+                elif tag_name == 'input' and str(valor).lower() in VALORES_MARCADO:
+                    await elemento.check()
+
+            await self.ritmo.aguardar(page)
+            tempo_ms = await executar_e_aguardar_ajax(page, preencher)
+        except:
+            return False
+
+        if tempo_ms is not None:
+            if indice_localizadores:
+                indice_localizadores.marcar_obsoleto()
+            if tempo_ms >= config.TIMEOUT_AJAX:
+                self.ritmo.registrar_rejeicao()
+            else:
+                self.ritmo.registrar_resposta(tempo_ms)
+
+        # Valor apagado/alterado pelo re-render ou pela validação: servidor rejeitou
+        # (o re-render troca o elemento, então o campo é procurado de novo)
+        if texto:
+            try:
+                atual = await self.localizar_campo(page, selectors)
+                if atual and await atual.input_value() != str(valor):
+                    self.ritmo.registrar_rejeicao()
+            except Exception as e:
+                print(f"    ⚠ Não foi possível conferir o valor do campo: {str(e)}")
+        return True
+
+    async def atualizar_indices(self, page, itens, indice_localizadores, mapeamento_especial):
+        """Remonta o índice de localizadores obsoleto e resolve de novo o índice de cada item"""
+        if not indice_localizadores:
+            return
+        try:
+            if await indice_localizadores.atualizar(page):
+                for item in itens:
+                    item['indice'] = indice_localizadores.resolver(item['campo'], mapeamento_especial)
+        except Exception as e:
+            # Sem índice confiável os campos são procurados pelos seletores
+            print(f"  ⚠ Erro ao remontar índice de localizadores, usando seletores: {str(e)}")
+            for item in itens:
+                item.pop('indice', None)
+
+    async def preencher_itens_servico(self, page, itens, indice_localizadores=None, mapeamento_especial=None):
+        """
+        Preenche os itens da Aba Serviço: classifica os campos, preenche primeiro os
+        que disparam AJAX (campo a campo) e depois os simples em uma única chamada
+        O índice de localizadores é remontado sempre que um AJAX o deixa obsoleto
+        Retorna (preenchidos, itens ausentes, itens rejeitados)
+        """
+        preenchidos = 0
+        ausentes = []
+        rejeitados = []
+        mapeamento_especial = mapeamento_especial or {}
+        await self.atualizar_indices(page, itens, indice_localizadores, mapeamento_especial)
+
+        # Campos que disparam AJAX (ou não são texto/checkbox) seguem campo a campo, primeiro,
+        # para que seus re-renders não apaguem os campos preenchidos em lote
+        try:
+            relatorio = await preencher_em_lote(page, itens, preencher=False)
+        except Exception as e:
+            print(f"  ⚠ Erro ao classificar campos para o lote: {str(e)}")
+            relatorio = {item['campo']: SEQUENCIAL for item in itens}
+        
+        sequenciais = [item for item in itens if relatorio.get(item['campo']) == SEQUENCIAL]
+        itens_lote = [item for item in itens if relatorio.get(item['campo']) == LOTE]
+        for item in itens:
+            if relatorio.get(item['campo']) == AUSENTE:
+                ausentes.append(item)
+            elif relatorio.get(item['campo']) == REJEITADO:
+                rejeitados.append(item)
+                self.ritmo.registrar_rejeicao()
+        
+        # Loop de preenchimento campo a campo (campos com AJAX)
+        for item in sequenciais:
+            elemento = None
+            if indice_localizadores:
+                elemento = await indice_localizadores.elemento(page, item.get('indice'))
+            if await self.preencher_campo_sequencial(page, item['valor'], item['seletores'], elemento, indice_localizadores):
+                preenchidos += 1
+            else:
+                ausentes.append(item)
+
+        # Campos simples em uma única chamada (valor + eventos input/change/blur)
+        if itens_lote:
+            await self.atualizar_indices(page, itens_lote, indice_localizadores, mapeamento_especial)
+            try:
+                relatorio_lote = await preencher_em_lote(page, itens_lote)
+            except Exception as e:
+                print(f"  ⚠ Erro no preenchimento em lote, usando campo a campo: {str(e)}")
+                relatorio_lote = {item['campo']: SEQUENCIAL for item in itens_lote}
+            
+            preenchidos_lote = 0
+            for item in itens_lote:
+                status_campo = relatorio_lote.get(item['campo'], AUSENTE)
+                if status_campo == PREENCHIDO:
+                    preenchidos_lote += 1
+                elif status_campo == SEQUENCIAL:
+                    # Re-render mudou o campo desde a classificação
+                    if await self.preencher_campo_sequencial(page, item['valor'], item['seletores'], indice_localizadores=indice_localizadores):
+                        preenchidos_lote += 1
+                    else:
+                        ausentes.append(item)
+                elif status_campo == REJEITADO:
+                    rejeitados.append(item)
+                    self.ritmo.registrar_rejeicao()
+                else:
+                    ausentes.append(item)
+            preenchidos += preenchidos_lote
+            print(f"  ⚡ {preenchidos_lote} campo(s) preenchido(s) em lote")
+        return preenchidos, ausentes, rejeitados
+
+    async def preencher_formulario_novo(self, page, dados, navegar=True):
         """
         Preenche o novo formulário (sem protocolo) com os dados extraídos
         Foca na aba "Serviço" primeiro e segue a ordem das abas
+        navegar=False quando a página já está no formulário novo (pipeline do executar_migracao)
         """
         print(f"\n📝 Preenchendo novo formulário...")
-        print(f"🌐 Acessando: {self.url_nova}")
-        
-        await page.goto(self.url_nova, wait_until='networkidle')
-        await page.wait_for_timeout(3000)  # Aguarda carregamento completo
+        if navegar:
+            print(f"🌐 Acessando: {self.url_nova}")
+            await self.navegar(page, self.url_nova)
+            await aguardar_ajax_ocioso(page)  # Aguarda carregamento completo
         
         # --- PASSO 1: ABA SERVIÇO ---
         print("\n🚀 [PASSO 1] Preenchendo Aba 'Serviço'...")
         try:
             aba_servico = await page.query_selector('a[href="#form:tabs:tabServico"]')
             if aba_servico:
-                await aba_servico.click()
-                await page.wait_for_timeout(1000)
+                await executar_e_aguardar_ajax(page, aba_servico.click)
         except:
             pass
 
@@ -986,9 +1162,14 @@ class MigradorPEP:
         campos_nao_encontrados = []
         
         # 1.1 Endereços em cascata (Ponta A e B)
+        if config.PRE_RESOLVER_CASCATAS:
+            await self.pre_resolver_cascatas(page, dados)
         print("  🏠 Preenchendo endereços em cascata...")
-        campos_preenchidos += await self.preencher_cascata_endereco(page, dados, 'A')
-        campos_preenchidos += await self.preencher_cascata_endereco(page, dados, 'B')
+        if config.CASCATAS_PARALELAS:
+            campos_preenchidos += await self.preencher_cascatas_paralelas(page, dados)
+        else:
+            campos_preenchidos += await self.preencher_cascata_endereco(page, dados, 'A')
+            campos_preenchidos += await self.preencher_cascata_endereco(page, dados, 'B')
         
         # Itinerário removido conforme solicitado
         print("  ℹ️ Pulo do preenchimento de itinerário (removido)")
@@ -1020,52 +1201,43 @@ class MigradorPEP:
             'dutos': 'dutos', 'comprimento': 'comprimento'
         }
 
-        # Loop de preenchimento da Aba Serviço
+        # Índice de localizadores da página (uma leitura; cada campo é resolvido em memória)
+        try:
+            indice_localizadores = await IndiceLocalizadores.montar(page)
+        except Exception as e:
+            print(f"  ⚠ Erro ao montar índice de localizadores, usando seletores: {str(e)}")
+            indice_localizadores = None
+        
+        # Campos da Aba Serviço com seus seletores, em ordem de prioridade
+        itens_servico = []
         for campo, valor in dados.items():
             if valor is None or (isinstance(valor, str) and not valor.strip()): continue
             if campo in campos_cascata_preenchidos or campo in campos_dados_cliente or 'cnpj' in campo.lower(): continue
-            
-            try:
-                campo_id_css = campo.replace(":", "\\:")
-                campo_final_name = campo.split(":")[-1]
-                
-                selectors = [
-                    f'input[name="{campo}"]', f'textarea[name="{campo}"]', f'select[name="{campo}"]',
-                    f'input#{campo_id_css}', f'textarea#{campo_id_css}', f'select#{campo_id_css}',
-                    f'[name$=":{campo_final_name}"]', f'[id$=":{campo_final_name}"]'
-                ]
-                
-                for chave_esp, seletor_esp in mapeamento_especial.items():
-                    if chave_esp.lower() in campo.lower():
-                        selectors.insert(0, f'[id*="{seletor_esp}"]')
-                        selectors.insert(0, f'[name*="{seletor_esp}"]')
+            item = {
+                'campo': campo,
+                'valor': valor,
+                'seletores': self.montar_seletores_campo(campo, mapeamento_especial)
+            }
+            if indice_localizadores:
+                item['indice'] = indice_localizadores.resolver(campo, mapeamento_especial)
+            itens_servico.append(item)
+        
+        preenchidos, ausentes, rejeitados = await self.preencher_itens_servico(
+            page, itens_servico, indice_localizadores, mapeamento_especial
+        )
+        campos_preenchidos += preenchidos
 
-                elemento = None
-                for selector in selectors:
-                    try:
-                        elemento = await page.query_selector(selector)
-                        if elemento: break
-                    except: continue
-
-                if elemento:
-                    tag_name = await elemento.evaluate('el => el.tagName.toLowerCase()')
-                    if tag_name == 'select':
-                        try: await elemento.select_option(value=str(valor))
-                        except: await elemento.select_option(label=str(valor))
-                    elif tag_name == 'input':
-                        input_type = await elemento.get_attribute('type')
-                        if input_type in ['checkbox', 'radio']:
-                            if str(valor).lower() in ['true', '1', 'on', 'yes', 'sim']: await elemento.check()
-                        else: await elemento.fill(str(valor))
-                    elif tag_name == 'textarea':
-                        await elemento.fill(str(valor))
-                    
-                    await page.wait_for_timeout(self.delay)
-                    campos_preenchidos += 1
-                else:
-                    campos_nao_encontrados.append(campo)
-            except:
-                campos_nao_encontrados.append(campo)
+        # 1.5 Campos que só aparecem depois dos re-renders dos campos com AJAX:
+        # nova passada com o índice remontado (ou pelos seletores, sem índice)
+        if ausentes:
+            preenchidos, ausentes, rejeitados_retomada = await self.preencher_itens_servico(
+                page, ausentes, indice_localizadores, mapeamento_especial
+            )
+            rejeitados += rejeitados_retomada
+            campos_preenchidos += preenchidos
+            if preenchidos:
+                print(f"  🔁 {preenchidos} campo(s) preenchido(s) depois dos re-renders")
+        campos_nao_encontrados += [item['campo'] for item in ausentes + rejeitados]
 
         # --- PASSO 2: ABA DADOS CLIENTE ---
         print("\n👤 [PASSO 2] Preenchendo Aba 'Dados Cliente'...")
@@ -1074,22 +1246,220 @@ class MigradorPEP:
             try:
                 aba_cliente = await page.query_selector('a[href="#form:tabs:tabCliente"]')
                 if aba_cliente:
-                    await aba_cliente.click()
-                    await page.wait_for_timeout(1000)
+                    await executar_e_aguardar_ajax(page, aba_cliente.click)
                 
                 campo_cnpj = await page.query_selector(f'input[name="{cnpj_campo}"]')
                 if campo_cnpj:
                     await campo_cnpj.fill(str(dados[cnpj_campo]))
-                    await page.wait_for_timeout(1000)
-                    await campo_cnpj.press('Tab')
-                    await page.wait_for_timeout(3000) # Aguarda AJAX
+                    await aguardar_ajax_ocioso(page)
+                    # Aguarda o AJAX que carrega os dados do cliente a partir do CNPJ
+                    await executar_e_aguardar_ajax(page, lambda: campo_cnpj.press('Tab'))
                     print(f"  ✓ CNPJ preenchido: {dados[cnpj_campo]}")
             except Exception as e:
                 print(f"  ⚠ Erro no CNPJ: {str(e)}")
 
         print(f"\n✅ {campos_preenchidos} campos preenchidos na Aba Serviço")
+        if campos_nao_encontrados:
+            print(f"⚠️ {len(campos_nao_encontrados)} campos não foram encontrados no novo formulário:")
+            for campo in campos_nao_encontrados[:10]:  # Mostra apenas os 10 primeiros
+                print(f"    - {campo}")
         return campos_preenchidos
 
+    async def abrir_contexto(self):
+        """
+        Abre o contexto do navegador conforme o modo de execução
+        Retorna (playwright, browser, context); playwright/browser só existem sem pool
+        """
+        p = None
+        browser = None
+        if self.sessao:
+            # Contexto já autenticado com a sessão compartilhada do lote
+            context, self.versao_sessao = await self.sessao.novo_contexto()
+        elif self.pool:
+            # Contexto isolado em um navegador compartilhado do lote
+            context = await self.pool.obter_contexto()
+        else:
+            print("🔧 Inicializando Playwright...")
+            
+            # Inicializa Playwright (sem context manager quando manter_navegador_aberto=True)
+            p = await async_playwright().start()
+            print("🌐 Iniciando navegador...")
+            
+            # Tenta lançar o navegador com configurações para evitar detecção
+            browser = await lancar_navegador(p, self.headless)
+            
+            print("📄 Criando contexto do navegador...")
+            context = await criar_contexto(browser, cache_recursos=CacheRecursos() if config.CACHE_RECURSOS else None)
+        
+        # Registrado depois do cache de recursos: roda antes e cai nele via fallback
+        if config.BLOQUEIO_RECURSOS:
+            self.bloqueio = PerfilBloqueio()
+            await self.bloqueio.aplicar(context)
+        return p, browser, context
+
+    async def etapa_login(self, page):
+        """Passo 1: login (pulado quando há sessão compartilhada do lote)"""
+        if self.sessao:
+            self.atualizar_progresso("Login", "✅", "Sessão do lote reaproveitada")
+        else:
+            self.atualizar_progresso("Login", "🔄", "Fazendo login...")
+            await self.fazer_login(page)
+            self.atualizar_progresso("Login", "✅", "Login realizado com sucesso")
+
+    async def etapa_extracao(self, page):
+        """
+        Passo 2: dados do formulário antigo, do armazém de snapshots se houver
+        Extrações novas são gravadas no armazém
+        """
+        dados = self.snapshots.obter(self.protocolo) if self.snapshots else None
+        if dados:
+            print(f"\n📦 Dados do protocolo {self.protocolo} reaproveitados do armazém de snapshots")
+            self.atualizar_progresso("Extração", "✅", f"Dados reaproveitados: {len(dados)} campos")
+            return dados
+        
+        self.atualizar_progresso("Extração", "🔄", "Extraindo dados do formulário antigo...")
+        dados = await self.extrair_dados_formulario_antigo(page)
+        if dados and self.snapshots:
+            # Falha no armazém não perde a extração: a migração segue com os dados em memória
+            try:
+                self.snapshots.gravar(self.protocolo, dados)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"  ⚠ Erro ao gravar snapshot da extração: {str(e)}")
+        self.atualizar_progresso("Extração", "✅", f"Dados extraídos: {len(dados)} campos")
+        return dados
+
+    def registrar_checkpoint(self, etapa, status, tentativas, saida=None, mensagem=''):
+        """Guarda o checkpoint da etapa na migração e, se houver, no armazém de snapshots"""
+        checkpoint = {'status': status, 'tentativas': tentativas, 'em': time.time(), 'saida': saida, 'mensagem': mensagem}
+        self.checkpoints[etapa] = checkpoint
+        if self.snapshots:
+            try:
+                self.snapshots.gravar_etapa(self.protocolo, etapa, checkpoint)
+            except OSError as e:
+                print(f"  ⚠ Erro ao gravar checkpoint de {etapa}: {str(e)}")
+
+    async def executar_etapa(self, etapa, acao, saida=None):
+        """
+        Executa acao(tentativa) repetindo só esta etapa em caso de exceção,
+        com espera exponencial e até RETENTATIVAS_ETAPA novas tentativas
+        saida(resultado) resume o resultado para o checkpoint
+        """
+        tentativa = 1
+        while True:
+            try:
+                resultado = await acao(tentativa)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if tentativa > config.RETENTATIVAS_ETAPA:
+                    self.registrar_checkpoint(etapa, 'erro', tentativa, mensagem=str(e))
+                    raise
+                espera = min(config.RETENTATIVA_BACKOFF_MAX_S, config.RETENTATIVA_BACKOFF_S * 2 ** (tentativa - 1))
+                print(f"  🔁 {etapa} falhou ({str(e)}), nova tentativa em {espera:.0f}s "
+                      f"({tentativa}/{config.RETENTATIVAS_ETAPA})")
+                self.atualizar_progresso(etapa, "🔁", f"Tentativa {tentativa + 1} em {espera:.0f}s: {str(e)}")
+                await asyncio.sleep(espera)
+                tentativa += 1
+                continue
+            self.registrar_checkpoint(etapa, 'ok', tentativa, saida(resultado) if saida else None)
+            return resultado
+
+    def pode_retomar_anexos(self):
+        """Formulário novo já preenchido e ainda aberto, com os anexos pendentes"""
+        return bool(
+            self.caminho_pasta_anexos and self.page_nova and not self.page_nova.is_closed()
+            and self.checkpoints.get('Preenchimento', {}).get('status') == 'ok'
+            and self.checkpoints.get('Anexos', {}).get('status') != 'ok'
+        )
+
+    async def etapa_anexos(self, page, arquivos):
+        """Passo 5: upload na aba Anexos; levanta exceção para a etapa ser repetida"""
+        self.atualizar_progresso("Anexos", "🔄", f"Fazendo upload de {len(arquivos)} arquivo(s)...")
+        if not await self.fazer_upload_anexos(page, arquivos):
+            raise Exception("Upload dos anexos não concluído")
+        self.atualizar_progresso("Anexos", "✅", f"Upload concluído: {len(arquivos)} arquivo(s)")
+        return arquivos
+
+    async def retomar_anexos(self):
+        """
+        Repete só os anexos de uma migração cujo preenchimento já foi concluído
+        (a aba do formulário novo continua aberta)
+        """
+        print(f"\n♻️ Protocolo {self.protocolo}: login, extração e preenchimento já concluídos, repetindo só os anexos")
+        for etapa in ("Login", "Extração", "Preenchimento"):
+            self.atualizar_progresso(etapa, "✅", "Concluído anteriormente (checkpoint)")
+        try:
+            arquivos = await asyncio.to_thread(self.listar_arquivos_locais, self.caminho_pasta_anexos)
+            await self.medir_etapa('anexos', self.executar_etapa(
+                'Anexos', lambda tentativa: self.etapa_anexos(self.page_nova, arquivos),
+                saida=lambda arquivos: {'arquivos': [os.path.basename(a) for a in arquivos]}
+            ))
+            return True
+        except Exception as e:
+            print(f"  ⚠ Erro ao processar anexos: {str(e)}")
+            self.atualizar_progresso("Anexos", "❌", f"Erro: {str(e)}")
+            return False
+
+    async def medir_etapa(self, etapa, coro):
+        """Executa a corotina registrando início e fim da etapa em self.tempos_etapas"""
+        tempos = self.tempos_etapas.setdefault(etapa, {'inicio': time.time(), 'fim': None})
+        try:
+            return await coro
+        finally:
+            tempos['fim'] = time.time()
+
+    def resumo_tempos_etapas(self):
+        """Imprime início/fim de cada etapa relativos à primeira etapa"""
+        if not self.tempos_etapas:
+            return
+        origem = min(t['inicio'] for t in self.tempos_etapas.values())
+        print("\n⏱️ Etapas (segundos desde o início):")
+        for etapa, t in sorted(self.tempos_etapas.items(), key=lambda item: item[1]['inicio']):
+            fim = f"{t['fim'] - origem:6.1f}" if t['fim'] else '     -'
+            print(f"  • {etapa:<18} {t['inicio'] - origem:6.1f} → {fim}")
+
+    async def abrir_formulario_novo(self, context):
+        """Abre uma aba e carrega o formulário novo (roda em paralelo com a extração)"""
+        page_nova = await context.new_page()
+        await self.navegar(page_nova, self.url_nova)
+        await aguardar_ajax_ocioso(page_nova)
+        return page_nova
+
+    async def extrair_para_snapshot(self):
+        """
+        Fase de leitura do lote em duas fases: login (ou sessão do lote) e extração
+        para o armazém de snapshots, sem abrir o formulário novo
+        O contexto é fechado ao final (não há nada para revisar)
+        Retorna o dict `dados` ou None se nada foi extraído
+        """
+        if self.snapshots:
+            dados = self.snapshots.obter(self.protocolo)
+            if dados:
+                self.atualizar_progresso("Extração", "✅", f"Dados reaproveitados: {len(dados)} campos")
+                return dados
+        
+        p, browser, context = await self.abrir_contexto()
+        try:
+            page = await context.new_page()
+            if self.bloqueio:
+                # Página só lida e fechada ao final: pode dispensar também as folhas de estilo
+                # (a aba do formulário antigo do executar_migracao fica aberta para revisão e mantém o CSS)
+                await self.bloqueio.aplicar_extracao(page)
+            await self.etapa_login(page)
+            dados = await self.etapa_extracao(page)
+            return dados or None
+        finally:
+            if self.bloqueio:
+                self.bloqueio.imprimir_resumo(self.protocolo)
+            if self.pool:
+                await self.pool.liberar_contexto(context)
+            else:
+                await context.close()
+                if browser:
+                    await browser.close()
+                if p:
+                    await p.stop()
+
     async def executar_migracao(self):
         # ... (mantém o resto igual, chamando fazer_upload_anexos depois)
 
@@ -1105,6 +1475,7 @@ class MigradorPEP:
     async def executar_migracao(self):
         """
         Executa o processo completo de migração
+        Retorna True se a migração chegou ao fim, False em caso de erro
         """
         print("=" * 60)
         print("🚀 MIGRADOR AUTOMÁTICO PEP CELESC")
@@ -1114,6 +1485,9 @@ class MigradorPEP:
         print(f"🔗 URL Nova: {self.url_nova}")
         print("=" * 60)
         
+        if self.pode_retomar_anexos():
+            return await self.retomar_anexos()
+        
         p = None
         browser = None
         context = None
@@ -1121,63 +1495,7 @@ class MigradorPEP:
         page_nova = None
         
         try:
-            print("🔧 Inicializando Playwright...")
-            
-            # Inicializa Playwright (sem context manager quando manter_navegador_aberto=True)
-            p = await async_playwright().start()
-            print("🌐 Iniciando navegador...")
-            
-            # Tenta lançar o navegador com configurações para evitar detecção
-            browser = await p.chromium.launch(
-                headless=self.headless,
-                slow_mo=50,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                ]
-            )
-            
-            # Verifica se o navegador está aberto
-            if not browser:
-                raise Exception("Falha ao iniciar o navegador")
-            
-            print("📄 Criando contexto do navegador...")
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                locale='pt-BR',
-                timezone_id='America/Sao_Paulo',
-                # Remove flags de automação
-                ignore_https_errors=False
-            )
-            
-            # Remove flags que identificam automação
-            await context.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    });
-                    
-                    window.chrome = {
-                        runtime: {}
-                    };
-                    
-                    Object.defineProperty(navigator, 'plugins', {
-                        get: () => [1, 2, 3, 4, 5]
-                    });
-                    
-                    Object.defineProperty(navigator, 'languages', {
-                    get: () => ['pt-BR', 'pt', 'en']
-                });
-            """)
-            
-            # Verifica se o contexto foi criado
-            if not context:
-                raise Exception("Falha ao criar contexto do navegador")
+            p, browser, context = await self.abrir_contexto()
             
             print("📑 Criando primeira página...")
             page = await context.new_page()
@@ -1189,14 +1507,29 @@ class MigradorPEP:
             print("✅ Navegador inicializado com sucesso!")
             
             # Passo 1: Fazer login
-            self.atualizar_progresso("Login", "🔄", "Fazendo login...")
-            await self.fazer_login(page)
-            self.atualizar_progresso("Login", "✅", "Login realizado com sucesso")
-            
-            # Passo 2: Extrair dados do formulário antigo
-            self.atualizar_progresso("Extração", "🔄", "Extraindo dados do formulário antigo...")
-            dados = await self.extrair_dados_formulario_antigo(page)
-            self.atualizar_progresso("Extração", "✅", f"Dados extraídos: {len(dados)} campos")
+            await self.medir_etapa('login', self.executar_etapa(
+                'Login', lambda tentativa: self.etapa_login(page),
+                saida=lambda _: {'sessao_lote': bool(self.sessao)}
+            ))
+            
+            # Com a sessão pronta, o formulário novo e a listagem dos anexos
+            # carregam enquanto a extração roda; só há espera onde há dependência de dados
+            tarefa_pagina_nova = asyncio.ensure_future(self.medir_etapa('formulario_novo', self.abrir_formulario_novo(context)))
+            tarefa_arquivos = None
+            if self.caminho_pasta_anexos:
+                tarefa_arquivos = asyncio.ensure_future(self.medir_etapa(
+                    'listagem_anexos', asyncio.to_thread(self.listar_arquivos_locais, self.caminho_pasta_anexos)
+                ))
+            # Se a migração parar antes de usar as tarefas, o erro delas não fica sem tratamento
+            for tarefa in (tarefa_pagina_nova, tarefa_arquivos):
+                if tarefa:
+                    tarefa.add_done_callback(lambda t: t.cancelled() or t.exception())
+            
+            # Passo 2: Extrair dados do formulário antigo (ou reaproveitar o snapshot do protocolo)
+            dados = await self.medir_etapa('extracao', self.executar_etapa(
+                'Extração', lambda tentativa: self.etapa_extracao(page),
+                saida=lambda dados: {'campos': len(dados or {})}
+            ))
             
             if not dados:
                 print("\n⚠️ Nenhum dado encontrado no formulário antigo")
@@ -1204,7 +1537,7 @@ class MigradorPEP:
                 await page.screenshot(path='debug_formulario_antigo.png')
                 print("  Screenshot salvo em debug_formulario_antigo.png")
                 print("\n✅ Navegador mantido aberto para verificação manual")
-                return
+                return False
             
             # Mostra os dados extraídos
             print("\n📋 Dados extraídos do formulário antigo:")
@@ -1215,17 +1548,25 @@ class MigradorPEP:
                 print(f"  • {campo}: {valor_display}")
             print("-" * 60)
             
-            # Passo 3: Abrir nova aba com formulário novo
-            print("\n🆕 Abrindo nova aba para o formulário novo...")
-            self.atualizar_progresso("Preenchimento", "🔄", "Abrindo formulário novo...")
-            page_nova = await context.new_page()
-            await page_nova.goto(self.url_nova, wait_until='networkidle')
-            await page_nova.wait_for_timeout(2000)
-            
-            # Passo 4: Preencher o novo formulário
-            self.atualizar_progresso("Preenchimento", "🔄", "Preenchendo campos...")
-            await self.preencher_formulario_novo(page_nova, dados)
-            self.atualizar_progresso("Preenchimento", "✅", "Formulário preenchido com sucesso")
+            # Passos 3 e 4: aba com o formulário novo (já carregando desde o fim do login) e preenchimento
+            # Uma nova tentativa recarrega o formulário (ou abre outra aba se a primeira não abriu)
+            async def preencher(tentativa):
+                nonlocal page_nova
+                navegar = page_nova is not None
+                if page_nova is None:
+                    print("\n🆕 Aguardando a aba do formulário novo...")
+                    self.atualizar_progresso("Preenchimento", "🔄", "Abrindo formulário novo...")
+                    page_nova = await (tarefa_pagina_nova if tentativa == 1 else self.abrir_formulario_novo(context))
+                self.atualizar_progresso("Preenchimento", "🔄", "Preenchendo campos...")
+                campos = await self.preencher_formulario_novo(page_nova, dados, navegar=navegar)
+                self.page_nova = page_nova
+                self.atualizar_progresso("Preenchimento", "✅", "Formulário preenchido com sucesso")
+                return campos
+            
+            await self.medir_etapa('preenchimento', self.executar_etapa(
+                'Preenchimento', preencher,
+                saida=lambda campos: {'campos_preenchidos': campos, 'url': page_nova.url}
+            ))
             
             # Passo 5: Processar anexos locais (se fornecido)
             if self.caminho_pasta_anexos:
@@ -1235,19 +1576,25 @@ class MigradorPEP:
                 
                 try:
                     self.atualizar_progresso("Anexos", "🔄", "Listando arquivos...")
-                    # Lista arquivos da pasta local
-                    arquivos = self.listar_arquivos_locais(self.caminho_pasta_anexos)
+                    # Lista de arquivos da pasta local (montada durante a extração)
+                    arquivos = await tarefa_arquivos
                     
-                    self.atualizar_progresso("Anexos", "🔄", f"Fazendo upload de {len(arquivos)} arquivo(s)...")
                     # Faz upload (a função já ativa aba Anexos e preenche campo de texto)
-                    await self.fazer_upload_anexos(page_nova, arquivos)
-                    self.atualizar_progresso("Anexos", "✅", f"Upload concluído: {len(arquivos)} arquivo(s)")
+                    await self.medir_etapa('anexos', self.executar_etapa(
+                        'Anexos', lambda tentativa: self.etapa_anexos(page_nova, arquivos),
+                        saida=lambda arquivos: {'arquivos': [os.path.basename(a) for a in arquivos]}
+                    ))
                 except Exception as e:
                     print(f"  ⚠ Erro ao processar anexos: {str(e)}")
                     self.atualizar_progresso("Anexos", "❌", f"Erro: {str(e)}")
                     import traceback
                     traceback.print_exc()
             
+            self.resumo_tempos_etapas()
+            self.ritmo.imprimir_resumo()
+            if self.bloqueio:
+                self.bloqueio.imprimir_resumo(self.protocolo)
+            
             print("\n" + "=" * 60)
             print("✨ MIGRAÇÃO CONCLUÍDA!")
             print("=" * 60)
@@ -1264,6 +1611,7 @@ class MigradorPEP:
             print("   💡 Feche o navegador manualmente quando terminar a verificação.")
             print("   💡 O Playwright permanecerá ativo para manter o navegador aberto.")
             # NÃO fecha o navegador nem o Playwright - sempre mantém aberto
+            return True
                 
         except Exception as e:
             print(f"\n❌ Erro durante a migração: {str(e)}")
@@ -1276,11 +1624,11 @@ class MigradorPEP:
             except:
                 pass
             # SEMPRE mantém o navegador aberto mesmo em caso de erro
-            if browser:
+            if browser or context:
                 print("\n⚠️ Erro ocorreu, mas navegador mantido aberto para verificação manual")
                 print("   💡 O Playwright permanecerá ativo para manter o navegador aberto.")
             # Não faz raise para evitar erro duplo
-            return
+            return False
 
 
 async def main():
@@ -1321,7 +1669,7 @@ async def main():
         print(f"📁 Pasta de anexos informada: {caminho_pasta_anexos}")
         print(f"✓ Pasta validada com sucesso")
     
-    migrador = MigradorPEP(protocolo, caminho_pasta_anexos)
+    migrador = MigradorPEP(protocolo, caminho_pasta_anexos, cache_opcoes=CacheOpcoes(), snapshots=ArmazemSnapshots())
     await migrador.executar_migracao()
 
 
@@ -0,0 +1,318 @@
+"""
+Motor assíncrono único para executar migrações
+Um único thread com event loop roda todas as migrações como tasks,
+limitadas por um semáforo; Flask e Tk chamam a API thread-safe abaixo.
+"""
+import asyncio
+import itertools
+import threading
+import time
+import config
+from migrador_pep import MigradorPEP
+from pool_navegadores import PoolNavegadores
+from sessao_pep import GerenciadorSessao
+from cache_opcoes import CacheOpcoes
+from snapshots_extracao import ArmazemSnapshots
+
+
+STATUS_FINAIS = ('Concluído', 'Erro', 'Cancelado')
+
+
+class LoteDuasFases:
+    """
+    Lote executado em duas fases: primeiro extrai todos os protocolos
+    (leitura, barata) para o armazém de snapshots; só quando a extração do lote
+    inteiro termina começa o preenchimento dos formulários novos.
+    Cada fase tem seu próprio limite de concorrência e sua própria vazão.
+    """
+
+    def __init__(self, total, max_extracao=None, max_preenchimento=None):
+        self.total = total
+        self.max_extracao = max(1, max_extracao or config.MAX_EXTRACOES_PARALELAS)
+        self.max_preenchimento = max(1, max_preenchimento or config.MAX_MIGRACOES_PARALELAS)
+        self.fases = {
+            'extracao': {'pendentes': total, 'sucesso': 0, 'falha': 0, 'inicio': None, 'fim': None},
+            'preenchimento': {'pendentes': total, 'sucesso': 0, 'falha': 0, 'inicio': None, 'fim': None}
+        }
+        # Tarefas que chegaram a entrar no lote e as canceladas antes disso
+        self.iniciadas = set()
+        self.abandonadas = set()
+        # Primitivas do asyncio criadas dentro do loop do motor
+        self.semaforo_extracao = None
+        self.semaforo_preenchimento = None
+        self.extracao_concluida = None
+
+    def _garantir_primitivas(self):
+        if self.semaforo_extracao is None:
+            self.semaforo_extracao = asyncio.Semaphore(self.max_extracao)
+            self.semaforo_preenchimento = asyncio.Semaphore(self.max_preenchimento)
+            self.extracao_concluida = asyncio.Event()
+
+    def _iniciar_fase(self, fase):
+        if self.fases[fase]['inicio'] is None:
+            self.fases[fase]['inicio'] = time.monotonic()
+
+    def _terminar(self, fase, sucesso):
+        """sucesso=None: o protocolo saiu da fase sem ser processado (falhou antes ou foi cancelado)"""
+        info = self.fases[fase]
+        info['pendentes'] -= 1
+        if sucesso is not None:
+            info['sucesso' if sucesso else 'falha'] += 1
+        if info['pendentes'] == 0:
+            info['fim'] = time.monotonic()
+            resumo = self.resumo()[fase]
+            print(f"📊 Fase de {fase} concluída: {resumo['sucesso']} ok, {resumo['falha']} com falha "
+                  f"em {resumo['duracao_s']:.1f}s ({resumo['por_minuto']:.1f} protocolos/min)")
+            if fase == 'extracao':
+                self.extracao_concluida.set()
+
+    def resumo(self):
+        """Vazão de cada fase: {fase: {sucesso, falha, pendentes, duracao_s, por_minuto}}"""
+        agora = time.monotonic()
+        resumo = {}
+        for fase, info in self.fases.items():
+            duracao = ((info['fim'] or agora) - info['inicio']) if info['inicio'] is not None else 0.0
+            feitos = info['sucesso'] + info['falha']
+            resumo[fase] = {
+                'sucesso': info['sucesso'],
+                'falha': info['falha'],
+                'pendentes': info['pendentes'],
+                'duracao_s': duracao,
+                'por_minuto': feitos / duracao * 60 if duracao > 0 else 0.0
+            }
+        return resumo
+
+    def abandonar(self, id_tarefa):
+        """Tarefa cancelada antes de começar: não ocupa mais nenhuma das fases"""
+        self._garantir_primitivas()
+        if id_tarefa not in self.iniciadas and id_tarefa not in self.abandonadas:
+            self.abandonadas.add(id_tarefa)
+            self._terminar('extracao', None)
+            self._terminar('preenchimento', None)
+
+    async def executar(self, id_tarefa, migrador, ao_extrair=None, ao_preencher=None):
+        """
+        Executa as duas fases de um protocolo
+        O preenchimento só começa depois que o lote inteiro foi extraído
+        Retorna o resultado de executar_migracao (levanta exceção se nada foi extraído)
+        """
+        self._garantir_primitivas()
+        if id_tarefa in self.abandonadas:
+            raise asyncio.CancelledError()
+        self.iniciadas.add(id_tarefa)
+        pendente = {'extracao': True, 'preenchimento': True}
+        try:
+            dados = None
+            async with self.semaforo_extracao:
+                self._iniciar_fase('extracao')
+                try:
+                    dados = await migrador.extrair_para_snapshot()
+                finally:
+                    pendente['extracao'] = False
+                    self._terminar('extracao', bool(dados))
+            if not dados:
+                # Protocolo ruim descoberto antes de abrir qualquer formulário novo
+                raise Exception('Nenhum dado extraído do formulário antigo')
+            if ao_extrair:
+                ao_extrair()
+            
+            await self.extracao_concluida.wait()
+            async with self.semaforo_preenchimento:
+                if ao_preencher:
+                    ao_preencher()
+                self._iniciar_fase('preenchimento')
+                sucesso = False
+                try:
+                    sucesso = await migrador.executar_migracao()
+                finally:
+                    pendente['preenchimento'] = False
+                    self._terminar('preenchimento', sucesso)
+            return sucesso
+        finally:
+            # Cancelado ou falhou antes: libera as fases para o resto do lote
+            for fase in ('extracao', 'preenchimento'):
+                if pendente[fase]:
+                    self._terminar(fase, None)
+
+
+class MotorMigracao:
+    def __init__(self, max_concorrencia=None):
+        self.max_concorrencia = max(1, max_concorrencia or config.MAX_MIGRACOES_PARALELAS)
+        self.tarefas = {}
+        self.lotes = []
+        # Migrações que ainda podem retomar os anexos (checkpoints e aba do formulário novo)
+        self.migradores = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        # Recursos do loop (criados dentro do próprio loop)
+        self.semaforo = None
+        self.pool = None
+        self.sessao = None
+        self.cache_opcoes = CacheOpcoes()
+        self.snapshots = ArmazemSnapshots()
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._executar_loop, name='motor-migracao', daemon=True)
+        self.thread.start()
+
+    def _executar_loop(self):
+        asyncio.set_event_loop(self.loop)
+        # O loop nunca para sozinho: os navegadores ficam abertos para revisão
+        self.loop.run_forever()
+
+    def _garantir_recursos(self):
+        if self.semaforo is None:
+            self.semaforo = asyncio.Semaphore(self.max_concorrencia)
+            self.pool = PoolNavegadores()
+            self.sessao = GerenciadorSessao(self.pool)
+
+    def _atualizar(self, id_tarefa, **campos):
+        with self._lock:
+            info = self.tarefas[id_tarefa]
+            # Uma tarefa finalizada (ex.: cancelada) não volta a mudar de status
+            if info['status'] in STATUS_FINAIS and 'status' in campos:
+                return
+            info.update(campos)
+            callback_status = info['callback_status']
+        if callback_status and 'status' in campos:
+            try:
+                callback_status(campos['status'], campos.get('mensagem', ''))
+            except Exception as e:
+                print(f"  ⚠ Erro no callback de status: {str(e)}")
+
+    def _criar_migrador(self, protocolo, caminho_pasta, callback_progresso):
+        """
+        Reaproveita a migração anterior do protocolo quando só faltam os anexos
+        (o formulário novo continua preenchido); caso contrário cria uma nova
+        """
+        anterior = self.migradores.get(protocolo)
+        if anterior and anterior.pode_retomar_anexos():
+            anterior.callback_progresso = callback_progresso
+            return anterior
+        migrador = MigradorPEP(
+            protocolo,
+            caminho_pasta,
+            callback_progresso=callback_progresso,
+            manter_navegador_aberto=True,
+            pool=self.pool,
+            sessao=self.sessao,
+            cache_opcoes=self.cache_opcoes,
+            snapshots=self.snapshots
+        )
+        self.migradores[protocolo] = migrador
+        return migrador
+
+    async def _executar(self, id_tarefa, protocolo, caminho_pasta, callback_progresso, lote=None):
+        self._garantir_recursos()
+        migrador = self._criar_migrador(protocolo, caminho_pasta, callback_progresso)
+        with self._lock:
+            self.tarefas[id_tarefa]['migrador'] = migrador
+        if lote:
+            self._atualizar(id_tarefa, status='Extraindo', mensagem='')
+            return await lote.executar(
+                id_tarefa,
+                migrador,
+                ao_extrair=lambda: self._atualizar(id_tarefa, status='Extraído', mensagem='Aguardando a extração do lote'),
+                ao_preencher=lambda: self._atualizar(id_tarefa, status='Executando', mensagem='')
+            )
+        async with self.semaforo:
+            self._atualizar(id_tarefa, status='Executando', mensagem='')
+            return await migrador.executar_migracao()
+
+    def _liberar_migrador(self, id_tarefa):
+        """Descarta a migração finalizada, a menos que ela ainda possa retomar os anexos"""
+        with self._lock:
+            info = self.tarefas[id_tarefa]
+            migrador = info.pop('migrador', None)
+            if migrador and self.migradores.get(info['protocolo']) is migrador and not migrador.pode_retomar_anexos():
+                del self.migradores[info['protocolo']]
+
+    def _finalizar(self, id_tarefa, futuro, lote=None):
+        self._liberar_migrador(id_tarefa)
+        if futuro.cancelled():
+            if lote:
+                self.loop.call_soon_threadsafe(lote.abandonar, id_tarefa)
+            self._atualizar(id_tarefa, status='Cancelado', mensagem='Migração cancelada')
+        elif futuro.exception():
+            self._atualizar(id_tarefa, status='Erro', mensagem=f'Erro: {str(futuro.exception())}')
+        elif futuro.result():
+            self._atualizar(id_tarefa, status='Concluído', mensagem='Migração concluída! Navegador aberto para verificação manual.')
+        else:
+            self._atualizar(id_tarefa, status='Erro', mensagem='Migração não concluída, verifique o navegador')
+
+    def criar_lote_duas_fases(self, total, max_extracao=None, max_preenchimento=None):
+        """
+        Cria um lote em duas fases para `total` protocolos
+        Cada protocolo é agendado com submeter(..., lote=lote)
+        """
+        lote = LoteDuasFases(total, max_extracao, max_preenchimento)
+        with self._lock:
+            self.lotes.append(lote)
+        return lote
+
+    def submeter(self, protocolo, caminho_pasta=None, callback_progresso=None, callback_status=None, lote=None):
+        """
+        Agenda uma migração no motor
+        callback_progresso(step, status, mensagem) e callback_status(status, mensagem)
+        são chamados a partir do thread do motor
+        Com lote (LoteDuasFases) a migração segue as fases do lote
+        Retorna o id da tarefa
+        """
+        id_tarefa = next(self._ids)
+        with self._lock:
+            self.tarefas[id_tarefa] = {
+                'id': id_tarefa,
+                'protocolo': protocolo,
+                'status': 'Pendente',
+                'mensagem': '',
+                'futuro': None,
+                'callback_status': callback_status
+            }
+        futuro = asyncio.run_coroutine_threadsafe(
+            self._executar(id_tarefa, protocolo, caminho_pasta, callback_progresso, lote),
+            self.loop
+        )
+        with self._lock:
+            self.tarefas[id_tarefa]['futuro'] = futuro
+        futuro.add_done_callback(lambda f: self._finalizar(id_tarefa, f, lote))
+        return id_tarefa
+
+    def cancelar(self, id_tarefa):
+        """Cancela uma migração pendente ou em execução"""
+        with self._lock:
+            info = self.tarefas.get(id_tarefa)
+            if not info or info['status'] in STATUS_FINAIS or not info['futuro']:
+                return False
+            futuro = info['futuro']
+        # Future.cancel é thread-safe e propaga o cancelamento para a task no loop
+        return futuro.cancel()
+
+    def status(self, id_tarefa=None):
+        """Retorna o estado de uma tarefa (ou de todas) sem objetos internos"""
+        with self._lock:
+            if id_tarefa is not None:
+                info = self.tarefas.get(id_tarefa)
+                return {k: info[k] for k in ('id', 'protocolo', 'status', 'mensagem')} if info else None
+            return [
+                {k: info[k] for k in ('id', 'protocolo', 'status', 'mensagem')}
+                for info in self.tarefas.values()
+            ]
+
+    def pode_retomar(self, protocolo):
+        """Repetir o protocolo refaz só os anexos (formulário novo ainda aberto neste motor)"""
+        with self._lock:
+            migrador = self.migradores.get(protocolo)
+        return bool(migrador and migrador.pode_retomar_anexos())
+
+    def status_lotes(self):
+        """Vazão das fases de cada lote em duas fases"""
+        with self._lock:
+            lotes = list(self.lotes)
+        return [lote.resumo() for lote in lotes]
+
+    def parar(self):
+        """Encerra o pool de navegadores e o loop do motor"""
+        if self.pool:
+            asyncio.run_coroutine_threadsafe(self.pool.encerrar(), self.loop).result(timeout=30)
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,160 @@
+"""
+Pool de navegadores Chromium compartilhado entre as migrações de um lote
+"""
+import asyncio
+from playwright.async_api import async_playwright
+import config
+from cache_recursos import CacheRecursos
+
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+ARGS_NAVEGADOR = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+    f'--user-agent={USER_AGENT}'
+]
+
+OPCOES_CONTEXTO = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': USER_AGENT,
+    'locale': 'pt-BR',
+    'timezone_id': 'America/Sao_Paulo',
+    # Remove flags de automação
+    'ignore_https_errors': False
+}
+
+# Remove flags que identificam automação
+SCRIPT_ANTI_DETECCAO = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    window.chrome = {
+        runtime: {}
+    };
+
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['pt-BR', 'pt', 'en']
+    });
+"""
+
+
+async def lancar_navegador(playwright, headless):
+    """
+    Lança um Chromium com as configurações usadas pelo migrador
+    """
+    browser = await playwright.chromium.launch(
+        headless=headless,
+        slow_mo=config.SLOW_MO,
+        args=ARGS_NAVEGADOR
+    )
+    if not browser:
+        raise Exception("Falha ao iniciar o navegador")
+    return browser
+
+
+async def criar_contexto(browser, storage_state=None, cache_recursos=None):
+    """
+    Cria um contexto isolado (cookies, storage e cache próprios) no navegador
+    storage_state permite iniciar o contexto já autenticado
+    cache_recursos (CacheRecursos) atende os recursos estáticos do JSF a partir do disco
+    """
+    context = await browser.new_context(storage_state=storage_state, **OPCOES_CONTEXTO)
+    if not context:
+        raise Exception("Falha ao criar contexto do navegador")
+    await context.add_init_script(SCRIPT_ANTI_DETECCAO)
+    if cache_recursos:
+        await cache_recursos.aplicar(context)
+    return context
+
+
+class PoolNavegadores:
+    """
+    Mantém alguns Chromium de longa duração e entrega um BrowserContext
+    isolado por protocolo.
+
+    Um novo navegador só é lançado quando todos os existentes já têm
+    `contextos_por_navegador` contextos abertos e ainda não se atingiu
+    `max_navegadores`; a partir daí os contextos são distribuídos no
+    navegador menos carregado.
+    """
+
+    def __init__(self, max_navegadores=None, contextos_por_navegador=None, headless=None):
+        self.max_navegadores = max(1, max_navegadores or config.POOL_MAX_NAVEGADORES)
+        self.contextos_por_navegador = max(1, contextos_por_navegador or config.POOL_CONTEXTOS_POR_NAVEGADOR)
+        self.headless = config.HEADLESS if headless is None else headless
+        self.playwright = None
+        self.navegadores = []
+        # Recursos estáticos do JSF compartilhados por todos os contextos do pool
+        self.cache_recursos = CacheRecursos() if config.CACHE_RECURSOS else None
+        self._lock = asyncio.Lock()
+
+    async def iniciar(self):
+        """Inicia o driver do Playwright (uma única vez por pool)"""
+        async with self._lock:
+            if not self.playwright:
+                print("🔧 Inicializando Playwright (pool compartilhado)...")
+                self.playwright = await async_playwright().start()
+        return self
+
+    def _carga(self, browser):
+        return len(browser.contexts)
+
+    async def _escolher_navegador(self):
+        # Descarta navegadores que foram fechados manualmente
+        self.navegadores = [b for b in self.navegadores if b.is_connected()]
+
+        livres = [b for b in self.navegadores if self._carga(b) < self.contextos_por_navegador]
+        if livres:
+            return min(livres, key=self._carga)
+
+        if len(self.navegadores) < self.max_navegadores:
+            print(f"🌐 Iniciando navegador {len(self.navegadores) + 1}/{self.max_navegadores} do pool...")
+            browser = await lancar_navegador(self.playwright, self.headless)
+            self.navegadores.append(browser)
+            return browser
+
+        # Pool cheio: excede a proporção no navegador menos carregado
+        return min(self.navegadores, key=self._carga)
+
+    async def obter_contexto(self, storage_state=None):
+        """
+        Retorna um novo BrowserContext isolado em um dos navegadores do pool
+        """
+        await self.iniciar()
+        async with self._lock:
+            browser = await self._escolher_navegador()
+            context = await criar_contexto(browser, storage_state, self.cache_recursos)
+        print(f"📄 Contexto criado no pool ({self._carga(browser)} contexto(s) neste navegador)")
+        return context
+
+    async def liberar_contexto(self, context):
+        """Fecha um contexto que não precisa mais ficar aberto para revisão"""
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"  ⚠ Erro ao fechar contexto: {str(e)}")
+
+    async def encerrar(self):
+        """Fecha todos os navegadores e o driver do Playwright"""
+        if self.cache_recursos:
+            self.cache_recursos.imprimir_resumo()
+        async with self._lock:
+            for browser in self.navegadores:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            self.navegadores = []
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
@@ -0,0 +1,93 @@
+"""
+Preenchimento em lote de campos simples (sem AJAX) em uma única chamada ao navegador
+Inputs de texto, textareas e checkboxes/radios que não disparam AJAX recebem o
+valor e os eventos input/change/blur que o PrimeFaces espera; os demais campos
+são devolvidos como 'sequencial' para seguirem o caminho campo a campo.
+"""
+from indice_localizadores import ATRIBUTO_INDICE
+
+
+# Status do relatório por campo
+PREENCHIDO = 'preenchido'
+AUSENTE = 'ausente'
+REJEITADO = 'rejeitado'
+SEQUENCIAL = 'sequencial'
+LOTE = 'lote'
+
+VALORES_MARCADO = ['true', '1', 'on', 'yes', 'sim']
+
+SCRIPT_PREENCHER_LOTE = """({itens, preencher, valoresMarcado, atributoIndice}) => {
+    const AJAX = /PrimeFaces\\.(ab|bcn|bcnu)|mojarra\\.ab|jsf\\.ajax\\.request|RichFaces\\.ajax/;
+    const EVENTOS = ['onchange', 'onblur', 'oninput', 'onkeyup', 'onkeydown', 'onclick', 'onfocus'];
+    const TIPOS_TEXTO = ['', 'text', 'email', 'tel', 'number', 'search', 'url'];
+    const temAjax = el => EVENTOS.some(a => AJAX.test(el.getAttribute(a) || ''));
+    const disparar = (el, tipo) => el.dispatchEvent(new Event(tipo, {bubbles: true}));
+    const relatorio = {};
+
+    for (const item of itens) {
+        // Campo que o índice de localizadores (remontado após cada re-render) sabe que não existe
+        if (item.indice === null) { relatorio[item.campo] = 'ausente'; continue; }
+
+        let el = null;
+        if (item.indice !== undefined) {
+            el = document.querySelector(`[${atributoIndice}="${item.indice}"]`);
+        }
+        // Sem índice (ou elemento re-renderizado pelo AJAX): tenta os seletores
+        if (!el) {
+            for (const seletor of item.seletores) {
+                try { el = document.querySelector(seletor); } catch (e) { continue; }
+                if (el) break;
+            }
+        }
+        if (!el) { relatorio[item.campo] = 'ausente'; continue; }
+
+        const tag = el.tagName.toLowerCase();
+        const tipo = (el.getAttribute('type') || '').toLowerCase();
+        const texto = tag === 'textarea' || (tag === 'input' && TIPOS_TEXTO.includes(tipo));
+        const marcavel = tag === 'input' && (tipo === 'checkbox' || tipo === 'radio');
+        if ((!texto && !marcavel) || temAjax(el)) { relatorio[item.campo] = 'sequencial'; continue; }
+        if (el.disabled || el.readOnly) { relatorio[item.campo] = 'rejeitado'; continue; }
+        if (!preencher) { relatorio[item.campo] = 'lote'; continue; }
+
+        const valor = String(item.valor);
+        if (marcavel) {
+            if (valoresMarcado.includes(valor.toLowerCase()) && !el.checked) {
+                el.click();
+                if (!el.checked) { relatorio[item.campo] = 'rejeitado'; continue; }
+            }
+        } else {
+            el.focus();
+            el.value = valor;
+            disparar(el, 'input');
+            disparar(el, 'change');
+            el.dispatchEvent(new FocusEvent('blur'));
+            disparar(el, 'focusout');
+            if (el.value !== valor) { relatorio[item.campo] = 'rejeitado'; continue; }
+        }
+        relatorio[item.campo] = 'preenchido';
+    }
+    return relatorio;
+}"""
+
+
+async def preencher_em_lote(page, itens, preencher=True):
+    """
+    itens: lista de dicts {'campo', 'valor', 'seletores'} (seletores em ordem de prioridade),
+    opcionalmente com 'indice' resolvido pelo IndiceLocalizadores (None = campo inexistente)
+    Com preencher=False apenas classifica os campos ('lote', 'sequencial', 'ausente', 'rejeitado')
+    Retorna {campo: status}
+    """
+    if not itens:
+        return {}
+    itens_js = []
+    for i in itens:
+        item_js = {'campo': i['campo'], 'valor': str(i['valor']), 'seletores': i['seletores']}
+        if 'indice' in i:
+            item_js['indice'] = i['indice']
+        itens_js.append(item_js)
+    return await page.evaluate(SCRIPT_PREENCHER_LOTE, {
+        'itens': itens_js,
+        'preencher': preencher,
+        'valoresMarcado': VALORES_MARCADO,
+        'atributoIndice': ATRIBUTO_INDICE
+    })
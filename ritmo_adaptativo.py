@@ -0,0 +1,92 @@
+"""
+Controle adaptativo do ritmo de preenchimento (AIMD)
+Substitui o atraso fixo após cada campo: enquanto o PEP responde rápido o
+atraso diminui um passo por campo; quando a resposta fica lenta ou um campo é
+rejeitado, o atraso é multiplicado. Sempre dentro dos limites configurados.
+"""
+import config
+
+
+class ControladorRitmo:
+    def __init__(self, inicial=None, minimo=None, maximo=None, passo=None, fator_recuo=None, limite_lento_ms=None):
+        self.minimo = config.RITMO_ATRASO_MIN if minimo is None else minimo
+        self.maximo = config.RITMO_ATRASO_MAX if maximo is None else maximo
+        self.passo = config.RITMO_PASSO_MS if passo is None else passo
+        self.fator_recuo = config.RITMO_FATOR_RECUO if fator_recuo is None else fator_recuo
+        self.limite_lento_ms = config.RITMO_LIMITE_LENTO_MS if limite_lento_ms is None else limite_lento_ms
+        inicial = config.DELAY_PREENCHIMENTO if inicial is None else inicial
+        self.atraso = self._limitar(inicial)
+        self.inicial = self.atraso
+
+        # Média móvel do tempo de resposta (ms) e histórico dos atrasos usados
+        self.media_resposta = None
+        self.amostras = 0
+        self.atrasos_usados = []
+        self.recuos = 0
+        self.rejeicoes = 0
+
+    def _limitar(self, atraso):
+        return max(self.minimo, min(self.maximo, atraso))
+
+    def _acelerar(self):
+        # Aumento aditivo da vazão: um passo a menos de atraso
+        self.atraso = self._limitar(self.atraso - self.passo)
+
+    def _recuar(self):
+        # Redução multiplicativa da vazão; de 0 parte de um passo
+        self.recuos += 1
+        self.atraso = self._limitar(max(self.atraso, self.passo) * self.fator_recuo)
+
+    def lento(self, tempo_ms):
+        """Resposta acima do limite absoluto ou do dobro da média recente"""
+        if tempo_ms > self.limite_lento_ms:
+            return True
+        return self.amostras >= 3 and tempo_ms > 2 * self.media_resposta
+
+    def registrar_resposta(self, tempo_ms):
+        """Tempo (ms) que o PEP levou para ficar ocioso depois de um campo"""
+        if self.lento(tempo_ms):
+            self._recuar()
+        else:
+            self._acelerar()
+        self.amostras += 1
+        if self.media_resposta is None:
+            self.media_resposta = tempo_ms
+        else:
+            self.media_resposta = 0.8 * self.media_resposta + 0.2 * tempo_ms
+
+    def registrar_rejeicao(self):
+        """Campo rejeitado/não validado: recua"""
+        self.rejeicoes += 1
+        self._recuar()
+
+    async def aguardar(self, page):
+        """Espera o atraso atual (se houver) e registra o valor usado"""
+        atraso = int(self.atraso)
+        self.atrasos_usados.append(atraso)
+        if atraso > 0:
+            await page.wait_for_timeout(atraso)
+        return atraso
+
+    def resumo(self):
+        usados = self.atrasos_usados or [int(self.atraso)]
+        return {
+            'inicial': int(self.inicial),
+            'final': int(self.atraso),
+            'minimo': min(usados),
+            'maximo': max(usados),
+            'medio': sum(usados) / len(usados),
+            'campos': len(self.atrasos_usados),
+            'recuos': self.recuos,
+            'rejeicoes': self.rejeicoes,
+            'resposta_media_ms': self.media_resposta
+        }
+
+    def imprimir_resumo(self):
+        r = self.resumo()
+        if not r['campos']:
+            return
+        resposta = f", resposta média {r['resposta_media_ms']:.0f}ms" if r['resposta_media_ms'] is not None else ''
+        print(f"🎚️ Ritmo: atraso {r['inicial']}→{r['final']}ms (mín {r['minimo']}, máx {r['maximo']}, "
+              f"médio {r['medio']:.0f}) em {r['campos']} campo(s), {r['recuos']} recuo(s), "
+              f"{r['rejeicoes']} rejeição(ões){resposta}")
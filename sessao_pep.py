@@ -0,0 +1,72 @@
+"""
+Sessão autenticada compartilhada entre as migrações de um lote
+"""
+import asyncio
+from migrador_pep import MigradorPEP
+
+
+class GerenciadorSessao:
+    """
+    Faz login uma única vez por lote e reaproveita o `storage_state`
+    (cookies e local storage) em todos os contextos novos.
+
+    Quando uma página volta para `login.xhtml` a sessão é considerada
+    expirada; o primeiro migrador que perceber faz o novo login e os demais
+    que chegarem enquanto isso apenas aguardam e recebem o estado renovado.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.storage_state = None
+        # Incrementa a cada login; permite saber se alguém já renovou a sessão
+        self.versao = 0
+        self._lock = asyncio.Lock()
+
+    def expirou(self, page):
+        """Retorna True se a página foi redirecionada para a tela de login"""
+        return 'login.xhtml' in page.url.lower()
+
+    async def _login(self):
+        context = await self.pool.obter_contexto()
+        try:
+            page = await context.new_page()
+            await MigradorPEP(None).fazer_login(page)
+            if self.expirou(page):
+                raise Exception("Login não foi concluído, verifique as credenciais")
+            self.storage_state = await context.storage_state()
+            self.versao += 1
+            print(f"🔑 Sessão do lote capturada (versão {self.versao})")
+        finally:
+            await self.pool.liberar_contexto(context)
+
+    async def renovar(self, versao_vista):
+        """
+        Refaz o login se ninguém renovou a sessão desde `versao_vista`
+        Retorna a versão atual da sessão
+        """
+        async with self._lock:
+            if self.storage_state is None or self.versao == versao_vista:
+                await self._login()
+            return self.versao
+
+    async def novo_contexto(self):
+        """
+        Cria um contexto no pool já autenticado
+        Retorna (context, versao_da_sessao)
+        """
+        if self.storage_state is None:
+            await self.renovar(self.versao)
+        versao = self.versao
+        context = await self.pool.obter_contexto(storage_state=self.storage_state)
+        return context, versao
+
+    async def reautenticar(self, context, versao_vista):
+        """
+        Renova a sessão (uma vez para todos) e aplica os novos cookies no contexto
+        Retorna a versão da sessão aplicada
+        """
+        print("🔐 Sessão expirada, renovando login do lote...")
+        versao = await self.renovar(versao_vista)
+        await context.clear_cookies()
+        await context.add_cookies(self.storage_state.get('cookies', []))
+        return versao
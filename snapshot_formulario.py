@@ -0,0 +1,106 @@
+"""
+Extração do formulário antigo em uma única ida ao navegador
+O script abaixo roda dentro da página e devolve um snapshot JSON com todos os
+campos e com o itinerário; montar_dados converte o snapshot no mesmo dict
+`dados` que o migrador sempre usou.
+"""
+
+
+# Mesma ordem e os mesmos seletores da extração campo a campo
+SCRIPT_SNAPSHOT_FORMULARIO = """() => {
+    const campos = [];
+    const adicionar = (grupo, el, valor) => campos.push({
+        grupo: grupo,
+        tag: el.tagName.toLowerCase(),
+        name: el.getAttribute('name'),
+        id: el.getAttribute('id'),
+        type: el.getAttribute('type'),
+        value: valor,
+        checked: !!el.checked
+    });
+
+    document.querySelectorAll('input[type="text"], input[type="email"], input[type="tel"], input[type="number"], input:not([type])')
+        .forEach(el => adicionar('input', el, el.value));
+    document.querySelectorAll('textarea')
+        .forEach(el => adicionar('textarea', el, el.value));
+    document.querySelectorAll('select')
+        .forEach(el => adicionar('select', el, el.value));
+    document.querySelectorAll('input[type="checkbox"]:checked, input[type="radio"]:checked')
+        .forEach(el => adicionar('marcado', el, el.getAttribute('value')));
+
+    // Candidatos a resumo do itinerário (valores separados por ;), na ordem de prioridade
+    const candidatos = [];
+    document.querySelectorAll('input[type="hidden"][value*=";"]').forEach(el => candidatos.push(el.getAttribute('value')));
+    document.querySelectorAll('textarea[value*=";"]').forEach(el => candidatos.push(el.value));
+    document.querySelectorAll('input[value*=";"]').forEach(el => candidatos.push(el.getAttribute('value')));
+    document.querySelectorAll('textarea').forEach(el => candidatos.push(el.value));
+
+    const tabela = [];
+    const elTabela = document.getElementById('form:tabs:tableLogradouros');
+    if (elTabela) {
+        elTabela.querySelectorAll('tbody tr:not(.ui-datatable-empty-message)').forEach(linha => {
+            const celula = linha.querySelector('td:first-child');
+            if (celula) tabela.push(celula.innerText);
+        });
+    }
+
+    return {campos: campos, itinerario: {candidatos: candidatos, tabela: tabela}};
+}"""
+
+
+def resumo_itinerario(snapshot):
+    """
+    Extrai a lista de logradouros do itinerário a partir do snapshot
+    Primeiro procura valores separados por ponto e vírgula, depois a tabela
+    """
+    itinerario = snapshot.get('itinerario', {})
+
+    for value in itinerario.get('candidatos', []):
+        if value and ';' in value:
+            # Separa por ponto e vírgula e limpa os valores
+            logradouros = [log.strip() for log in value.split(';') if log.strip()]
+            if logradouros:
+                print(f"  📋 {len(logradouros)} logradouros encontrados no itinerário (separados por ;)")
+                return logradouros
+
+    # Se não encontrou com ponto e vírgula, usa a tabela
+    logradouros = [texto.strip() for texto in itinerario.get('tabela', []) if texto and texto.strip()]
+    if logradouros:
+        print(f"  📋 {len(logradouros)} logradouros encontrados na tabela do itinerário")
+    return logradouros
+
+
+def montar_dados(snapshot):
+    """
+    Converte o snapshot no dict `dados` (nome ou id do campo → valor)
+    Aplica os mesmos filtros da extração original
+    """
+    dados = {}
+
+    for campo in snapshot.get('campos', []):
+        grupo = campo.get('grupo')
+        name = campo.get('name')
+        id_attr = campo.get('id')
+        value = campo.get('value')
+
+        # Ignora campos de sistema JSF e campos especiais
+        if grupo == 'input' and name and ('j_idt' in name or 'javax.faces.ViewState' in name or name == 'form'):
+            continue
+        if grupo == 'textarea' and name and 'j_idt' in name:
+            continue
+
+        if grupo == 'marcado':
+            # Checkboxes e radios selecionados só entram se tiverem valor
+            if not value:
+                continue
+        else:
+            # Captura TODOS os campos (mesmo vazios)
+            value = value or ''
+
+        if name:
+            dados[name] = value
+        elif id_attr:
+            dados[id_attr] = value
+
+    dados['_itinerario_logradouros'] = resumo_itinerario(snapshot)
+    return dados
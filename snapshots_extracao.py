@@ -0,0 +1,115 @@
+"""
+Armazém em disco dos dados extraídos do formulário antigo, por protocolo
+O formulário antigo de um idSO não muda, então reexecuções (reimportar no Tk,
+lote web repetido) pulam o login/extração e vão direto ao preenchimento.
+Junto com os dados fica o checkpoint de cada etapa (status, tentativas e saída).
+Cada protocolo vira um JSON comprimido (gzip); arquivos mais velhos que a idade
+máxima são descartados e, acima do tamanho total, saem os menos acessados.
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import config
+
+
+class ArmazemSnapshots:
+    def __init__(self, diretorio=None, max_idade_horas=None, max_bytes=None):
+        self.diretorio = diretorio or config.SNAPSHOTS_DIRETORIO
+        self.max_idade = (max_idade_horas if max_idade_horas is not None else config.SNAPSHOTS_MAX_IDADE_HORAS) * 3600
+        self.max_bytes = max_bytes or config.SNAPSHOTS_MAX_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(self.diretorio, exist_ok=True)
+
+    def _caminho(self, protocolo):
+        nome = re.sub(r'[^A-Za-z0-9_.-]', '_', str(protocolo).strip())
+        return os.path.join(self.diretorio, f'{nome}.json.gz')
+
+    def _ler(self, caminho):
+        """Registro do arquivo ou None se ausente/expirado/corrompido (chamar com o lock)"""
+        try:
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                registro = json.load(arquivo)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Arquivo corrompido: descarta
+            self._remover(caminho)
+            return None
+
+        if time.time() - registro.get('gravado_em', 0) > self.max_idade:
+            self._remover(caminho)
+            return None
+        return registro
+
+    def _escrever(self, caminho, registro):
+        temporario = caminho + '.tmp'
+        with gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+            json.dump(registro, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        self._limitar_tamanho()
+
+    def obter(self, protocolo):
+        """Retorna o dict `dados` do protocolo ou None se ausente/expirado"""
+        caminho = self._caminho(protocolo)
+        with self._lock:
+            registro = self._ler(caminho)
+            if not registro or not registro.get('dados'):
+                return None
+            # mtime marca o último acesso (ordem da remoção por tamanho)
+            os.utime(caminho)
+        return registro['dados']
+
+    def gravar(self, protocolo, dados):
+        """
+        Grava os dados extraídos (inclui _itinerario_logradouros)
+        Checkpoints das etapas que dependem dos dados antigos são descartados
+        """
+        caminho = self._caminho(protocolo)
+        with self._lock:
+            anterior = self._ler(caminho) or {}
+            etapas = {etapa: info for etapa, info in anterior.get('etapas', {}).items() if etapa == 'Login'}
+            registro = {'protocolo': str(protocolo), 'gravado_em': time.time(), 'dados': dados, 'etapas': etapas}
+            self._escrever(caminho, registro)
+
+    def gravar_etapa(self, protocolo, etapa, checkpoint):
+        """Grava o checkpoint de uma etapa (status, tentativas, saída...) junto dos dados"""
+        caminho = self._caminho(protocolo)
+        with self._lock:
+            registro = self._ler(caminho) or {'protocolo': str(protocolo), 'gravado_em': time.time(), 'dados': None}
+            registro.setdefault('etapas', {})[etapa] = checkpoint
+            self._escrever(caminho, registro)
+
+    def etapas(self, protocolo):
+        """Checkpoints gravados do protocolo: {etapa: checkpoint}"""
+        with self._lock:
+            registro = self._ler(self._caminho(protocolo)) or {}
+        return registro.get('etapas', {})
+
+    def remover(self, protocolo):
+        with self._lock:
+            self._remover(self._caminho(protocolo))
+
+    def _remover(self, caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+    def _limitar_tamanho(self):
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.json.gz'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            info = os.stat(caminho)
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.max_bytes:
+                break
+            self._remover(caminho)
+            total -= tamanho
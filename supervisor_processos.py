@@ -0,0 +1,386 @@
+"""
+Modo de execução em processos: as migrações rodam em processos worker
+Cada worker (multiprocessing, spawn) hospeda um MotorMigracao com seus
+navegadores e contextos; o supervisor, no processo do Flask, distribui as
+migrações, recebe o progresso por filas e reinicia workers que morrem ou param
+de dar sinal de vida (ou têm uma migração parada, sem progresso), reenviando
+as migrações que estavam com eles. No POSIX cada worker tem seu próprio grupo de
+processos, encerrado inteiro junto com o driver do Playwright e o Chromium.
+Expõe a mesma API do MotorMigracao usada pela interface web.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import config
+from motor_migracao import MotorMigracao, LoteDuasFases
+
+
+STATUS_FINAIS = ('Concluído', 'Erro', 'Cancelado')
+
+
+def executar_worker(indice, entrada, saida, concorrencia):
+    """
+    Processo worker: recebe comandos (submeter/cancelar/parar) e devolve
+    progresso, status e o sinal de vida (com a vazão dos lotes) pela fila de saída
+    """
+    # Grupo de processos próprio: o supervisor encerra o worker junto com o driver e os navegadores
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    # SIGTERM (terminate) fecha os navegadores antes de sair
+    encerrar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: encerrar.set())
+
+    motor = MotorMigracao(concorrencia)
+    ids = {}
+    lotes = {}
+    ultimo_sinal = 0
+    print(f"👷 Worker {indice} iniciado (pid {os.getpid()}, até {concorrencia} migrações em paralelo)")
+
+    while not encerrar.is_set():
+        try:
+            comando = entrada.get(timeout=1)
+        except queue.Empty:
+            comando = None
+
+        if comando:
+            tipo = comando[0]
+            if tipo == 'parar':
+                break
+            if tipo == 'submeter':
+                _, id_tarefa, protocolo, caminho_pasta, id_lote, total_lote = comando
+                lote = None
+                if id_lote is not None:
+                    if id_lote not in lotes:
+                        lotes[id_lote] = motor.criar_lote_duas_fases(total_lote)
+                    lote = lotes[id_lote]
+                ids[id_tarefa] = motor.submeter(
+                    protocolo,
+                    caminho_pasta,
+                    callback_progresso=lambda step, status, mensagem='', i=id_tarefa: saida.put(('progresso', i, step, status, mensagem)),
+                    # No status final informa se o protocolo ficou com os anexos retomáveis neste worker
+                    callback_status=lambda status, mensagem='', i=id_tarefa, p=protocolo: saida.put((
+                        'status', i, status, mensagem, status in STATUS_FINAIS and motor.pode_retomar(p)
+                    )),
+                    lote=lote
+                )
+            elif tipo == 'cancelar' and comando[1] in ids:
+                motor.cancelar(ids[comando[1]])
+
+        if time.monotonic() - ultimo_sinal >= 1:
+            # Só dá sinal de vida se o loop do motor responde; uma chamada travada no driver
+            # não bloqueia o loop e é detectada pelo supervisor pelo tempo sem progresso
+            try:
+                asyncio.run_coroutine_threadsafe(asyncio.sleep(0), motor.loop).result(timeout=5)
+            except Exception:
+                continue
+            ultimo_sinal = time.monotonic()
+            saida.put(('sinal', {id_lote: lote.resumo() for id_lote, lote in lotes.items()}))
+
+    try:
+        motor.parar()
+    except Exception as e:
+        print(f"  ⚠ Worker {indice}: erro ao fechar os navegadores: {str(e)}")
+
+
+class LoteRemoto:
+    """Lote em duas fases executado inteiro em um worker"""
+
+    def __init__(self, id_lote, total, max_extracao=None, max_preenchimento=None):
+        self.id = id_lote
+        self.total = total
+        self.max_extracao = max(1, max_extracao or config.MAX_EXTRACOES_PARALELAS)
+        self.max_preenchimento = max(1, max_preenchimento or config.MAX_MIGRACOES_PARALELAS)
+        self.worker = None
+        self.resumo = None
+
+
+class Worker:
+    def __init__(self, contexto, indice, concorrencia):
+        self.indice = indice
+        self.entrada = contexto.Queue()
+        self.saida = contexto.Queue()
+        self.processo = contexto.Process(
+            target=executar_worker,
+            args=(indice, self.entrada, self.saida, concorrencia),
+            name=f'worker-migracao-{indice}',
+            daemon=True
+        )
+        self.ativo = True
+        # O worker demora a subir (spawn + imports): conta a partir do início
+        self.ultimo_sinal = time.monotonic()
+        self.processo.start()
+
+
+class SupervisorProcessos:
+    def __init__(self, num_workers=None, concorrencia_worker=None):
+        self.num_workers = max(1, num_workers or config.PROCESSOS_WORKERS)
+        self.concorrencia_worker = max(1, concorrencia_worker or config.PROCESSOS_MIGRACOES_POR_WORKER)
+        self.max_concorrencia = self.num_workers * self.concorrencia_worker
+        self.tarefas = {}
+        self.lotes = {}
+        # Protocolo -> (worker, tarefa) cuja migração ainda pode retomar os anexos
+        self.retomaveis = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._contexto = multiprocessing.get_context('spawn')
+        self._parando = False
+
+        print(f"🏭 Iniciando {self.num_workers} worker(s) de migração...")
+        self.workers = [self._iniciar_worker(indice) for indice in range(self.num_workers)]
+        threading.Thread(target=self._vigiar, name='supervisor-workers', daemon=True).start()
+
+    def _iniciar_worker(self, indice):
+        worker = Worker(self._contexto, indice, self.concorrencia_worker)
+        threading.Thread(target=self._receber, args=(worker,), name=f'supervisor-saida-{indice}', daemon=True).start()
+        return worker
+
+    def _receber(self, worker):
+        """Repassa as mensagens de um worker até ele ser substituído"""
+        while worker.ativo:
+            try:
+                mensagem = worker.saida.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                self._tratar(worker, mensagem)
+            except Exception as e:
+                print(f"  ⚠ Erro ao tratar mensagem do worker {worker.indice}: {str(e)}")
+
+    def _tratar(self, worker, mensagem):
+        tipo = mensagem[0]
+        if tipo == 'sinal':
+            worker.ultimo_sinal = time.monotonic()
+            with self._lock:
+                for id_lote, resumo in mensagem[1].items():
+                    lote = self.lotes.get(id_lote)
+                    if lote and lote.worker is worker:
+                        lote.resumo = resumo
+            return
+
+        id_tarefa = mensagem[1]
+        with self._lock:
+            info = self.tarefas.get(id_tarefa)
+            # Mensagem atrasada de um worker que já foi substituído
+            if not info or info['worker'] is not worker:
+                return
+            # Progresso marca a migração como em andamento; mudança de status pode ser uma espera (fila, lote)
+            info['atividade'] = time.monotonic()
+            info['em_andamento'] = tipo == 'progresso'
+            if tipo == 'status':
+                info['status'], info['mensagem'] = mensagem[2], mensagem[3]
+                if info['status'] in STATUS_FINAIS:
+                    info['worker'] = None
+                    if mensagem[4]:
+                        self.retomaveis[info['protocolo']] = (worker, info)
+                    else:
+                        self.retomaveis.pop(info['protocolo'], None)
+        if tipo == 'progresso':
+            self._chamar(info['callback_progresso'], *mensagem[2:])
+        elif tipo == 'status':
+            self._chamar(info['callback_status'], *mensagem[2:4])
+
+    def _chamar(self, callback, *args):
+        if callback:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"  ⚠ Erro no callback: {str(e)}")
+
+    def _vigiar(self):
+        """Reinicia workers mortos ou sem sinal de vida e reenvia as migrações deles"""
+        while not self._parando:
+            time.sleep(1)
+            for worker in list(self.workers):
+                if self._parando:
+                    return
+                if not worker.processo.is_alive():
+                    self._reiniciar(worker, f"terminou (código {worker.processo.exitcode})")
+                elif time.monotonic() - worker.ultimo_sinal > config.PROCESSOS_TIMEOUT_SINAL_S:
+                    self._reiniciar(worker, f"sem sinal de vida há {config.PROCESSOS_TIMEOUT_SINAL_S}s")
+                else:
+                    protocolo = self._migracao_parada(worker)
+                    if protocolo:
+                        self._reiniciar(worker, f"com a migração do protocolo {protocolo} sem progresso há "
+                                                f"{config.PROCESSOS_TIMEOUT_PROGRESSO_S}s")
+
+    def _migracao_parada(self, worker):
+        """Protocolo de uma migração em andamento no worker sem progresso dentro do limite (driver travado)"""
+        limite = time.monotonic() - config.PROCESSOS_TIMEOUT_PROGRESSO_S
+        with self._lock:
+            for info in self.tarefas.values():
+                if info['worker'] is worker and info['em_andamento'] and info['atividade'] < limite:
+                    return info['protocolo']
+        return None
+
+    def _encerrar_processo(self, worker, espera=5):
+        """
+        Encerra o worker; no POSIX o grupo inteiro (o driver do Playwright fecha os
+        navegadores no SIGTERM e o SIGKILL derruba o que sobrou)
+        """
+        processo = worker.processo
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(processo.pid, signal.SIGTERM)
+                processo.join(espera)
+                os.killpg(processo.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # Grupo já vazio (ou o worker ainda não tinha criado o próprio grupo)
+                pass
+        if processo.is_alive():
+            processo.terminate()
+            processo.join(espera)
+            if processo.is_alive():
+                processo.kill()
+        processo.join(1)
+
+    def _reiniciar(self, worker, motivo):
+        print(f"💥 Worker {worker.indice} {motivo}: reiniciando e reenviando as migrações dele")
+        worker.ativo = False
+        self._encerrar_processo(worker)
+        novo = self._iniciar_worker(worker.indice)
+        self.workers[worker.indice] = novo
+
+        reenviar = []
+        falharam = []
+        perdidas = []
+        with self._lock:
+            # Os formulários novos abertos no worker morto se perderam
+            for protocolo, (dono, info) in list(self.retomaveis.items()):
+                if dono is worker:
+                    del self.retomaveis[protocolo]
+                    perdidas.append(info)
+            pendentes = [(id_tarefa, info) for id_tarefa, info in self.tarefas.items() if info['worker'] is worker]
+            # Lotes do worker morto continuam no novo, só com as migrações reenviadas
+            for lote in self.lotes.values():
+                if lote.worker is worker:
+                    lote.worker = novo
+                    lote.total = sum(1 for _, info in pendentes if info['lote'] is lote and info['reenvios'] < config.PROCESSOS_MAX_REENVIOS)
+                    lote.resumo = None
+            for id_tarefa, info in pendentes:
+                if info['reenvios'] >= config.PROCESSOS_MAX_REENVIOS:
+                    info['worker'] = None
+                    info['status'] = 'Erro'
+                    falharam.append(info)
+                else:
+                    info['reenvios'] += 1
+                    info['worker'] = novo
+                    info['status'] = 'Pendente'
+                    info['em_andamento'] = False
+                    reenviar.append((id_tarefa, info))
+
+        for info in perdidas:
+            # Reanuncia o status final para a interface não oferecer mais a retomada dos anexos
+            self._chamar(info['callback_status'], info['status'], 'Worker reiniciado: formulário novo fechado, os anexos não podem mais ser retomados')
+        for info in falharam:
+            self._chamar(info['callback_status'], 'Erro', f"Worker caiu {info['reenvios'] + 1} vez(es) com esta migração")
+        for id_tarefa, info in reenviar:
+            self._chamar(info['callback_status'], 'Pendente', 'Worker reiniciado, migração reenviada')
+            self._enviar(novo, id_tarefa, info)
+
+    def _enviar(self, worker, id_tarefa, info):
+        lote = info['lote']
+        worker.entrada.put((
+            'submeter', id_tarefa, info['protocolo'], info['caminho_pasta'],
+            lote.id if lote else None, lote.total if lote else None
+        ))
+
+    def _escolher_worker(self):
+        """Worker com menos migrações em andamento (chamar com o lock)"""
+        carga = {worker: 0 for worker in self.workers}
+        for info in self.tarefas.values():
+            if info['worker'] in carga:
+                carga[info['worker']] += 1
+        return min(self.workers, key=lambda worker: carga[worker])
+
+    def criar_lote_duas_fases(self, total, max_extracao=None, max_preenchimento=None):
+        """Cria um lote em duas fases; todas as migrações dele vão para o mesmo worker"""
+        with self._lock:
+            lote = LoteRemoto(f'lote-{next(self._ids)}', total, max_extracao, max_preenchimento)
+            self.lotes[lote.id] = lote
+        return lote
+
+    def _worker_retomada(self, protocolo):
+        """Worker que ainda tem o formulário novo do protocolo aberto, ou None (chamar com o lock)"""
+        dono = self.retomaveis.get(protocolo)
+        if dono and dono[0].ativo and dono[0] in self.workers:
+            return dono[0]
+        return None
+
+    def submeter(self, protocolo, caminho_pasta=None, callback_progresso=None, callback_status=None, lote=None):
+        """
+        Agenda uma migração em um worker
+        O protocolo que pode retomar os anexos volta para o worker que tem o formulário novo
+        Os callbacks são chamados a partir dos threads do supervisor
+        Retorna o id da tarefa
+        """
+        with self._lock:
+            id_tarefa = next(self._ids)
+            worker = self._worker_retomada(protocolo) or self._escolher_worker()
+            if lote and lote.worker is None:
+                lote.worker = worker
+            worker = lote.worker if lote else worker
+            info = {
+                'protocolo': protocolo,
+                'caminho_pasta': caminho_pasta,
+                'status': 'Pendente',
+                'mensagem': '',
+                'worker': worker,
+                'lote': lote,
+                'reenvios': 0,
+                'em_andamento': False,
+                'atividade': time.monotonic(),
+                'callback_progresso': callback_progresso,
+                'callback_status': callback_status
+            }
+            self.tarefas[id_tarefa] = info
+        self._enviar(worker, id_tarefa, info)
+        return id_tarefa
+
+    def cancelar(self, id_tarefa):
+        """Pede ao worker que cancele uma migração pendente ou em execução"""
+        with self._lock:
+            info = self.tarefas.get(id_tarefa)
+            if not info or info['status'] in STATUS_FINAIS or not info['worker']:
+                return False
+            worker = info['worker']
+        worker.entrada.put(('cancelar', id_tarefa))
+        return True
+
+    def status(self, id_tarefa=None):
+        """Retorna o estado de uma tarefa (ou de todas)"""
+        with self._lock:
+            if id_tarefa is not None:
+                info = self.tarefas.get(id_tarefa)
+                return {'id': id_tarefa, 'protocolo': info['protocolo'], 'status': info['status'], 'mensagem': info['mensagem']} if info else None
+            return [
+                {'id': id_tarefa, 'protocolo': info['protocolo'], 'status': info['status'], 'mensagem': info['mensagem']}
+                for id_tarefa, info in self.tarefas.items()
+            ]
+
+    def pode_retomar(self, protocolo):
+        """Repetir o protocolo refaz só os anexos (worker com o formulário novo ainda vivo)"""
+        with self._lock:
+            return self._worker_retomada(protocolo) is not None
+
+    def status_lotes(self):
+        """Vazão das fases de cada lote em duas fases (último sinal do worker)"""
+        with self._lock:
+            lotes = list(self.lotes.values())
+        return [lote.resumo or LoteDuasFases(lote.total).resumo() for lote in lotes]
+
+    def parar(self):
+        """Encerra os workers (e os navegadores deles)"""
+        self._parando = True
+        for worker in self.workers:
+            worker.ativo = False
+            worker.entrada.put(('parar',))
+        for worker in self.workers:
+            worker.processo.join(30)
+            self._encerrar_processo(worker)
@@ -0,0 +1,115 @@
+"""
+Testes do upload da aba Anexos contra uma página falsa que imita o FileUpload
+do PrimeFaces: os arquivos aceitos pelo servidor passam a aparecer na lista da
+aba, e uma repetição da etapa só deve enviar os que ainda faltam.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrador_pep import MigradorPEP, SCRIPT_ANEXOS_LISTADOS, filtrar_anexos_pendentes
+
+
+class InputArquivoFalso:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    async def get_attribute(self, nome):
+        return 'form:tabs:upload_input'
+
+    async def set_input_files(self, arquivos):
+        self.pagina.selecionados = list(arquivos)
+        self.pagina.envios.append([os.path.basename(arq) for arq in arquivos])
+
+    async def evaluate(self, script):
+        return None
+
+
+class BotaoEnviarFalso:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    async def click(self):
+        # O servidor aceita os arquivos na ordem e derruba a conexão no primeiro que falhar
+        for arquivo in self.pagina.selecionados:
+            nome = os.path.basename(arquivo)
+            if nome in self.pagina.falhar:
+                self.pagina.falhar.discard(nome)
+                raise Exception(f"Conexão encerrada durante o envio de {nome}")
+            self.pagina.listados.append(nome)
+
+
+class PaginaAnexosFalsa:
+    def __init__(self, falhar=()):
+        self.listados = []
+        self.selecionados = []
+        self.envios = []
+        self.falhar = set(falhar)
+
+    async def query_selector(self, seletor):
+        if seletor.startswith('input[type="file"]'):
+            return InputArquivoFalso(self)
+        if seletor.startswith('button.ui-fileupload-upload'):
+            return BotaoEnviarFalso(self)
+        return None
+
+    async def evaluate(self, script, *args):
+        if script == SCRIPT_ANEXOS_LISTADOS:
+            return list(self.listados)
+        return None
+
+    async def wait_for_function(self, *args, **kwargs):
+        return True
+
+    async def wait_for_timeout(self, ms):
+        return None
+
+
+class TestAnexos(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivos = []
+        for nome in ('projeto.pdf', 'mapa.kmz', 'art.pdf'):
+            caminho = os.path.join(self.pasta.name, nome)
+            with open(caminho, 'wb') as f:
+                f.write(b'conteudo')
+            self.arquivos.append(caminho)
+
+        self.migrador = MigradorPEP('123', caminho_pasta_anexos=self.pasta.name)
+
+        async def aba_ativa(page):
+            return True
+        self.migrador.mudar_para_aba_anexos = aba_ativa
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def test_repeticao_envia_so_os_que_faltam(self):
+        pagina = PaginaAnexosFalsa(falhar={'art.pdf'})
+
+        with self.assertRaises(Exception):
+            asyncio.run(self.migrador.etapa_anexos(pagina, self.arquivos))
+        self.assertEqual(pagina.listados, ['projeto.pdf', 'mapa.kmz'])
+
+        asyncio.run(self.migrador.etapa_anexos(pagina, self.arquivos))
+        self.assertEqual(pagina.envios, [['projeto.pdf', 'mapa.kmz', 'art.pdf'], ['art.pdf']])
+        self.assertEqual(pagina.listados, ['projeto.pdf', 'mapa.kmz', 'art.pdf'])
+
+    def test_todos_ja_anexados_nao_reenvia(self):
+        pagina = PaginaAnexosFalsa()
+        pagina.listados = ['projeto.pdf', 'mapa.kmz', 'art.pdf']
+
+        asyncio.run(self.migrador.etapa_anexos(pagina, self.arquivos))
+        self.assertEqual(pagina.envios, [])
+
+    def test_filtrar_ignora_maiusculas_e_espacos(self):
+        pendentes = filtrar_anexos_pendentes(self.arquivos, [' PROJETO.PDF ', 'Excluir', ''])
+        self.assertEqual([os.path.basename(arq) for arq in pendentes], ['mapa.kmz', 'art.pdf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Testes do ClienteJSF contra um servidor local que imita o PrimeFaces:
+a view tem a cascata Estado → Município → Bairro → Logradouro e cada mudança
+de select é respondida com um `partial-response` (selects dependentes + ViewState novo).
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_opcoes import CacheOpcoes
+from cliente_jsf import ClienteJSF, ErroJSF, CAMPO_VIEW_STATE
+
+
+CAMPOS = {
+    'estado': 'form:tabs:estadoA',
+    'municipio': 'form:tabs:municipioA',
+    'bairro': 'form:tabs:bairroA',
+    'logradouro': 'form:tabs:logradourosA'
+}
+
+# Opções de cada nível a partir do valor selecionado no nível de cima
+OPCOES = {
+    'estado': {None: [('42', 'Santa Catarina'), ('41', 'Paraná')]},
+    'municipio': {'42': [('10', 'Florianópolis'), ('11', 'Joinville')], '41': [('20', 'Curitiba')]},
+    'bairro': {'10': [('5', 'Centro'), ('6', 'Trindade')], '11': [('7', 'América')]},
+    'logradouro': {'5': [('99', 'Rua Felipe Schmidt')], '6': [('98', 'Rua Lauro Linhares')]}
+}
+
+NIVEIS = list(CAMPOS)
+
+
+def html_select(nivel, opcoes):
+    proximo = NIVEIS[NIVEIS.index(nivel) + 1] if nivel != 'logradouro' else None
+    onchange = ''
+    if proximo:
+        onchange = (f' onchange="PrimeFaces.ab({{s:this,e:&quot;change&quot;,p:&quot;{CAMPOS[nivel]}&quot;,'
+                    f'u:&quot;{CAMPOS[proximo]}&quot;}});"')
+    itens = '<option value="">Selecione</option>' + ''.join(
+        f'<option value="{valor}">{texto}</option>' for valor, texto in opcoes
+    )
+    return f'<select id="{CAMPOS[nivel]}" name="{CAMPOS[nivel]}"{onchange}>{itens}</select>'
+
+
+class ServidorPrimeFaces(BaseHTTPRequestHandler):
+    """Handler da view e das requisições parciais; o estado fica no servidor (self.server)"""
+
+    def log_message(self, *args):
+        pass
+
+    def responder(self, corpo, tipo):
+        corpo = corpo.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        selects = html_select('estado', OPCOES['estado'][None]) + ''.join(
+            html_select(nivel, []) for nivel in NIVEIS[1:]
+        )
+        self.responder(
+            f'<html><body><form id="form" name="form" action="/form.xhtml" method="post">{selects}'
+            f'<input type="hidden" name="{CAMPO_VIEW_STATE}" value="{self.server.view_state}"/></form></body></html>',
+            'text/html; charset=UTF-8'
+        )
+
+    def do_POST(self):
+        tamanho = int(self.headers.get('Content-Length', 0))
+        dados = {chave: valores[0] for chave, valores in parse_qs(self.rfile.read(tamanho).decode('utf-8')).items()}
+        self.server.requisicoes.append((dict(self.headers), dados))
+
+        if dados.get(CAMPO_VIEW_STATE) != self.server.view_state:
+            self.responder(
+                '<?xml version="1.0" encoding="UTF-8"?><partial-response><error>'
+                '<error-name>javax.faces.application.ViewExpiredException</error-name>'
+                '<error-message>View expirada</error-message></error></partial-response>',
+                'text/xml; charset=UTF-8'
+            )
+            return
+
+        campo = dados['javax.faces.source']
+        nivel = next(n for n, c in CAMPOS.items() if c == campo)
+        proximo = NIVEIS[NIVEIS.index(nivel) + 1]
+        self.server.view_state = f'vs-{len(self.server.requisicoes)}'
+        self.responder(
+            '<?xml version="1.0" encoding="UTF-8"?><partial-response><changes>'
+            f'<update id="{CAMPOS[proximo]}"><![CDATA[{html_select(proximo, OPCOES[proximo].get(dados[campo], []))}]]></update>'
+            f'<update id="j_id1:{CAMPO_VIEW_STATE}:0"><![CDATA[{self.server.view_state}]]></update>'
+            '</changes></partial-response>',
+            'text/xml; charset=UTF-8'
+        )
+
+
+class TesteClienteJSF(unittest.TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServidorPrimeFaces)
+        self.servidor.view_state = 'vs-0'
+        self.servidor.requisicoes = []
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.servidor.server_address[1]}/form.xhtml'
+        self.cliente = ClienteJSF()
+
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.cache = CacheOpcoes(caminho=os.path.join(self.diretorio.name, 'opcoes.sqlite3'))
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        self.cache.conexao.close()
+        self.diretorio.cleanup()
+
+    def test_carregar_view(self):
+        self.cliente.carregar_view(self.url)
+        self.assertEqual(self.cliente.view_state, 'vs-0')
+        self.assertEqual(set(self.cliente.selects), set(CAMPOS.values()))
+        estado = self.cliente.selects[CAMPOS['estado']]
+        self.assertEqual(estado['form'], 'form')
+        self.assertEqual(estado['ajax']['source'], CAMPOS['estado'])
+        self.assertEqual(estado['ajax']['render'], CAMPOS['municipio'])
+        self.assertEqual(estado['opcoes'], OPCOES['estado'][None])
+        self.assertIsNone(self.cliente.selects[CAMPOS['logradouro']]['ajax'])
+
+    def test_alterar(self):
+        self.cliente.carregar_view(self.url)
+        opcoes = self.cliente.alterar(CAMPOS['estado'], '42')
+        self.assertEqual(opcoes, {CAMPOS['municipio']: OPCOES['municipio']['42']})
+        self.assertEqual(self.cliente.view_state, 'vs-1')
+
+        cabecalhos, dados = self.servidor.requisicoes[0]
+        self.assertEqual(cabecalhos.get('Faces-Request'), 'partial/ajax')
+        self.assertEqual(dados['javax.faces.partial.ajax'], 'true')
+        self.assertEqual(dados['javax.faces.partial.render'], CAMPOS['municipio'])
+        self.assertEqual(dados[CAMPO_VIEW_STATE], 'vs-0')
+
+        # A requisição seguinte usa o ViewState devolvido pela anterior
+        self.cliente.alterar(CAMPOS['municipio'], '10')
+        self.assertEqual(self.servidor.requisicoes[1][1][CAMPO_VIEW_STATE], 'vs-1')
+
+    def test_alterar_view_expirada(self):
+        self.cliente.carregar_view(self.url)
+        self.cliente.view_state = 'expirado'
+        with self.assertRaises(ErroJSF):
+            self.cliente.alterar(CAMPOS['estado'], '42')
+
+    def test_resolver_cascata(self):
+        self.cliente.carregar_view(self.url)
+        valores = {'estado': 'Santa Catarina', 'municipio': 'Florianópolis', 'bairro': '5', 'logradouro': 'rua felipe schmidt'}
+        resolvidos, nivel_invalido = self.cliente.resolver_cascata(CAMPOS, valores, self.cache)
+
+        self.assertIsNone(nivel_invalido)
+        self.assertEqual(resolvidos, {'estado': '42', 'municipio': '10', 'bairro': '5', 'logradouro': '99'})
+        # Chaves do cache com os valores resolvidos, como o MigradorPEP as consulta
+        self.assertEqual(self.cache.obter('estado'), OPCOES['estado'][None])
+        self.assertEqual(self.cache.obter('municipio', ('42',)), OPCOES['municipio']['42'])
+        self.assertEqual(self.cache.obter('bairro', ('42', '10')), OPCOES['bairro']['10'])
+        self.assertEqual(self.cache.obter('logradouro', ('42', '10', '5')), OPCOES['logradouro']['5'])
+
+    def test_resolver_cascata_valor_invalido(self):
+        self.cliente.carregar_view(self.url)
+        valores = {'estado': '42', 'municipio': 'Joinville', 'bairro': 'Centro'}
+        resolvidos, nivel_invalido = self.cliente.resolver_cascata(CAMPOS, valores, self.cache)
+        self.assertEqual(nivel_invalido, 'bairro')
+        self.assertEqual(resolvidos, {'estado': '42', 'municipio': '11'})
+
+
+if __name__ == '__main__':
+    unittest.main()